@@ -0,0 +1,48 @@
+import sys
+import os
+import random
+import time
+
+# Add program to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'programa'))
+
+from models.map_loader import MapLoader
+from models.dynamic_route import DynamicRoute
+from bench_map_build import city_matrix
+
+
+def bench_repairs(size, closed_counts, rounds=5, seed=0):
+    graph = MapLoader.build_compact_graph(city_matrix(size))
+    last = (size - 2) // 3 * 3 - 2
+    start, goal = graph.index(4, 4), graph.index(last, last)
+    rng = random.Random(seed)
+
+    print(f"--- {size}x{size} map, {graph.node_id(start)} -> {graph.node_id(goal)} ---")
+    for count in closed_counts:
+        repair_time = full_time = 0.0
+        repair_expanded = full_expanded = 0
+        for _ in range(rounds):
+            route = DynamicRoute(graph, start, goal)
+            path = route.path()
+            # Accidents on the current route, as cells around one spot
+            middle = rng.randrange(1, len(path) - count - 1)
+            cells = path[middle:middle + count]
+
+            begin = time.perf_counter()
+            repair_expanded += route.close_cells(cells)
+            repair_time += time.perf_counter() - begin
+
+            begin = time.perf_counter()
+            fresh = DynamicRoute(graph, start, goal, overrides=dict.fromkeys(cells, float('inf')))
+            full_time += time.perf_counter() - begin
+            full_expanded += fresh.expanded
+            assert fresh.cost == route.cost
+
+        print(f"{count:>3} closed cells: repair {repair_time / rounds * 1000:.1f}ms ({repair_expanded // rounds} expanded)"
+              f" | recompute {full_time / rounds * 1000:.1f}ms ({full_expanded // rounds} expanded)")
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [60, 120]
+    for size in sizes:
+        bench_repairs(size, [1, 3, 10])
@@ -0,0 +1,49 @@
+import sys
+import os
+import time
+
+# Add program to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'programa'))
+
+from models.map_loader import MapLoader
+
+
+def city_matrix(size, block=3):
+    """
+    Synthetic size x size city: one-way streets every `block` rows and
+    one-way avenues every `block` columns, alternating direction, with an
+    intersection (C) wherever they cross.
+    """
+    matrix = []
+    for y in range(size):
+        row = []
+        for x in range(size):
+            street = y % block == 1
+            avenue = x % block == 1
+            if street and avenue:
+                row.append('C')
+            elif street:
+                row.append('L' if (y // block) % 2 == 0 else 'R')
+            elif avenue:
+                row.append('N' if (x // block) % 2 == 0 else 'S')
+            else:
+                row.append('0')
+        matrix.append(row)
+    return matrix
+
+
+def bench_build(size):
+    matrix = city_matrix(size)
+    print(f"\n--- {size}x{size} map ---")
+    for vectorized in (False, True):
+        start = time.perf_counter()
+        graph = MapLoader.build_compact_graph(matrix, vectorized=vectorized)
+        elapsed = time.perf_counter() - start
+        label = "numpy" if vectorized else "loops"
+        print(f"{label:>6}: {elapsed:.3f}s  ({graph.edge_count} edges)")
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [250, 1000]
+    for size in sizes:
+        bench_build(size)
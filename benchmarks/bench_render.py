@@ -0,0 +1,62 @@
+import sys
+import os
+import time
+
+# Add program to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'programa'))
+
+from ui.tiles import render_ppm, cells_per_tile, GLYPH_MIN_CELL
+from ui.map_canvas import MAX_VIEW_WIDTH, MAX_VIEW_HEIGHT, FRAME_BUDGET
+from ui.raster import render_map, draw_path, encode_png
+from models.map_loader import MapLoader
+from models.accel import require_numpy
+from bench_map_build import city_matrix
+
+
+def bench_viewport(size, cell_sizes):
+    """
+    Cost of painting one full viewport from an empty tile cache (the worst
+    frame: the first one after a zoom), against the canvas items the
+    one-rectangle-per-cell renderer needed for the whole map.
+    """
+    matrix = city_matrix(size)
+    print(f"--- {size}x{size} map, {MAX_VIEW_WIDTH}x{MAX_VIEW_HEIGHT} viewport, budget {FRAME_BUDGET * 1000:.0f} ms ---")
+    print(f"old renderer: {2 * size * size} canvas items at any zoom")
+    for cell_size in cell_sizes:
+        count = cells_per_tile(cell_size)
+        tiles_x = min(size, MAX_VIEW_WIDTH // cell_size + 1) // count + 1
+        tiles_y = min(size, MAX_VIEW_HEIGHT // cell_size + 1) // count + 1
+        begin = time.perf_counter()
+        for tile_y in range(tiles_y):
+            for tile_x in range(tiles_x):
+                x0, y0 = tile_x * count, tile_y * count
+                render_ppm(matrix, x0, y0, min(count, size - x0), min(count, size - y0), cell_size, "dark")
+        elapsed = time.perf_counter() - begin
+        glyphs = (MAX_VIEW_WIDTH // cell_size) * (MAX_VIEW_HEIGHT // cell_size) if cell_size >= GLYPH_MIN_CELL else 0
+        print(f"{cell_size:>3}px: {tiles_x * tiles_y:>3} tiles in {elapsed * 1000:7.1f} ms, <= {glyphs} glyph items")
+
+
+def bench_raster(size, cell_sizes):
+    """Offscreen export of the whole map, with a heatmap and a route on top."""
+    graph = MapLoader.build_compact_graph(city_matrix(size))
+    heat = require_numpy("bench_raster").arange(graph.size) % 97 # e.g. visit counts
+    route = [(1, y) for y in range(size)]
+    print(f"--- offscreen {size}x{size} map ---")
+    for cell_size in cell_sizes:
+        begin = time.perf_counter()
+        image = render_map(graph, cell_size)
+        plain = time.perf_counter() - begin
+        begin = time.perf_counter()
+        draw_path(render_map(graph, cell_size, heat=heat), route, cell_size)
+        overlay = time.perf_counter() - begin
+        begin = time.perf_counter()
+        encode_png(image)
+        png = time.perf_counter() - begin
+        print(f"{cell_size:>3}px: {image.shape[1]}x{image.shape[0]} map {plain * 1000:7.1f} ms, "
+              f"heatmap + route {overlay * 1000:7.1f} ms, PNG {png * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    bench_viewport(size, [2, 4, 8, 16, 24, 40, 64])
+    bench_raster(2000, [1, 2, 4])
@@ -0,0 +1,39 @@
+import sys
+import os
+import time
+
+# Add program to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'programa'))
+
+from models.map_loader import MapLoader
+from models.pathfinder import Pathfinder, METHODS, CORRIDOR, CONTRACTION, ALT
+from bench_map_build import city_matrix
+
+
+def bench_cross_city(size, is_peak_hour=False):
+    graph = MapLoader.build_compact_graph(city_matrix(size), is_peak_hour=is_peak_hour)
+    # Intersections across the city: corner to corner, then west to east
+    last = (size - 2) // 3 * 3 - 2
+    middle = size // 6 * 3 + 1
+    routes = [(graph.index(4, 4), graph.index(last, last)), (graph.index(4, middle), graph.index(last, middle))]
+
+    # Preprocessing of the indexed methods is reported apart from query time
+    for method in (CORRIDOR, CONTRACTION, ALT):
+        begin = time.perf_counter()
+        Pathfinder.search(graph, routes[0][0], routes[0][0], method)
+        print(f"{method:>20}: index built in {time.perf_counter() - begin:.3f}s")
+
+    for start, end in routes:
+        print(f"\n--- {size}x{size} map, {graph.profile} profile, {graph.node_id(start)} -> {graph.node_id(end)} ---")
+        for method in METHODS:
+            begin = time.perf_counter()
+            result = Pathfinder.search(graph, start, end, method)
+            elapsed = time.perf_counter() - begin
+            print(f"{method:>20}: cost={result.cost} expanded={result.expanded} time={elapsed:.3f}s")
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100, 300]
+    for size in sizes:
+        bench_cross_city(size)
+        bench_cross_city(size, is_peak_hour=True)
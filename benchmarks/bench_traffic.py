@@ -0,0 +1,36 @@
+import sys
+import os
+import time
+
+# Add program to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'programa'))
+
+from models.map_loader import MapLoader
+from models.pathfinder import CONTRACTION
+from models.traffic_sim import TrafficSimulation, random_trips
+from bench_map_build import city_matrix
+
+
+def bench_traffic(size, counts, steps=500, seed=0):
+    """
+    Routing and per-step cost of the headless simulation for growing fleets.
+    Routes come from Contraction Hierarchies queries (index built once).
+    """
+    graph = MapLoader.build_compact_graph(city_matrix(size))
+    print(f"--- {size}x{size} map, {steps} steps ---")
+    for count in counts:
+        simulation = TrafficSimulation(graph, method=CONTRACTION)
+        begin = time.perf_counter()
+        simulation.add_trips(random_trips(graph, count, seed), depart=[number % steps for number in range(count)])
+        routing = time.perf_counter() - begin
+        begin = time.perf_counter()
+        stats = simulation.run(steps)
+        elapsed = time.perf_counter() - begin
+        print(f"{count:>6} vehicles: routes {routing:6.2f} s, {elapsed / stats['steps'] * 1000:6.2f} ms/step, "
+              f"{stats['arrived']} arrived, {stats['throughput']:.1f}/step, delay {stats['mean_delay']:.1f}"
+              f"{', GRIDLOCK' if stats['gridlock'] else ''}")
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    bench_traffic(size, [1000, 5000, 20000])
@@ -0,0 +1,38 @@
+import sys
+import os
+import random
+import time
+
+# Add program to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'programa'))
+
+from models.map_loader import MapLoader
+from models.components import component_index
+from models.trip_planner import TripPlanner, solve_order, HELD_KARP_LIMIT
+from bench_map_build import city_matrix
+
+
+def bench_stops(size, counts, seed=0):
+    graph = MapLoader.build_compact_graph(city_matrix(size))
+    components = component_index(graph)
+    rng = random.Random(seed)
+    nodes = list(graph.node_indices())
+    start = rng.choice(nodes)
+    candidates = [node for node in nodes if components.same_component(node, start)]
+    planner = TripPlanner(graph)
+
+    print(f"--- {size}x{size} map, exact up to {HELD_KARP_LIMIT} stops ---")
+    for count in counts:
+        stops = rng.sample(candidates, count)
+        begin = time.perf_counter()
+        costs = planner.cost_matrix([start] + stops)
+        matrix_time = time.perf_counter() - begin
+        begin = time.perf_counter()
+        order, cost = solve_order(costs)
+        solve_time = time.perf_counter() - begin
+        print(f"{count:>4} stops: cost={cost} matrix={matrix_time:.3f}s solve={solve_time:.3f}s")
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    bench_stops(size, [2, 4, 6, 8, 10, 12, 16, 24, 32, 48])
@@ -1,10 +1,12 @@
 import tkinter as tk
 from models.user_manager import UserManager
 from ui.login_window import LoginWindow
-from ui.main_window import MainWindow
 import sys
 import os
 
+# Seconds allowed to import everything the main window needs (tests/test_startup.py)
+STARTUP_BUDGET = 0.5
+
 def main():
     root = tk.Tk()
     
@@ -16,6 +18,9 @@ def main():
     user_manager = UserManager(users_path)
 
     def start_app(username):
+        # Imported here: the login window shows before the routing modules load
+        from ui.main_window import MainWindow
+
         # Clear the current window (Login)
         for widget in root.winfo_children():
             widget.destroy()
@@ -23,7 +28,8 @@ def main():
         # Initialize MainWindow using the SAME root
         app = MainWindow(root, username)
         
-        # Load default map for convenience if exists
+        # Load default map for convenience if exists (in the background:
+        # the window is usable at once and rows appear as they are parsed)
         map_path = os.path.join(base_dir, "data", "mapa.csv")
         if os.path.exists(map_path):
             app._load_map(map_path)
@@ -0,0 +1,18 @@
+def optional_numpy():
+    """
+    Imports NumPy on demand.
+    Returns the numpy module, or None when it is not installed so callers
+    can fall back to the pure-Python (array module) code path.
+    """
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def require_numpy(feature):
+    np = optional_numpy()
+    if np is None:
+        raise ImportError(f"{feature} requires NumPy (pip install numpy)")
+    return np
@@ -0,0 +1,452 @@
+import itertools
+import operator
+import threading
+from array import array
+from models.accel import optional_numpy
+
+# Cell type codes. The position of a value in CELL_TYPES is the small integer
+# stored for that cell in CompactGraph.cells.
+CELL_TYPES = ('0', 'L', 'R', 'N', 'S', 'C', 'SF', 'ND', 'B')
+CELL_CODES = {value: code for code, value in enumerate(CELL_TYPES)}
+BLOCK = CELL_CODES['0']
+# 'B' (spec table 2): "Calle / Avenida bloqueada", a closed street, also written
+# by map edits and incidents. Shown as a street, but no edge enters or leaves it.
+CLOSED = CELL_CODES['B']
+OTHER = len(CELL_TYPES)  # Any value not listed in CELL_TYPES
+# Derived indexes that depend on cells and edges only (kept by weight updates)
+TOPOLOGY_INDEXES = ('components', 'target_codes')
+
+_tokens = itertools.count(1)  # Source of CompactGraph.token
+
+
+def cell_code(value):
+    return CELL_CODES.get(value, OTHER)
+
+
+class CellNode:
+    """
+    Lightweight, read-only view of one cell of a CompactGraph.
+    Created on demand so callers written against models.graph.Node
+    (x, y, value, id, edges) keep working without per-cell objects.
+    """
+    __slots__ = ('graph', 'index')
+
+    def __init__(self, graph, index):
+        self.graph = graph
+        self.index = index
+
+    @property
+    def x(self):
+        return self.index % self.graph.cols
+
+    @property
+    def y(self):
+        return self.index // self.graph.cols
+
+    @property
+    def value(self):
+        return self.graph.value(self.index)
+
+    @property
+    def id(self):
+        return f"{self.x},{self.y}"
+
+    @property
+    def edges(self):
+        return [(CellNode(self.graph, target), weight) for target, weight in self.graph.edges(self.index)]
+
+    def __eq__(self, other):
+        return isinstance(other, CellNode) and other.graph is self.graph and other.index == self.index
+
+    def __hash__(self):
+        return hash(self.index)
+
+    def __repr__(self):
+        return f"Node({self.id}, {self.value})"
+
+
+class NodeMap:
+    """
+    Dict-like adapter over a CompactGraph keyed by legacy "x,y" ids.
+    Only non-block cells are listed, block cells have no node.
+    """
+    def __init__(self, graph):
+        self.graph = graph
+
+    def get(self, node_id, default=None):
+        index = self.graph.index_of(node_id)
+        if index is None or self.graph.cells[index] == BLOCK:
+            return default
+        return CellNode(self.graph, index)
+
+    def __getitem__(self, node_id):
+        node = self.get(node_id)
+        if node is None:
+            raise KeyError(node_id)
+        return node
+
+    def __contains__(self, node_id):
+        return self.get(node_id) is not None
+
+    def __iter__(self):
+        for index in self.graph.node_indices():
+            yield CellNode(self.graph, index).id
+
+    def keys(self):
+        return list(iter(self))
+
+    def values(self):
+        return [CellNode(self.graph, index) for index in self.graph.node_indices()]
+
+    def items(self):
+        return [(node.id, node) for node in self.values()]
+
+    def __len__(self):
+        return self.graph.node_count
+
+
+def _to_int_array(values):
+    result = array('i')
+    result.frombytes(values.astype('int32').tobytes())
+    return result
+
+
+class CompactGraph:
+    """
+    Array-backed directed grid graph.
+    Nodes are integer cell indices (y * cols + x). Outgoing edges of cell i
+    are targets[offsets[i]:offsets[i + 1]] with matching weights (CSR layout).
+    Block cells keep their type code but have no edges.
+    The arrays may be array.array objects or read-only memoryviews over a
+    compiled map file (see models.map_cache).
+
+    The topology is shared by every traffic profile: each profile only
+    contributes a weight vector parallel to targets, and set_profile swaps
+    the active one in O(1).
+
+    Queries only read the arrays, so one graph can serve concurrent searches;
+    threads should pass an explicit profile instead of calling set_profile.
+    """
+    def __init__(self, rows, cols, cells, offsets, targets, profiles, labels=None, cost_tables=None, node_count=None):
+        self.rows = rows
+        self.cols = cols
+        self.cells = cells        # array('B'), one type code per cell
+        self.offsets = offsets    # array('i'), rows * cols + 1 entries
+        self.targets = targets    # array('i'), target cell of each edge
+        self.profiles = dict(profiles)  # profile name -> array('i') edge costs
+        self.cost_tables = dict(cost_tables or {})  # profile name -> cost per target type code
+        self.labels = labels or {}  # index -> raw value, only for OTHER cells
+        if node_count is None:
+            node_count = len(cells) - bytes(cells).count(BLOCK)
+        self.node_count = node_count
+        self.content_hash = None  # sha256 of the source CSV, set by MapLoader
+        self.index_path = None    # CSV next to which derived indexes are saved, set by MapLoader(use_cache=True)
+        self.version = 0          # Bumped whenever the topology or weights change in place
+        self.token = next(_tokens)  # Unique per graph object, never reused (unlike id())
+        self.profile = None
+        self.weights = None       # Weight vector of the active profile
+        self._reverse = None
+        self._min_weights = {}
+        self._derived = {}        # Indexes built from this graph (corridors, ...)
+        self._lock = threading.RLock()  # Lazy builds run once even with concurrent queries
+        if self.profiles:
+            self.set_profile(next(iter(self.profiles)))
+
+    def set_profile(self, name):
+        """Makes the weight vector of profile `name` the active one."""
+        if name not in self.profiles:
+            raise KeyError(f"Unknown traffic profile: {name}")
+        self.profile = name
+        self.weights = self.profiles[name]
+
+    def add_profile(self, name, cost_table):
+        """
+        Precomputes the weight vector of a new profile.
+        cost_table: sequence indexed by the type code of the edge target.
+        """
+        cells = self.cells
+        self.cost_tables[name] = list(cost_table)
+        np = optional_numpy()
+        if np is not None and len(self.targets):
+            target_codes = np.frombuffer(cells, dtype=np.uint8)[np.frombuffer(self.targets, dtype=np.int32)]
+            weights = array('i')
+            weights.frombytes(np.asarray(cost_table, dtype=np.int32)[target_codes].tobytes())
+            self.profiles[name] = weights
+        else:
+            self.profiles[name] = array('i', (cost_table[cells[target]] for target in self.targets))
+        if self.profile is None:
+            self.set_profile(name)
+        return self.profiles[name]
+
+    def min_weight(self, profile=None):
+        """Cheapest edge cost of a profile (the active one by default)."""
+        name = profile or self.profile
+        if name not in self._min_weights:
+            weights = self.profiles[name]
+            self._min_weights[name] = min(weights) if len(weights) else 0
+        return self._min_weights[name]
+
+    def reverse_adjacency(self):
+        """
+        Incoming edges in CSR form, built on first use.
+        Returns (rev_offsets, rev_sources, rev_edges): the edges entering
+        cell i are rev_edges[rev_offsets[i]:rev_offsets[i + 1]] (forward edge
+        ids, so any profile's weights apply) coming from rev_sources[...].
+        """
+        if self._reverse is None:
+            with self._lock:
+                if self._reverse is None:
+                    self._reverse = self._build_reverse()
+        return self._reverse
+
+    def reverse_weights(self, profile=None):
+        """
+        Weights of a profile in reverse adjacency order, so the reverse graph
+        (rev_offsets, rev_sources, reverse_weights) is a plain CSR graph.
+        """
+        name = profile or self.profile
+
+        def build(graph):
+            weights = graph.profiles[name]
+            _, _, rev_edges = graph.reverse_adjacency()
+            np = optional_numpy()
+            if np is not None and len(rev_edges):
+                return _to_int_array(np.frombuffer(weights, dtype=np.int32)[np.frombuffer(rev_edges, dtype=np.int32)])
+            return array('i', (weights[edge] for edge in rev_edges))
+
+        return self.cached(('reverse_weights', name), build)
+
+    def _build_reverse(self):
+        size = self.size
+        np = optional_numpy()
+        if np is not None:
+            offsets = np.frombuffer(self.offsets, dtype=np.int32)
+            targets = np.frombuffer(self.targets, dtype=np.int32)
+            order = np.argsort(targets, kind='stable').astype(np.int32)
+            sources = np.repeat(np.arange(size, dtype=np.int32), np.diff(offsets))[order]
+            rev_offsets = np.zeros(size + 1, dtype=np.int32)
+            np.cumsum(np.bincount(targets, minlength=size), out=rev_offsets[1:])
+            return tuple(_to_int_array(values) for values in (rev_offsets, sources, order))
+
+        # Counting sort of the edges by target
+        counts = [0] * (size + 1)
+        for target in self.targets:
+            counts[target + 1] += 1
+        for index in range(size):
+            counts[index + 1] += counts[index]
+        rev_offsets = array('i', counts)
+        rev_sources = array('i', bytes(4 * len(self.targets)))
+        rev_edges = array('i', bytes(4 * len(self.targets)))
+        cursor = counts[:size]
+        offsets, targets = self.offsets, self.targets
+        for source in range(size):
+            for edge in range(offsets[source], offsets[source + 1]):
+                slot = cursor[targets[edge]]
+                rev_sources[slot] = source
+                rev_edges[slot] = edge
+                cursor[targets[edge]] = slot + 1
+        return rev_offsets, rev_sources, rev_edges
+
+    def replace_cells(self, codes, edge_lists):
+        """
+        In-place edit: sets the type code of some cells and replaces the
+        outgoing edges of the cells in edge_lists, in one pass over the CSR
+        arrays. Weights of every profile are recomputed for the new edges only.
+        codes: {index: (code, raw label or None)}
+        edge_lists: {index: [target, ...]} in N, S, L, R order
+        Read-only (memory-mapped) arrays are copied on the first edit.
+        """
+        cells = self.cells if isinstance(self.cells, array) else array('B', self.cells)
+        for index, (code, label) in codes.items():
+            if (cells[index] == BLOCK) != (code == BLOCK):
+                self.node_count += 1 if cells[index] == BLOCK else -1
+            cells[index] = code
+            if code == OTHER:
+                self.labels[index] = label
+            else:
+                self.labels.pop(index, None)
+
+        offsets, targets = self.offsets, self.targets
+        new_targets = array('i')
+        new_weights = {name: array('i') for name in self.profiles}
+        new_offsets = array('i', offsets)
+        position = 0
+        shift = 0
+        affected = sorted(edge_lists)
+        for number, cell in enumerate(affected):
+            start, end = offsets[cell], offsets[cell + 1]
+            new_targets.extend(targets[position:start])
+            for name, weights in self.profiles.items():
+                new_weights[name].extend(weights[position:start])
+            replacement = edge_lists[cell]
+            new_targets.extend(replacement)
+            for name in self.profiles:
+                table = self.cost_tables[name]
+                new_weights[name].extend(table[cells[target]] for target in replacement)
+            position = end
+            shift += len(replacement) - (end - start)
+            if shift:
+                # Cells up to the next edited one start `shift` edges later
+                last = affected[number + 1] if number + 1 < len(affected) else self.size
+                new_offsets[cell + 1:last + 1] = array('i', (offset + shift for offset in offsets[cell + 1:last + 1]))
+        new_targets.extend(targets[position:])
+        for name, weights in self.profiles.items():
+            new_weights[name].extend(weights[position:])
+
+        self.cells = cells
+        self.offsets = new_offsets
+        self.targets = new_targets
+        self.profiles = new_weights
+        self.weights = new_weights[self.profile] if self.profile else None
+        self.invalidate()
+
+    def set_entry_costs(self, factors):
+        """
+        Weight update: the cost of entering each cell of factors
+        ({index: factor}) becomes its profile cost times factor, rounded and
+        at least 1, in every profile. A factor of 1 restores the profile cost.
+        Topology and cell types are unchanged. New weight arrays are built,
+        so searches already running keep reading the previous ones.
+        """
+        if not factors:
+            return
+        rev_offsets, _, rev_edges = self.reverse_adjacency()
+        profiles = {name: array('i', weights) for name, weights in self.profiles.items()}
+        for name, weights in profiles.items():
+            table = self.cost_tables[name]
+            for index, factor in factors.items():
+                cost = max(1, round(table[self.cells[index]] * factor))
+                for slot in range(rev_offsets[index], rev_offsets[index + 1]):
+                    weights[rev_edges[slot]] = cost
+        self.profiles = profiles
+        self.weights = profiles[self.profile] if self.profile else None
+        self.invalidate(topology=False)
+
+    def invalidate(self, topology=True):
+        """
+        Forgets every index built from the graph and bumps its version.
+        topology=False (weights changed, edges did not) keeps the reverse
+        adjacency and the derived indexes of TOPOLOGY_INDEXES.
+        """
+        with self._lock:
+            self.version += 1
+            self._min_weights = {}
+            if topology:
+                self._reverse = None
+                self._derived = {}
+            else:
+                self._derived = {key: index for key, index in self._derived.items() if key in TOPOLOGY_INDEXES}
+
+    def cached(self, key, build):
+        """Returns the derived index `key`, calling build(self) the first time."""
+        if key not in self._derived:
+            with self._lock:
+                if key not in self._derived:
+                    self._derived[key] = build(self)
+        return self._derived[key]
+
+    def built(self, key):
+        """The derived index `key` if it was already built, None otherwise."""
+        return self._derived.get(key)
+
+    def keep(self, key, index, version):
+        """
+        Stores an index built outside the lock from the graph at `version`
+        (long builds must not block edits). Dropped if the graph changed since.
+        """
+        with self._lock:
+            if self.version != version:
+                return index
+            return self._derived.setdefault(key, index)
+
+    def manhattan(self, a, b):
+        ay, ax = divmod(a, self.cols)
+        by, bx = divmod(b, self.cols)
+        return abs(ax - bx) + abs(ay - by)
+
+    @property
+    def size(self):
+        return self.rows * self.cols
+
+    @property
+    def edge_count(self):
+        return len(self.targets)
+
+    @property
+    def nodes(self):
+        return NodeMap(self)
+
+    def index(self, x, y):
+        if 0 <= x < self.cols and 0 <= y < self.rows:
+            return y * self.cols + x
+        return None
+
+    def coords(self, index):
+        y, x = divmod(index, self.cols)
+        return x, y
+
+    def index_of(self, node_id):
+        """
+        Converts an int index, a legacy "x,y" id or a CellNode into a cell index.
+        Returns None when the id does not name a cell of this graph.
+        """
+        if isinstance(node_id, CellNode):
+            return node_id.index
+        if isinstance(node_id, str):
+            try:
+                x, y = node_id.split(',')
+                return self.index(int(x), int(y))
+            except ValueError:
+                return None
+        try:
+            index = operator.index(node_id)
+        except TypeError:
+            return None
+        return index if 0 <= index < self.size else None
+
+    def node_id(self, index):
+        x, y = self.coords(index)
+        return f"{x},{y}"
+
+    def value(self, index):
+        code = self.cells[index]
+        if code == OTHER:
+            return self.labels.get(index, '')
+        return CELL_TYPES[code]
+
+    def is_block(self, index):
+        return self.cells[index] == BLOCK
+
+    def node_indices(self):
+        return (index for index, code in enumerate(self.cells) if code != BLOCK)
+
+    def edges(self, index):
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return list(zip(self.targets[start:end], self.weights[start:end]))
+
+    def node(self, index):
+        return CellNode(self, index)
+
+    def to_matrix(self):
+        """Matrix of cell values, the inverse of MapLoader's encoding."""
+        symbols = CELL_TYPES + ('',)
+        cols = self.cols
+        matrix = [[symbols[code] for code in self.cells[y * cols:(y + 1) * cols]] for y in range(self.rows)]
+        for index, value in self.labels.items():
+            y, x = divmod(index, cols)
+            matrix[y][x] = value
+        return matrix
+
+    # --- Legacy Graph API ---
+
+    def get_node(self, x, y):
+        index = self.index(x, y)
+        if index is None:
+            return None
+        return CellNode(self, index)
+
+    def get_all_nodes(self):
+        return self.nodes.values()
+
+    def __repr__(self):
+        return f"CompactGraph({self.cols}x{self.rows}, nodes={self.node_count}, edges={self.edge_count})"
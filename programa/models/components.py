@@ -0,0 +1,241 @@
+import random
+from array import array
+
+# Above this many components the all-pairs bitsets (components^2 bits) are
+# not built; reachable() then answers from interval labels of the
+# condensation DAG, searching the DAG only when the labels cannot decide.
+MAX_REACHABILITY_COMPONENTS = 16384
+# Random depth-first traversals labelling the DAG (more labels, fewer searches)
+LABEL_TRAVERSALS = 3
+
+
+def strongly_connected_components(offsets, targets, size, roots=None):
+    """
+    Iterative Tarjan over a CSR graph (no recursion, safe on huge maps).
+    roots: cells to start from (all by default); cells not reached from
+    them keep component -1.
+    Returns (component, count): component[i] is the SCC id of cell i.
+    Ids come out in reverse topological order: an edge between two
+    different components always goes from a higher id to a lower one.
+    """
+    order = array('i', [-1]) * size  # Discovery index, -1 = not visited
+    low = array('i', [0]) * size
+    component = array('i', [-1]) * size
+    on_stack = bytearray(size)
+    stack = []
+    counter = 0
+    count = 0
+
+    for root in (range(size) if roots is None else roots):
+        if order[root] != -1:
+            continue
+        order[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = 1
+        work = [(root, offsets[root])] # (node, next edge to explore)
+
+        while work:
+            node, edge = work[-1]
+            if edge < offsets[node + 1]:
+                work[-1] = (node, edge + 1)
+                following = targets[edge]
+                if order[following] == -1:
+                    order[following] = low[following] = counter
+                    counter += 1
+                    stack.append(following)
+                    on_stack[following] = 1
+                    work.append((following, offsets[following]))
+                elif on_stack[following] and order[following] < low[node]:
+                    low[node] = order[following]
+                continue
+
+            work.pop()
+            if work and low[node] < low[work[-1][0]]:
+                low[work[-1][0]] = low[node]
+            if low[node] == order[node]:
+                # node is the root of a component: pop its members
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = 0
+                    component[member] = count
+                    if member == node:
+                        break
+                count += 1
+    return component, count
+
+
+class ComponentIndex:
+    """
+    Strongly connected components of a CompactGraph plus reachability over
+    their condensation DAG, one Python int bitset per component.
+    reachable(a, b) answers in O(1) whether any route a -> b exists, for
+    every traffic profile (profiles only change weights, not edges).
+    Fragmented maps with more than MAX_REACHABILITY_COMPONENTS components
+    keep the condensation DAG instead, with LABEL_TRAVERSALS interval
+    labels per component (GRAIL): a target whose interval is not inside the
+    source's is unreachable in O(1); otherwise a DFS of the DAG pruned by
+    the same labels decides, so answers stay exact.
+    """
+    def __init__(self, graph):
+        self.graph = graph
+        # Blocks have no edges: they stay out of every component (-1)
+        self.component, self.count = strongly_connected_components(graph.offsets, graph.targets, graph.size, graph.node_indices())
+        self.reach = None
+        self.labels = []
+        if self.count <= MAX_REACHABILITY_COMPONENTS:
+            self.reach = self._build_reach()
+        else:
+            self.dag_offsets, self.dag_targets = self._build_dag()
+            self.labels = [self._intervals(random.Random(seed) if seed else None) for seed in range(LABEL_TRAVERSALS)]
+
+    def _build_reach(self):
+        offsets, targets, component = self.graph.offsets, self.graph.targets, self.component
+        # Cells grouped by component (counting sort), sinks first
+        starts = [0] * (self.count + 1)
+        for label in component:
+            if label != -1: # Blocks
+                starts[label + 1] += 1
+        for label in range(self.count):
+            starts[label + 1] += starts[label]
+        members = array('i', bytes(4 * starts[self.count]))
+        cursor = starts[:self.count]
+        for cell, label in enumerate(component):
+            if label == -1:
+                continue
+            members[cursor[label]] = cell
+            cursor[label] += 1
+
+        reach = [0] * self.count
+        for label in range(self.count):
+            bits = 1 << label
+            for slot in range(starts[label], starts[label + 1]):
+                cell = members[slot]
+                for edge in range(offsets[cell], offsets[cell + 1]):
+                    other = component[targets[edge]]
+                    if other != label:
+                        bits |= reach[other] # Lower id: already complete
+            reach[label] = bits
+        return reach
+
+    def _build_dag(self):
+        # Condensation DAG in CSR form: the components entered from component
+        # c are dag_targets[dag_offsets[c]:dag_offsets[c + 1]], without repeats
+        offsets, targets, component = self.graph.offsets, self.graph.targets, self.component
+        pairs = set()
+        for cell, label in enumerate(component):
+            if label == -1:
+                continue
+            for edge in range(offsets[cell], offsets[cell + 1]):
+                other = component[targets[edge]]
+                if other != label:
+                    pairs.add((label, other))
+        pairs = sorted(pairs)
+        dag_offsets = array('i', [0]) * (self.count + 1)
+        for label, _ in pairs:
+            dag_offsets[label + 1] += 1
+        for label in range(self.count):
+            dag_offsets[label + 1] += dag_offsets[label]
+        return dag_offsets, array('i', (other for _, other in pairs))
+
+    def _intervals(self, rng):
+        # One post-order traversal of the DAG (children shuffled by rng, in
+        # order if None). rank: post-order number; low: smallest rank below.
+        # v reachable from u implies low[u] <= low[v] and rank[v] <= rank[u].
+        count, dag_offsets, dag_targets = self.count, self.dag_offsets, self.dag_targets
+
+        def children(label):
+            following = list(dag_targets[dag_offsets[label]:dag_offsets[label + 1]])
+            if rng:
+                rng.shuffle(following)
+            return iter(following)
+
+        rank = array('i', [0]) * count
+        low = array('i', [count]) * count
+        seen = bytearray(count)
+        roots = list(range(count - 1, -1, -1)) # Sources first
+        if rng:
+            rng.shuffle(roots)
+        post = 0
+        for root in roots:
+            if seen[root]:
+                continue
+            seen[root] = 1
+            work = [(root, children(root))]
+            while work:
+                label, pending = work[-1]
+                for child in pending:
+                    if not seen[child]:
+                        seen[child] = 1
+                        work.append((child, children(child)))
+                        break
+                    if low[child] < low[label]: # Finished earlier (acyclic)
+                        low[label] = low[child]
+                else:
+                    work.pop()
+                    rank[label] = post
+                    low[label] = min(low[label], post)
+                    post += 1
+                    if work and low[label] < low[work[-1][0]]:
+                        low[work[-1][0]] = low[label]
+        return rank, low
+
+    def _may_reach(self, source, target):
+        for rank, low in self.labels:
+            if rank[target] > rank[source] or low[target] < low[source]:
+                return False
+        return True
+
+    def _dag_reachable(self, source, target):
+        # DFS of the condensation DAG, skipping components the labels rule out
+        if not self._may_reach(source, target):
+            return False
+        dag_offsets, dag_targets = self.dag_offsets, self.dag_targets
+        seen = {source}
+        stack = [source]
+        while stack:
+            label = stack.pop()
+            for slot in range(dag_offsets[label], dag_offsets[label + 1]):
+                child = dag_targets[slot]
+                if child == target:
+                    return True
+                # Lower ids than target come after it in topological order
+                if child > target and child not in seen and self._may_reach(child, target):
+                    seen.add(child)
+                    stack.append(child)
+        return False
+
+    def reachable(self, start, end):
+        """True if some route leads from cell start to cell end."""
+        if start == end:
+            return True
+        source, target = self.component[start], self.component[end]
+        if source == -1 or target == -1:
+            return False # Block cell
+        if source == target:
+            return True
+        if source < target:
+            return False # Against the topological order
+        if self.reach is None:
+            return self._dag_reachable(source, target)
+        return (self.reach[source] >> target) & 1 == 1
+
+    def same_component(self, a, b):
+        return self.component[a] == self.component[b]
+
+    def unreachable_from(self, start):
+        """Non-block cells with no route from start (for flagging on the map)."""
+        return [cell for cell in self.graph.node_indices() if not self.reachable(start, cell)]
+
+
+def component_index(graph):
+    """
+    ComponentIndex of graph, built on first use and kept with the graph.
+    It only depends on the topology, so weight updates keep it.
+    """
+    return graph.cached('components', ComponentIndex)
+
+
+def built_components(graph):
+    """The ComponentIndex of graph if it is already built, None otherwise."""
+    return graph.built('components')
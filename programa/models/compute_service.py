@@ -0,0 +1,171 @@
+import queue
+import threading
+from collections import namedtuple
+
+# Kinds of ComputeEvent
+PROGRESS = 'progress'    # value: given by the job (nodes settled for searches)
+DONE = 'done'            # value: what the job returned
+FAILED = 'failed'        # value: the exception raised
+CANCELLED = 'cancelled'  # value: None
+
+# Posted by the worker thread, read by the UI thread with ComputeService.poll
+ComputeEvent = namedtuple('ComputeEvent', ['kind', 'job', 'value'])
+
+# Queue priorities: background jobs only run when nothing else waits
+_SHUTDOWN, _FOREGROUND, _BACKGROUND = 0, 1, 2
+
+
+class SearchCancelled(Exception):
+    """Raised inside a running job once it has been cancelled."""
+
+
+class ComputeJob:
+    """
+    One unit of background work. The function is called with a monitor
+    keyword argument: pass it to Pathfinder searches (or call it with any
+    progress value) so the job reports progress and stops when cancelled.
+    Background jobs also lend the worker to waiting jobs at each monitor call.
+    """
+    def __init__(self, number, tag, function, args, kwargs, events, lend=None):
+        self.number = number
+        self.tag = tag
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self._events = events
+        self._lend = lend       # Runs the waiting foreground jobs (background jobs only)
+        self._cancelled = threading.Event()
+        self.finished = False   # Set once poll() has handed out its final event
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def background(self):
+        return self._lend is not None
+
+    def monitor(self, progress):
+        if self._cancelled.is_set():
+            raise SearchCancelled()
+        if self._lend is not None:
+            self._lend()
+            if self._cancelled.is_set():
+                raise SearchCancelled()
+        self._events.put(ComputeEvent(PROGRESS, self, progress))
+
+    def run(self):
+        if self.cancelled:
+            return ComputeEvent(CANCELLED, self, None)
+        try:
+            result = self.function(*self.args, monitor=self.monitor, **self.kwargs)
+        except SearchCancelled:
+            return ComputeEvent(CANCELLED, self, None)
+        except Exception as error:
+            return ComputeEvent(FAILED, self, error)
+        if self.cancelled:
+            return ComputeEvent(CANCELLED, self, None)
+        return ComputeEvent(DONE, self, result)
+
+    def __repr__(self):
+        return f"ComputeJob({self.number}, {self.tag})"
+
+
+class ComputeService:
+    """
+    Runs jobs one at a time on a worker thread so the Tk mainloop never
+    waits on a search. Submitting a job with a tag cancels the previous jobs
+    with that tag: only the latest request of each kind matters.
+    Progress and results come back through a thread-safe queue that the UI
+    drains with poll() from a root.after loop; before drawing a result,
+    check current(job), since a job may finish just after being superseded.
+    Background jobs (long index builds) wait until no other job is queued,
+    and while they run every monitor call first runs the jobs submitted
+    meanwhile, so they never hold up a search.
+    """
+    def __init__(self):
+        self._jobs = queue.PriorityQueue() # (priority, number, job)
+        self._events = queue.Queue()
+        self._latest = {}   # tag -> last submitted job
+        self._count = 0
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def submit(self, function, *args, tag=None, background=False, **kwargs):
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name='compute-service', daemon=True)
+                self._worker.start()
+            self._count += 1
+            job = ComputeJob(self._count, tag, function, args, kwargs, self._events,
+                             self._run_waiting if background else None)
+            if tag is not None:
+                previous = self._latest.get(tag)
+                if previous is not None:
+                    previous.cancel()
+                self._latest[tag] = job
+        self._jobs.put((_BACKGROUND if background else _FOREGROUND, job.number, job))
+        return job
+
+    def cancel(self, tag=None):
+        """Cancels the pending or running job of tag (of every tag if None)."""
+        with self._lock:
+            jobs = list(self._latest.values()) if tag is None else [self._latest.get(tag)]
+        for job in jobs:
+            if job is not None:
+                job.cancel()
+
+    def busy(self, tag):
+        """
+        True from submission until poll() returns the result of the latest
+        job of tag, unless it was cancelled.
+        """
+        with self._lock:
+            job = self._latest.get(tag)
+        return job is not None and not job.cancelled and not job.finished
+
+    def current(self, job):
+        """True while job is the latest of its tag and was not cancelled."""
+        with self._lock:
+            return not job.cancelled and (job.tag is None or self._latest.get(job.tag) is job)
+
+    def poll(self):
+        """Events posted since the last call, in order. Never blocks."""
+        events = []
+        while True:
+            try:
+                event = self._events.get_nowait()
+            except queue.Empty:
+                return events
+            if event.kind != PROGRESS:
+                event.job.finished = True
+            events.append(event)
+
+    def shutdown(self):
+        self.cancel()
+        with self._lock:
+            worker, self._worker = self._worker, None
+        if worker is not None:
+            self._jobs.put((_SHUTDOWN, 0, None))
+
+    def _run(self):
+        while True:
+            _, _, job = self._jobs.get()
+            if job is None:
+                return
+            self._events.put(job.run())
+
+    def _run_waiting(self):
+        # Worker thread, inside a background job: runs the foreground jobs queued meanwhile
+        while True:
+            try:
+                item = self._jobs.get_nowait()
+            except queue.Empty:
+                return
+            if item[0] != _FOREGROUND:
+                self._jobs.put(item) # Shutdown or another background job: later
+                return
+            self._events.put(item[2].run())
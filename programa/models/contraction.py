@@ -0,0 +1,299 @@
+import heapq
+import os
+from array import array
+from models.compact_graph import BLOCK
+from models import map_cache
+from models.shortest_path_tree import PROGRESS_INTERVAL
+
+INF = float('inf')
+CH_EXTENSION = '.ch'
+# Witness searches give up after settling this many nodes (adds a shortcut)
+WITNESS_SETTLE_LIMIT = 60
+
+
+def _csr(size, lists):
+    """Packs per-node lists of (other, weight, middle) into CSR arrays."""
+    offsets = array('i', [0])
+    others, weights, middles = array('i'), array('i'), array('i')
+    for node in range(size):
+        for other, weight, middle in lists.get(node, ()):
+            others.append(other)
+            weights.append(weight)
+            middles.append(middle)
+        offsets.append(len(others))
+    return offsets, others, weights, middles
+
+
+class ContractionHierarchy:
+    """
+    Contraction Hierarchies index of one weight profile of a CompactGraph.
+    Nodes are contracted in increasing importance; shortcuts keep the
+    contracted middle node so routes unpack back to the original cells.
+    Queries are a bidirectional Dijkstra that only goes "up" the hierarchy.
+    """
+    def __init__(self, size, rank, up, down, content_hash=None, profile=None, costs=None):
+        self.size = size
+        self.rank = rank  # cell -> contraction order, -1 for blocks
+        # Upward edges u -> v (rank[v] > rank[u]), stored at u
+        self.up_offsets, self.up_targets, self.up_weights, self.up_middle = up
+        # Upward edges of the reverse graph: u -> v (rank[u] > rank[v]), stored at v
+        self.down_offsets, self.down_sources, self.down_weights, self.down_middle = down
+        self.content_hash = content_hash
+        self.profile = profile
+        self.costs = costs
+
+    @classmethod
+    def build(cls, graph, profile=None, monitor=None):
+        """
+        Contracts every node of the profile. monitor(contracted) is called
+        every PROGRESS_INTERVAL steps and may raise SearchCancelled.
+        """
+        profile = profile or graph.profile
+        weights = graph.profiles[profile]
+        offsets, targets = graph.offsets, graph.targets
+        size = graph.size
+
+        # Remaining (uncontracted) graph: node -> {neighbor: (weight, middle)}
+        out_edges, in_edges = {}, {}
+        for node in graph.node_indices():
+            out_edges[node] = {}
+            in_edges[node] = {}
+        for node in out_edges:
+            for edge in range(offsets[node], offsets[node + 1]):
+                target = targets[edge]
+                if target != node and weights[edge] < out_edges[node].get(target, (INF,))[0]:
+                    out_edges[node][target] = (weights[edge], -1)
+                    in_edges[target][node] = (weights[edge], -1)
+
+        rank = array('i', [-1]) * size
+        contracted_neighbors = dict.fromkeys(out_edges, 0)
+        up_lists, down_lists = {}, {}
+
+        def shortcuts(node):
+            # Shortcuts needed if node were contracted now
+            needed = []
+            for source, (in_weight, _) in in_edges[node].items():
+                limits = {target: in_weight + out_weight for target, (out_weight, _) in out_edges[node].items() if target != source}
+                if not limits:
+                    continue
+                witness = cls._witness_search(out_edges, source, node, max(limits.values()))
+                for target, cost in limits.items():
+                    if witness.get(target, INF) > cost:
+                        needed.append((source, target, cost))
+            return needed
+
+        def priority(node):
+            edge_difference = len(shortcuts(node)) - len(in_edges[node]) - len(out_edges[node])
+            return edge_difference + contracted_neighbors[node]
+
+        queue = []
+        for node in out_edges:
+            queue.append((priority(node), node))
+            if monitor and len(queue) % PROGRESS_INTERVAL == 0:
+                monitor(0)
+        heapq.heapify(queue)
+        order = steps = 0
+        while queue:
+            steps += 1
+            if monitor and steps % PROGRESS_INTERVAL == 0:
+                monitor(order)
+            _, node = heapq.heappop(queue)
+            # Lazy update: re-evaluate and put back if it is no longer the minimum
+            current = priority(node)
+            if queue and current > queue[0][0]:
+                heapq.heappush(queue, (current, node))
+                continue
+
+            rank[node] = order
+            order += 1
+            up_lists[node] = [(target, weight, middle) for target, (weight, middle) in out_edges[node].items()]
+            down_lists[node] = [(source, weight, middle) for source, (weight, middle) in in_edges[node].items()]
+
+            for source, target, cost in shortcuts(node):
+                if cost < out_edges[source].get(target, (INF,))[0]:
+                    out_edges[source][target] = (cost, node)
+                    in_edges[target][source] = (cost, node)
+            for neighbor in set(out_edges[node]) | set(in_edges[node]):
+                out_edges[neighbor].pop(node, None)
+                in_edges[neighbor].pop(node, None)
+                contracted_neighbors[neighbor] += 1
+            del out_edges[node], in_edges[node]
+
+        return cls(size, rank, _csr(size, up_lists), _csr(size, down_lists),
+                   graph.content_hash, profile, graph.cost_tables.get(profile))
+
+    @staticmethod
+    def _witness_search(out_edges, source, skipped, limit):
+        # Bounded Dijkstra from source that ignores the node being contracted
+        dist = {source: 0}
+        priority_queue = [(0, source)]
+        settled = 0
+        while priority_queue and settled < WITNESS_SETTLE_LIMIT:
+            cost, node = heapq.heappop(priority_queue)
+            if cost > dist[node]:
+                continue
+            if cost > limit:
+                break
+            settled += 1
+            for neighbor, (weight, _) in out_edges[node].items():
+                if neighbor == skipped:
+                    continue
+                new_cost = cost + weight
+                if new_cost < dist.get(neighbor, INF):
+                    dist[neighbor] = new_cost
+                    heapq.heappush(priority_queue, (new_cost, neighbor))
+        return dist
+
+    def query(self, start, end):
+        """
+        Bidirectional upward search. Returns (list_of_cells, cost, expanded),
+        path None if end cannot be reached.
+        """
+        if self.rank[start] == -1 or self.rank[end] == -1:
+            return (([start], 0, 0) if start == end else (None, INF, 0))
+
+        dist = ({start: 0}, {end: 0})
+        parent = ({start: None}, {end: None}) # node -> (previous node, edge slot)
+        queues = ([(0, start)], [(0, end)])
+        arcs = ((self.up_offsets, self.up_targets, self.up_weights),
+                (self.down_offsets, self.down_sources, self.down_weights))
+        best, meeting = INF, None
+        expanded = 0
+
+        while queues[0] or queues[1]:
+            # Advance the direction with the smaller key; a direction stops once its key reaches best
+            side = 0 if queues[0] and (not queues[1] or queues[0][0][0] <= queues[1][0][0]) else 1
+            cost, node = heapq.heappop(queues[side])
+            if cost >= best:
+                queues[side].clear()
+                continue
+            if cost > dist[side][node]:
+                continue
+            expanded += 1
+            if node in dist[1 - side] and cost + dist[1 - side][node] < best:
+                best = cost + dist[1 - side][node]
+                meeting = node
+
+            offsets, others, weights = arcs[side]
+            for slot in range(offsets[node], offsets[node + 1]):
+                neighbor = others[slot]
+                new_cost = cost + weights[slot]
+                if new_cost < dist[side].get(neighbor, INF):
+                    dist[side][neighbor] = new_cost
+                    parent[side][neighbor] = (node, slot)
+                    heapq.heappush(queues[side], (new_cost, neighbor))
+
+        if meeting is None:
+            return None, INF, expanded
+
+        # Hierarchy edges start -> meeting, then meeting -> end
+        forward = []
+        node = meeting
+        while parent[0][node] is not None:
+            previous, slot = parent[0][node]
+            forward.append((previous, node, self.up_middle[slot]))
+            node = previous
+        forward.reverse()
+        backward = []
+        node = meeting
+        while parent[1][node] is not None:
+            following, slot = parent[1][node]
+            backward.append((node, following, self.down_middle[slot]))
+            node = following
+
+        path = [start]
+        for source, target, middle in forward + backward:
+            self._unpack(source, target, middle, path)
+        return path, best, expanded
+
+    def _unpack(self, source, target, middle, path):
+        """Appends the original cells of edge source -> target (without source)."""
+        stack = [(source, target, middle)]
+        while stack:
+            first, last, via = stack.pop()
+            if via == -1:
+                path.append(last)
+                continue
+            # Both halves were stored at the middle node when it was contracted
+            stack.append((via, last, self._middle_of(self.up_offsets, self.up_targets, self.up_middle, via, last)))
+            stack.append((first, via, self._middle_of(self.down_offsets, self.down_sources, self.down_middle, via, first)))
+
+    @staticmethod
+    def _middle_of(offsets, others, middles, node, other):
+        for slot in range(offsets[node], offsets[node + 1]):
+            if others[slot] == other:
+                return middles[slot]
+        raise ValueError(f"Missing hierarchy edge between {node} and {other}")
+
+    # --- Persistence ---
+
+    def save(self, path):
+        header = {
+            'kind': 'contraction_hierarchy',
+            'size': self.size,
+            'content_hash': self.content_hash,
+            'profile': self.profile,
+            'costs': self.costs,
+        }
+        arrays = [('rank', self.rank),
+                  ('up_offsets', self.up_offsets), ('up_targets', self.up_targets),
+                  ('up_weights', self.up_weights), ('up_middle', self.up_middle),
+                  ('down_offsets', self.down_offsets), ('down_sources', self.down_sources),
+                  ('down_weights', self.down_weights), ('down_middle', self.down_middle)]
+        return map_cache.write_sections(path, header, arrays)
+
+    @classmethod
+    def load(cls, path):
+        """Memory-maps a saved hierarchy, None if missing or invalid."""
+        header, sections = map_cache.open_sections(path)
+        if header is None or header.get('kind') != 'contraction_hierarchy':
+            return None
+        try:
+            up = tuple(sections[name] for name in ('up_offsets', 'up_targets', 'up_weights', 'up_middle'))
+            down = tuple(sections[name] for name in ('down_offsets', 'down_sources', 'down_weights', 'down_middle'))
+            return cls(header['size'], sections['rank'], up, down,
+                       header['content_hash'], header['profile'], header['costs'])
+        except KeyError:
+            return None
+
+
+def hierarchy_path(csv_path, profile):
+    return f"{os.path.splitext(csv_path)[0]}.{profile}{CH_EXTENSION}"
+
+
+def built_hierarchy(graph, profile=None):
+    """The hierarchy of a graph profile if it is already built or loaded, else None."""
+    return graph.built(('ch', profile or graph.profile))
+
+
+def hierarchy_for(graph, profile=None, path=None, monitor=None):
+    """
+    ContractionHierarchy of a graph profile, built once and kept with the graph.
+    path: file next to the map, by default the one of graph.index_path
+    (maps loaded with MapLoader(use_cache=True)). A saved index for the same
+    map content and profile costs is loaded instead of rebuilt, a new one
+    is saved there.
+    Maps edited in memory (version > 0) no longer match their file: the
+    index is built but not saved.
+    The build runs outside the graph lock (edits meanwhile discard it) and
+    checks monitor, so a background job building it can be cancelled.
+    """
+    profile = profile or graph.profile
+    hierarchy = built_hierarchy(graph, profile)
+    if hierarchy is not None:
+        return hierarchy
+    version = graph.version
+    if path is None and graph.index_path:
+        path = hierarchy_path(graph.index_path, profile)
+    if graph.version:
+        path = None
+
+    if path:
+        saved = ContractionHierarchy.load(path)
+        if (saved is not None and graph.content_hash and saved.content_hash == graph.content_hash
+                and saved.size == graph.size and saved.costs == graph.cost_tables.get(profile)):
+            return graph.keep(('ch', profile), saved, version)
+    hierarchy = ContractionHierarchy.build(graph, profile, monitor)
+    if path and graph.content_hash and graph.version == version:
+        hierarchy.save(path)
+    return graph.keep(('ch', profile), hierarchy, version)
@@ -0,0 +1,205 @@
+import heapq
+from array import array
+from models.compact_graph import CELL_CODES, BLOCK
+from models.shortest_path_tree import PROGRESS_INTERVAL
+
+INF = float('inf')
+# Cells where a driver can choose (or must stop) are never contracted
+DECISION_CODES = (CELL_CODES['C'], CELL_CODES['ND'], CELL_CODES['SF'])
+
+
+class CorridorGraph:
+    """
+    Contracted view of a CompactGraph: every forced-move chain (cells with
+    exactly one way in and one way out, like the L/R/N/S runs between
+    intersections) becomes a single edge between decision points
+    (C, ND, SF, dead ends, merges). Each contracted edge keeps the ids of
+    the original edges it replaces, so paths expand back to every cell and
+    costs can be summed for any weight profile.
+    The cells, edges and weights of the graph are captured once here:
+    searches (possibly on a worker thread) only read that snapshot, so an
+    edit of the graph meanwhile cannot break them, only make them stale
+    (see version).
+    """
+    def __init__(self, graph):
+        self.graph = graph
+        self.version = graph.version
+        self.cells = bytes(graph.cells)
+        self.offsets = graph.offsets
+        self.targets = graph.targets
+        self.profiles = graph.profiles # Edits replace the dict, never change it
+        size = graph.size
+        offsets = self.offsets
+        out_degree = [offsets[i + 1] - offsets[i] for i in range(size)]
+        in_degree = [0] * size
+        for target in self.targets:
+            in_degree[target] += 1
+        decision = bytearray(size)
+        for index, code in enumerate(self.cells):
+            if code == BLOCK:
+                continue
+            if code in DECISION_CODES or out_degree[index] != 1 or in_degree[index] != 1:
+                decision[index] = 1
+
+        self.node_of = array('i', [-1]) * size  # cell -> contracted node id
+        self.nodes = array('i')                 # contracted node id -> cell
+        self.chain_of = array('i', [-1]) * size  # chain cell -> contracted edge id
+        self.position = array('i', [-1]) * size  # chain cell -> index of its entering edge in the chain
+        self.edge_from = array('i')
+        self.edge_to = array('i')
+        self.chain_offsets = array('i', [0])     # contracted edge -> slice of chain_edges
+        self.chain_edges = array('i')            # original edge ids, in travel order
+        self._adjacency = {}                     # contracted node -> [contracted edge ids]
+
+        for index in range(size):
+            if decision[index]:
+                self._add_node(index)
+        for index in range(size):
+            if decision[index]:
+                self._contract_from(index, decision)
+
+        # Pure cycles of chain cells have no decision point: promote one cell each
+        for index in range(size):
+            if self.cells[index] != BLOCK and not decision[index] and self.chain_of[index] == -1:
+                decision[index] = 1
+                self._add_node(index)
+                self._contract_from(index, decision)
+
+        self._weights = {}
+
+    def _add_node(self, index):
+        self.node_of[index] = len(self.nodes)
+        self.nodes.append(index)
+        self._adjacency[len(self.nodes) - 1] = []
+
+    def _contract_from(self, start, decision):
+        offsets, targets = self.offsets, self.targets
+        for first in range(offsets[start], offsets[start + 1]):
+            contracted = len(self.edge_from)
+            edge = first
+            cell = targets[edge]
+            position = 0
+            while True:
+                self.chain_edges.append(edge)
+                if decision[cell]:
+                    break
+                self.chain_of[cell] = contracted
+                self.position[cell] = position
+                position += 1
+                edge = offsets[cell] # Chain cells have exactly one outgoing edge
+                cell = targets[edge]
+            self.edge_from.append(self.node_of[start])
+            self.edge_to.append(self.node_of[cell])
+            self.chain_offsets.append(len(self.chain_edges))
+            self._adjacency[self.node_of[start]].append(contracted)
+
+    @property
+    def node_count(self):
+        return len(self.nodes)
+
+    @property
+    def edge_count(self):
+        return len(self.edge_from)
+
+    def edge_weights(self, profile=None):
+        """Contracted edge costs of a profile, summed once and kept."""
+        name = profile or self.graph.profile
+        if name not in self._weights:
+            weights = self.profiles[name]
+            chain_edges, chain_offsets = self.chain_edges, self.chain_offsets
+            self._weights[name] = array('i', (
+                sum(weights[chain_edges[k]] for k in range(chain_offsets[e], chain_offsets[e + 1]))
+                for e in range(self.edge_count)
+            ))
+        return self._weights[name]
+
+    def _chain_cells(self, contracted, first, last):
+        # Cells entered by chain edges first..last-1 of a contracted edge
+        targets = self.targets
+        base = self.chain_offsets[contracted]
+        return [targets[self.chain_edges[base + k]] for k in range(first, last)]
+
+    def _chain_cost(self, contracted, first, last, weights):
+        base = self.chain_offsets[contracted]
+        return sum(weights[self.chain_edges[base + k]] for k in range(first, last))
+
+    def find_path(self, start, end, profile=None, monitor=None):
+        """
+        Shortest path between two cells, which may lie in the middle of a
+        corridor. Returns (list_of_cells, cost, expanded), path None if unreachable.
+        monitor: called with the expanded count every PROGRESS_INTERVAL nodes.
+        """
+        cells = self.cells
+        if cells[start] == BLOCK or cells[end] == BLOCK:
+            return (([start], 0, 0) if start == end else (None, INF, 0))
+        if start == end:
+            return [start], 0, 0
+
+        weights = self.profiles[profile or self.graph.profile]
+        edge_weights = self.edge_weights(profile)
+
+        # Start inside a corridor: the only way out is forward to its head
+        head_path, head_cost = [], 0
+        source = self.node_of[start]
+        if source == -1:
+            contracted = self.chain_of[start]
+            position = self.position[start]
+            length = self.chain_offsets[contracted + 1] - self.chain_offsets[contracted]
+            if self.chain_of[end] == contracted and self.position[end] > position:
+                last = self.position[end] + 1
+                return [start] + self._chain_cells(contracted, position + 1, last), self._chain_cost(contracted, position + 1, last, weights), 0
+            head_path = [start] + self._chain_cells(contracted, position + 1, length - 1)
+            head_cost = self._chain_cost(contracted, position + 1, length, weights)
+            source = self.edge_to[contracted]
+
+        # End inside a corridor: it can only be reached through that corridor's tail
+        tail_path, tail_cost = [], 0
+        target = self.node_of[end]
+        if target == -1:
+            contracted = self.chain_of[end]
+            last = self.position[end] + 1
+            tail_path = self._chain_cells(contracted, 0, last)
+            tail_cost = self._chain_cost(contracted, 0, last, weights)
+            target = self.edge_from[contracted]
+
+        dist = {source: 0}
+        parent = {source: -1} # contracted node -> contracted edge used to reach it
+        priority_queue = [(0, source)]
+        expanded = 0
+        report = PROGRESS_INTERVAL if monitor else -1
+        while priority_queue:
+            cost, node = heapq.heappop(priority_queue)
+            if cost > dist[node]:
+                continue
+            expanded += 1
+            if expanded == report:
+                monitor(expanded)
+                report += PROGRESS_INTERVAL
+            if node == target:
+                break
+            for contracted in self._adjacency[node]:
+                neighbor = self.edge_to[contracted]
+                new_cost = cost + edge_weights[contracted]
+                if new_cost < dist.get(neighbor, INF):
+                    dist[neighbor] = new_cost
+                    parent[neighbor] = contracted
+                    heapq.heappush(priority_queue, (new_cost, neighbor))
+        else:
+            return None, INF, expanded
+
+        # Expand the contracted edges back to cells
+        used = []
+        node = target
+        while parent[node] != -1:
+            used.append(parent[node])
+            node = self.edge_from[parent[node]]
+        path = head_path + [self.nodes[source]]
+        for contracted in reversed(used):
+            length = self.chain_offsets[contracted + 1] - self.chain_offsets[contracted]
+            path += self._chain_cells(contracted, 0, length)
+        return path + tail_path, head_cost + dist[target] + tail_cost, expanded
+
+
+def corridor_graph(graph):
+    """CorridorGraph of graph, built on first use and kept with the graph."""
+    return graph.cached('corridors', CorridorGraph)
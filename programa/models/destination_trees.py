@@ -0,0 +1,178 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from models.shortest_path_tree import shortest_path_tree, UNREACHABLE
+
+INF = float('inf')
+# Cells kept over all trees; each tree holds two int32 arrays of rows * cols
+# entries (8 bytes a cell), so this is about 128 MB, 4 trees of a 2000x2000 map
+DEFAULT_CAPACITY = 16_000_000
+
+
+class ReverseTree:
+    """
+    Shortest routes from every cell to one destination under one profile:
+    a Dijkstra run from the destination over the reversed adjacency.
+    next_hop[v] is the following cell on the best route v -> destination.
+    """
+    __slots__ = ('destination', 'profile', 'dist', 'next_hop')
+
+    def __init__(self, destination, profile, dist, next_hop):
+        self.destination = destination
+        self.profile = profile
+        self.dist = dist          # array('i'), UNREACHABLE if there is no route
+        self.next_hop = next_hop  # array('i'), -1 at the destination and unreachable cells
+
+    @classmethod
+    def build(cls, graph, destination, profile):
+        rev_offsets, rev_sources, _ = graph.reverse_adjacency()
+        dist, next_hop = shortest_path_tree(rev_offsets, rev_sources, graph.reverse_weights(profile),
+                                            destination, graph.size, parents=True)
+        return cls(destination, profile, dist, next_hop)
+
+    def route(self, start):
+        """Parent-pointer walk, no search. Returns (list_of_cells, cost) or (None, inf)."""
+        if self.dist[start] == UNREACHABLE:
+            return None, INF
+        path = [start]
+        current = start
+        while current != self.destination:
+            current = self.next_hop[current]
+            path.append(current)
+        return path, self.dist[start]
+
+
+class DestinationTrees:
+    """
+    Store of ReverseTrees for saved destinations, bounded by the cells of
+    all the trees it keeps (least recently used go first), keyed by
+    (graph token, map version, destination cell, profile).
+    schedule() saves a destination and builds its trees on a background
+    thread; route() answers from a finished tree, or returns None so the
+    caller can fall back to a regular search. Once the map version moves on
+    (edits, incidents, cost updates) the trees of the older versions are
+    dropped and those of saved destinations are built again: by refresh(),
+    or on the first miss of tree().
+    """
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity    # In cells, see DEFAULT_CAPACITY
+        self._trees = OrderedDict() # key -> ReverseTree
+        self._cells = 0             # Cells of the trees in _trees
+        self._pending = {}          # key -> Future
+        self._saved = {}            # graph token -> saved destination cells
+        self._generation = 0        # Bumped by invalidate(): late builds are dropped
+        self._lock = threading.Lock()
+        self._executor = None
+
+    @staticmethod
+    def key(graph, destination, profile):
+        return (graph.token, graph.version, destination, profile)
+
+    def schedule(self, graph, destination, profiles=None):
+        """
+        Saves destination and starts building its trees for each profile
+        (all by default) in the background. Returns the futures of the new builds.
+        """
+        futures = []
+        if graph.size > self.capacity:
+            return futures # A tree of this map would not fit
+        with self._lock:
+            self._saved.setdefault(graph.token, set()).add(destination)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='destination-trees')
+            for profile in profiles or list(graph.profiles):
+                key = self.key(graph, destination, profile)
+                if key in self._trees or key in self._pending:
+                    continue
+                future = self._executor.submit(self._build, graph, destination, profile, key, self._generation)
+                self._pending[key] = future
+                futures.append(future)
+        return futures
+
+    def refresh(self, graph):
+        """Schedules the trees of every saved destination for the current map version."""
+        with self._lock:
+            saved = list(self._saved.get(graph.token, ()))
+        return [future for destination in saved for future in self.schedule(graph, destination)]
+
+    def _build(self, graph, destination, profile, key, generation):
+        try:
+            tree = ReverseTree.build(graph, destination, profile)
+            with self._lock:
+                # The map may have changed during the build: its tree is not stored
+                if generation == self._generation and graph.version == key[1]:
+                    self._store(key, tree)
+            return tree
+        finally:
+            with self._lock:
+                if self._pending.get(key) is not None and generation == self._generation:
+                    del self._pending[key] # Also after a failed build, so it can be scheduled again
+
+    def _store(self, key, tree):
+        token, version = key[:2]
+        for old in [old for old in self._trees if old[0] == token and old[1] < version]:
+            self._remove(old) # Older versions of the map never match again
+        if key in self._trees:
+            self._remove(key)
+        self._trees[key] = tree
+        self._cells += len(tree.dist)
+        while self._cells > self.capacity and len(self._trees) > 1:
+            self._remove(next(iter(self._trees)))
+
+    def _remove(self, key):
+        self._cells -= len(self._trees.pop(key).dist)
+
+    def tree(self, graph, destination, profile=None, wait=False):
+        """
+        Finished tree of destination, or None. wait: block on a pending build,
+        or build it on the spot if none was scheduled. A saved destination
+        without a tree for the current map version gets one scheduled.
+        """
+        key = self.key(graph, destination, profile or graph.profile)
+        with self._lock:
+            tree = self._trees.get(key)
+            if tree is not None:
+                self._trees.move_to_end(key)
+                return tree
+            future = self._pending.get(key)
+            saved = destination in self._saved.get(graph.token, ())
+        if not wait:
+            if future is None and saved:
+                self.schedule(graph, destination, [key[3]])
+            return None
+        if future is not None:
+            return future.result()
+        tree = ReverseTree.build(graph, destination, key[3])
+        with self._lock:
+            self._store(key, tree)
+        return tree
+
+    def route(self, graph, start, destination, profile=None, wait=False):
+        """(list_of_cells, cost) from start to a saved destination, None without a tree."""
+        tree = self.tree(graph, destination, profile, wait)
+        return tree.route(start) if tree is not None else None
+
+    def discard(self, graph, destination):
+        """Forgets the trees of a destination that is no longer saved."""
+        with self._lock:
+            self._saved.get(graph.token, set()).discard(destination)
+            for key in [key for key in self._trees if key[2] == destination and key[0] == graph.token]:
+                self._remove(key)
+
+    def invalidate(self):
+        """Drops every tree and saved destination, pending builds finish but are not stored (map reload)."""
+        with self._lock:
+            self._generation += 1
+            self._trees.clear()
+            self._cells = 0
+            self._pending.clear()
+            self._saved.clear()
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def __len__(self):
+        return len(self._trees)
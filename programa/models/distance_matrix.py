@@ -0,0 +1,99 @@
+import heapq
+from models.shortest_path_tree import UNREACHABLE
+
+# Graph arrays of a worker process, views over the parent's shared memory block
+_worker_block = None
+_worker_graph = None
+
+
+def costs_to_targets(offsets, targets, weights, source, wanted):
+    """
+    Dijkstra from source that stops as soon as every cell of wanted is
+    settled. Returns {cell: cost} for the wanted cells that were reached.
+    """
+    remaining = set(wanted)
+    found = {}
+    dist = {source: 0}
+    priority_queue = [(0, source)]
+    while priority_queue and remaining:
+        current_cost, current = heapq.heappop(priority_queue)
+        if current_cost > dist[current]:
+            continue
+        if current in remaining:
+            found[current] = current_cost
+            remaining.discard(current)
+        for edge in range(offsets[current], offsets[current + 1]):
+            neighbor = targets[edge]
+            new_cost = current_cost + weights[edge]
+            if new_cost < dist.get(neighbor, UNREACHABLE):
+                dist[neighbor] = new_cost
+                heapq.heappush(priority_queue, (new_cost, neighbor))
+    return found
+
+
+def _share(arrays):
+    """Copies int arrays into one shared memory block. Returns (block, lengths)."""
+    from multiprocessing import shared_memory
+    lengths = [len(values) for values in arrays]
+    block = shared_memory.SharedMemory(create=True, size=max(4, 4 * sum(lengths)))
+    view = block.buf.cast('i')
+    position = 0
+    for values in arrays:
+        view[position:position + len(values)] = memoryview(values)
+        position += len(values)
+    view.release()
+    return block, lengths
+
+
+def _attach(name, lengths):
+    global _worker_block, _worker_graph
+    from multiprocessing import shared_memory
+    # Only the parent, which created the block, unlinks it
+    _worker_block = shared_memory.SharedMemory(name=name)
+    view = _worker_block.buf.cast('i')
+    parts = []
+    position = 0
+    for length in lengths:
+        parts.append(view[position:position + length])
+        position += length
+    _worker_graph = tuple(parts)
+
+
+def _worker_row(task):
+    source, wanted = task
+    offsets, targets, weights = _worker_graph
+    return costs_to_targets(offsets, targets, weights, source, wanted)
+
+
+def compute_rows(graph, tasks, profile, workers=1):
+    """
+    Runs one bounded search per (source, wanted cells) task and returns the
+    {cell: cost} dicts in task order. With workers > 1 the searches run in a
+    process pool; offsets, targets and weights are placed once in shared
+    memory that every worker maps, nothing graph-sized is pickled.
+    """
+    weights = graph.profiles[profile]
+    if workers <= 1 or len(tasks) <= 1:
+        return [costs_to_targets(graph.offsets, graph.targets, weights, source, wanted) for source, wanted in tasks]
+
+    # multiprocessing is only imported by parallel runs (it is slow to import)
+    from concurrent.futures import ProcessPoolExecutor
+    block, lengths = _share([graph.offsets, graph.targets, weights])
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach, initargs=(block.name, lengths)) as pool:
+            return list(pool.map(_worker_row, tasks, chunksize=max(1, len(tasks) // (4 * workers))))
+    finally:
+        block.close()
+        block.unlink()
+
+
+def fill_matrix(np, sources, targets, rows):
+    """int32 matrix of len(sources) x len(targets), UNREACHABLE where no route exists."""
+    matrix = np.full((len(sources), len(targets)), UNREACHABLE, dtype=np.int32)
+    columns = {}
+    for column, target in enumerate(targets):
+        columns.setdefault(target, []).append(column)
+    for row, found in enumerate(rows):
+        for cell, cost in found.items():
+            matrix[row, columns[cell]] = cost
+    return matrix
@@ -0,0 +1,207 @@
+import heapq
+from models.shortest_path_tree import PROGRESS_INTERVAL
+
+INF = float('inf')
+
+
+class DynamicRoute:
+    """
+    Active route kept up to date with D* Lite (Koenig & Likhachev).
+    The search runs backwards from the goal over a CompactGraph, so when
+    edges change (closures, accidents, new costs) only the cells whose
+    distance to the goal is affected are re-expanded. The vehicle may move
+    along the route between changes (move_to).
+
+    Changed costs live in an overlay of this route, keyed by cell (the cost
+    of entering it), so they survive in-place edits that renumber edges:
+    the shared graph is never modified. Changes of the graph itself
+    (incidents, map edits) are followed with sync().
+    """
+    def __init__(self, graph, start, goal, profile=None, overrides=None, monitor=None):
+        self.graph = graph
+        self.profile = profile or graph.profile
+        self.overrides = dict(overrides or {})  # cell -> cost of entering it on this route (INF = closed)
+        self.start = start
+        self.goal = goal
+        self.expanded = 0    # Cells expanded since the route was created
+        self._last = start
+        self._km = 0
+        self._read_graph()
+        self._scale = self._lowest_cost()
+        self._reset()
+        self._compute(monitor)
+
+    def _read_graph(self):
+        # Arrays of one graph version: an edit replaces them, these stay intact
+        graph = self.graph
+        self.version = graph.version
+        self.offsets, self.targets = graph.offsets, graph.targets
+        self.weights = graph.profiles[self.profile]
+        self.rev_offsets, self.rev_sources, _ = graph.reverse_adjacency()
+
+    def _lowest_cost(self):
+        return min([self.graph.min_weight(self.profile)] + list(self.overrides.values()))
+
+    def _reset(self):
+        self.g = {}
+        self.rhs = {self.goal: 0}
+        self._open = {self.goal: self._key(self.goal)}  # cell -> queued key
+        self._queue = [(self._open[self.goal], self.goal)]
+
+    # --- Costs ---
+
+    def edge_cost(self, edge):
+        if self.overrides:
+            return self.overrides.get(self.targets[edge], self.weights[edge])
+        return self.weights[edge]
+
+    def _heuristic(self, cell):
+        # Admissible distance from the current start to cell
+        cols = self.graph.cols
+        y, x = divmod(cell, cols)
+        start_y, start_x = divmod(self.start, cols)
+        return self._scale * (abs(x - start_x) + abs(y - start_y))
+
+    def _key(self, cell):
+        best = min(self.g.get(cell, INF), self.rhs.get(cell, INF))
+        return (best + self._heuristic(cell) + self._km, best)
+
+    # --- D* Lite ---
+
+    def _update(self, cell):
+        if cell != self.goal:
+            best = INF
+            g = self.g
+            targets = self.targets
+            for edge in range(self.offsets[cell], self.offsets[cell + 1]):
+                candidate = self.edge_cost(edge) + g.get(targets[edge], INF)
+                if candidate < best:
+                    best = candidate
+            self.rhs[cell] = best
+        self._open.pop(cell, None)
+        if self.g.get(cell, INF) != self.rhs.get(cell, INF):
+            key = self._key(cell)
+            self._open[cell] = key
+            heapq.heappush(self._queue, (key, cell))
+
+    def _predecessors(self, cell):
+        rev_sources = self.rev_sources
+        return [rev_sources[slot] for slot in range(self.rev_offsets[cell], self.rev_offsets[cell + 1])]
+
+    def _compute(self, monitor=None):
+        queue, open_keys = self._queue, self._open
+        g, rhs = self.g, self.rhs
+        start = self.start
+        while queue:
+            key, cell = queue[0]
+            if open_keys.get(cell) != key:
+                heapq.heappop(queue) # Stale entry
+                continue
+            if not (key < self._key(start) or rhs.get(start, INF) != g.get(start, INF)):
+                break
+            heapq.heappop(queue)
+            self.expanded += 1
+            if monitor and self.expanded % PROGRESS_INTERVAL == 0:
+                monitor(self.expanded)
+            new_key = self._key(cell)
+            if key < new_key:
+                open_keys[cell] = new_key
+                heapq.heappush(queue, (new_key, cell))
+            elif g.get(cell, INF) > rhs.get(cell, INF):
+                g[cell] = rhs[cell]
+                del open_keys[cell]
+                for previous in self._predecessors(cell):
+                    self._update(previous)
+            else:
+                g[cell] = INF
+                for previous in self._predecessors(cell) + [cell]:
+                    self._update(previous)
+
+    # --- Changes ---
+
+    def set_costs(self, changes, monitor=None):
+        """
+        Applies {cell: new cost of entering it} (INF closes the cell, None
+        restores the graph cost) and repairs the route. Returns the number
+        of cells expanded by the repair.
+        """
+        for cell, cost in changes.items():
+            if cost is None:
+                self.overrides.pop(cell, None)
+            else:
+                self.overrides[cell] = cost
+        return self._repair(set(changes), (), monitor)
+
+    def sync(self, touched, monitor=None):
+        """
+        Follows the shared graph after in-place changes (MapEditor edits,
+        incident batches): touched holds every cell whose outgoing edges or
+        entry cost changed since the last sync. Only the cells whose distance
+        to the goal changes are expanded again. Returns the cells expanded.
+        """
+        self._read_graph()
+        return self._repair(set(touched), touched, monitor)
+
+    def _repair(self, entered, rebuilt, monitor):
+        # entered: cells whose entry cost changed; rebuilt: cells whose outgoing edges changed
+        before = self.expanded
+        lowest = self._lowest_cost()
+        if lowest < self._scale:
+            # The heuristic would no longer be admissible: restart with a safe scale
+            self._scale = lowest
+            self._km = 0
+            self._last = self.start
+            self._reset()
+            self._compute(monitor)
+            return self.expanded - before
+
+        self._km += self._heuristic(self._last)
+        self._last = self.start
+        changed = set(rebuilt)
+        for cell in entered:
+            changed.update(self._predecessors(cell))
+        for cell in changed:
+            self._update(cell)
+        self._compute(monitor)
+        return self.expanded - before
+
+    def close_cells(self, cells):
+        """Blocks cells (accident, works): no route of this overlay may enter them."""
+        return self.set_costs(dict.fromkeys(cells, INF))
+
+    def reopen_cells(self, cells):
+        return self.set_costs(dict.fromkeys(cells))
+
+    def move_to(self, cell):
+        """The vehicle advanced (or left the route): plan from cell from now on."""
+        self.start = cell
+        self._km += self._heuristic(self._last)
+        self._last = cell
+        self._compute()
+
+    # --- Result ---
+
+    @property
+    def cost(self):
+        return self.g.get(self.start, INF) if self.start != self.goal else 0
+
+    def path(self):
+        """Cells from the current start to the goal, None if it was cut off."""
+        if self.cost == INF:
+            return None
+        g = self.g
+        offsets, targets = self.offsets, self.targets
+        path = [self.start]
+        current = self.start
+        while current != self.goal:
+            best, following = INF, None
+            for edge in range(offsets[current], offsets[current + 1]):
+                target = targets[edge]
+                candidate = self.edge_cost(edge) + g.get(target, INF)
+                if candidate < best:
+                    best, following = candidate, target
+            if following is None:
+                return None
+            path.append(following)
+            current = following
+        return path
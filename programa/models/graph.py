@@ -1,3 +1,16 @@
+import warnings
+
+
+def _deprecated(name, value):
+    # Search state moved into each query (Pathfinder keeps it in dicts), so
+    # these only report the value of a node no search has touched
+    def getter(self):
+        warnings.warn(f"{type(self).__name__}.{name} is deprecated: searches no longer store state on the graph",
+                      DeprecationWarning, stacklevel=2)
+        return value
+    return property(getter)
+
+
 class Node:
     def __init__(self, x, y, value):
         self.x = x
@@ -5,9 +18,11 @@ class Node:
         self.value = value  # 0, L, N, S, R, C, SF, ND
         self.id = f"{x},{y}"
         self.edges = []
-        self.h_cost = 0  # Heuristic for A* (optional, using Dijkstra first)
-        self.g_cost = float('inf')
-        self.parent = None
+
+    # Deprecated, read-only: Pathfinder.find_path returns the path and its cost
+    h_cost = _deprecated('h_cost', 0)
+    g_cost = _deprecated('g_cost', float('inf'))
+    parent = _deprecated('parent', None)
 
     def add_edge(self, target_node, weight):
         self.edges.append((target_node, weight))
@@ -31,6 +46,6 @@ class Graph:
         return list(self.nodes.values())
 
     def reset_costs(self):
-        for node in self.nodes.values():
-            self.g_cost = float('inf')
-            self.parent = None
+        """Deprecated no-op: searches keep their costs per query."""
+        warnings.warn("Graph.reset_costs is deprecated: searches no longer store state on the graph",
+                      DeprecationWarning, stacklevel=2)
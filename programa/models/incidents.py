@@ -0,0 +1,365 @@
+import json
+import os
+import queue
+import threading
+import time
+from collections import namedtuple
+from models.dynamic_route import DynamicRoute, INF
+
+# Seconds during which incoming reports are merged into one batch
+DEFAULT_WINDOW = 0.5
+# Seconds between checks of a tailed file or an idle socket
+POLL_INTERVAL = 0.1
+
+# Kinds of report. accident/closure make the cell impassable, congestion
+# multiplies the cost of entering it, clear undoes any previous report.
+CLOSING_KINDS = ('accident', 'closure')
+INCIDENT_KINDS = CLOSING_KINDS + ('congestion', 'clear')
+# Cell value shown and routed as a closed street
+CLOSED_VALUE = 'B'
+
+# One report: {"type": "congestion", "x": 4, "y": 2, "factor": 2.5}
+Incident = namedtuple('Incident', ['kind', 'x', 'y', 'factor'])
+
+
+def parse_incident(line):
+    """Incident from one JSON line. Raises ValueError on malformed reports."""
+    try:
+        data = json.loads(line)
+        kind = data['type']
+        x, y = int(data['x']), int(data['y'])
+        factor = float(data.get('factor', 1))
+    except (KeyError, TypeError, AttributeError) as error:
+        raise ValueError(f"Malformed incident: {line!r}") from error
+    if kind not in INCIDENT_KINDS:
+        raise ValueError(f"Unknown incident type: {kind!r}")
+    if factor <= 0:
+        raise ValueError(f"Congestion factor must be positive: {factor}")
+    return Incident(kind, x, y, factor)
+
+
+def coalesce(incidents):
+    """Latest report per cell, in arrival order: {(x, y): Incident}."""
+    latest = {}
+    for incident in incidents:
+        latest.pop((incident.x, incident.y), None)
+        latest[(incident.x, incident.y)] = incident
+    return latest
+
+
+def tail_lines(path, stop, from_start=False, poll=POLL_INTERVAL):
+    """
+    Lines appended to a JSON-lines file, until stop (threading.Event) is set.
+    Waits for the file to exist, starts reading at its end unless from_start,
+    and starts over when the file is truncated.
+    """
+    handle = None
+    pending = ''
+    try:
+        while not stop.is_set():
+            if handle is None:
+                if not os.path.exists(path):
+                    from_start = True # A file created later is read whole
+                    stop.wait(poll)
+                    continue
+                handle = open(path, 'r', encoding='utf-8')
+                if not from_start:
+                    handle.seek(0, os.SEEK_END)
+            chunk = handle.readline()
+            if not chunk:
+                try:
+                    truncated = os.path.getsize(path) < handle.tell()
+                except OSError: # Removed: wait for a new file
+                    handle.close()
+                    handle = None
+                    truncated = False
+                if truncated:
+                    handle.seek(0)
+                    pending = ''
+                stop.wait(poll)
+                continue
+            pending += chunk
+            if pending.endswith('\n'):
+                yield pending
+                pending = ''
+    finally:
+        if handle is not None:
+            handle.close()
+
+
+def socket_lines(path, stop, poll=POLL_INTERVAL):
+    """
+    Lines sent by clients of a Unix stream socket listening at path, until
+    stop is set. Clients are served one after the other.
+    """
+    import socket # Only socket feeds pay for the import
+    if not hasattr(socket, 'AF_UNIX'):
+        raise OSError("Unix sockets are not available on this platform")
+    if os.path.exists(path):
+        os.unlink(path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        server.bind(path)
+        server.listen()
+        server.settimeout(poll)
+        while not stop.is_set():
+            try:
+                client, _ = server.accept()
+            except socket.timeout:
+                continue
+            with client:
+                client.settimeout(poll)
+                pending = b''
+                while not stop.is_set():
+                    try:
+                        data = client.recv(4096)
+                    except socket.timeout:
+                        continue
+                    if not data:
+                        break
+                    pending += data
+                    *lines, pending = pending.split(b'\n')
+                    for line in lines:
+                        yield line.decode('utf-8')
+    finally:
+        server.close()
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+class IncidentFeed:
+    """
+    Reads incident reports from a line source on a background thread and
+    groups them in time windows: the first report of a batch opens a window
+    of `window` seconds, every report received meanwhile joins it, and the
+    coalesced batch ({(x, y): Incident}) is passed to on_batch, on the
+    batching thread.
+
+    Without on_batch, batches wait in a thread-safe queue that the owner of
+    the graph drains with poll(): a Tk window calls it from its root.after
+    loop, since Tk may only be used from the mainloop thread.
+    """
+    def __init__(self, source, on_batch=None, window=DEFAULT_WINDOW):
+        self.source = source     # callable(stop_event) -> iterable of lines
+        self.on_batch = on_batch
+        self.window = window
+        self.batches = 0         # Batches delivered
+        self.rejected = 0        # Malformed lines skipped
+        self._queue = queue.Queue()
+        self._ready = queue.Queue()  # Batches for poll() when there is no on_batch
+        self._stop = threading.Event()
+        self._threads = []
+
+    @classmethod
+    def from_file(cls, path, on_batch=None, window=DEFAULT_WINDOW, from_start=False):
+        return cls(lambda stop: tail_lines(path, stop, from_start), on_batch, window)
+
+    @classmethod
+    def from_socket(cls, path, on_batch=None, window=DEFAULT_WINDOW):
+        return cls(lambda stop: socket_lines(path, stop), on_batch, window)
+
+    def start(self):
+        self._threads = [
+            threading.Thread(target=self._read, name='incident-reader', daemon=True),
+            threading.Thread(target=self._batch, name='incident-batcher', daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self, timeout=1.0):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    @property
+    def running(self):
+        return any(thread.is_alive() for thread in self._threads)
+
+    def poll(self):
+        """Batches completed since the last call, in order. Never blocks."""
+        batches = []
+        while True:
+            try:
+                batches.append(self._ready.get_nowait())
+            except queue.Empty:
+                return batches
+
+    def _read(self):
+        for line in self.source(self._stop):
+            if not line.strip():
+                continue
+            try:
+                self._queue.put(parse_incident(line))
+            except ValueError:
+                self.rejected += 1
+
+    def _batch(self):
+        while not self._stop.is_set():
+            try:
+                first = self._queue.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            incidents = [first]
+            deadline = time.monotonic() + self.window
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    incidents.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            batch = coalesce(incidents)
+            self.batches += 1
+            if self.on_batch:
+                self.on_batch(batch)
+            else:
+                self._ready.put(batch)
+
+
+class IncidentApplier:
+    """
+    Applies coalesced incident batches to the graph of a MapLoader: closures
+    become impassable 'B' cells (MapEditor, outside the undo journal) and
+    congestion scales the cost of entering the cell. Every batch results in
+    one cell edit and one weight update at most. Meant to run on the thread
+    that owns the graph (the Tk thread in the application).
+    """
+    def __init__(self, loader):
+        self.loader = loader
+        self.closed = {}     # index -> value the cell had before the closure
+        self.congested = {}  # index -> cost factor
+        self.eased = []      # Cells of the last batch that became cheaper to enter, or enterable again
+
+    def apply(self, batch):
+        """
+        batch: {(x, y): Incident}. Returns the sorted indices of the cells
+        whose edges or entry costs changed (self.eased: those that got cheaper).
+        Cells outside the map are ignored.
+        """
+        graph = self.loader.graph
+        edits = {}
+        factors = {}
+        eased = set()
+        for (x, y), incident in batch.items():
+            index = graph.index(x, y)
+            if index is None or graph.is_block(index):
+                continue
+            if incident.kind in CLOSING_KINDS:
+                if index not in self.closed:
+                    self.closed[index] = graph.value(index)
+                    edits[(x, y)] = CLOSED_VALUE
+            elif index in self.closed:
+                edits[(x, y)] = self.closed.pop(index)
+                eased.add(index)
+            if incident.kind == 'congestion' and incident.factor != 1:
+                if incident.factor < self.congested.get(index, 1):
+                    eased.add(index)
+                self.congested[index] = factors[index] = incident.factor
+            elif index in self.congested and incident.kind not in CLOSING_KINDS:
+                if self.congested.pop(index) > 1:
+                    eased.add(index)
+                factors[index] = 1
+
+        touched = set(factors)
+        if edits:
+            affected = [graph.index(x, y) for x, y in self.loader.edit_cells(edits, record=False)]
+            touched.update(affected)
+            # Rebuilt edges got plain profile costs: put congestion back on them
+            for index in self.loader.editor.affected_cells(affected):
+                if index in self.congested:
+                    factors.setdefault(index, self.congested[index])
+        graph.set_entry_costs(factors)
+        self.eased = sorted(eased)
+        return sorted(touched)
+
+
+class RouteLegs:
+    """
+    DynamicRoute of every leg (origin, destination) of the routes on screen,
+    kept between incident batches so each batch repairs them (D* Lite) instead
+    of searching again. A leg only knows the changes passed to revalidate:
+    start a new RouteLegs whenever the routes on screen are searched again.
+    Used by the thread that runs revalidate.
+    """
+    def __init__(self):
+        self._legs = {} # (origin, destination, profile) -> DynamicRoute
+
+    def __contains__(self, key):
+        return key in self._legs
+
+    def __len__(self):
+        return len(self._legs)
+
+    def repair(self, graph, origin, destination, profile, touched, monitor=None):
+        """The leg synced with touched (built the first time)."""
+        key = (origin, destination, profile)
+        # Out of the store while it changes: a cancelled repair leaves no half-synced leg
+        leg = self._legs.pop(key, None)
+        if leg is None or leg.graph is not graph:
+            leg = DynamicRoute(graph, origin, destination, profile, monitor=monitor)
+        else:
+            leg.sync(touched, monitor)
+        if leg.version == graph.version:
+            self._legs[key] = leg # Otherwise the map changed during the repair
+        return leg
+
+    def retain(self, keys):
+        """Drops the legs of routes no longer on screen."""
+        self._legs = {key: leg for key, leg in self._legs.items() if key in keys}
+
+
+def _may_shorten(graph, waypoints, path, eased, profile):
+    """
+    True if going through a cell that got cheaper could beat the route:
+    some leg via that cell has a lower bound (Manhattan distance times the
+    cheapest edge) under the current cost of the whole route.
+    """
+    offsets, targets, weights = graph.offsets, graph.targets, graph.profiles[profile]
+    cost = 0
+    for a, b in zip(path, path[1:]):
+        cost += min((weights[edge] for edge in range(offsets[a], offsets[a + 1]) if targets[edge] == b), default=INF)
+    scale = graph.min_weight(profile)
+    return any(scale * (graph.manhattan(origin, cell) + graph.manhattan(cell, destination)) < cost
+               for origin, destination in zip(waypoints, waypoints[1:]) for cell in eased)
+
+
+def revalidate(graph, routes, touched, profile=None, monitor=None, legs=None, eased=()):
+    """
+    Re-checks the routes on screen after an incident batch.
+    routes: {name: (waypoints, path)}, cell indices; a route is checked leg
+    by leg between its waypoints (start, stops..., end).
+    eased: touched cells that got cheaper or were reopened (IncidentApplier.eased).
+    legs: RouteLegs kept between calls. A route with legs there has them
+    repaired with the touched cells. Any other route is checked when it goes
+    through a touched cell, or when an eased cell may give it a shorter way
+    (costs that only went up elsewhere cannot); its legs are kept from then on.
+    monitor: passed to every repair (see DynamicRoute).
+    Returns {name: (list_of_cells or None, cost)} for the checked routes.
+    """
+    profile = profile or graph.profile
+    legs = RouteLegs() if legs is None else legs
+    touched = set(touched)
+    result = {}
+    used = set()
+    for name, (waypoints, path) in routes.items():
+        keys = [(origin, destination, profile) for origin, destination in zip(waypoints, waypoints[1:])]
+        used.update(keys)
+        if not path:
+            continue
+        if (touched.isdisjoint(path) and not any(key in legs for key in keys)
+                and not (eased and _may_shorten(graph, waypoints, path, eased, profile))):
+            continue
+        stitched, total = [waypoints[0]], 0
+        for key in keys:
+            leg = legs.repair(graph, key[0], key[1], profile, touched, monitor)
+            leg_path = leg.path()
+            if leg_path is None:
+                stitched, total = None, leg.cost
+                break
+            stitched += leg_path[1:]
+            total += leg.cost
+        result[name] = (stitched, total)
+    legs.retain(used)
+    return result
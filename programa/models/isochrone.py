@@ -0,0 +1,67 @@
+from array import array
+from bisect import bisect_left
+from models.shortest_path_tree import shortest_path_tree, UNREACHABLE
+
+
+class Isochrone:
+    """
+    Result of one bounded one-to-all search: the cost from source to every
+    cell (or from every cell to source when reverse) up to the largest of
+    budgets, under one traffic profile.
+    dist is an array('i') indexed by cell, UNREACHABLE beyond the budget.
+    version: graph version the costs belong to.
+    """
+    def __init__(self, source, budgets, profile, reverse, dist, version):
+        self.source = source
+        self.budgets = budgets
+        self.profile = profile
+        self.reverse = reverse
+        self.dist = dist
+        self.version = version
+
+    @property
+    def budget(self):
+        return self.budgets[-1]
+
+    def cost(self, cell):
+        """Cost between source and cell, None beyond the budget."""
+        value = self.dist[cell]
+        return None if value == UNREACHABLE else value
+
+    def cells(self, budget=None):
+        """Cells within budget (the largest one by default), in index order."""
+        limit = self.budget if budget is None else min(budget, self.budget)
+        return [cell for cell, value in enumerate(self.dist) if value <= limit]
+
+    def bands(self):
+        """
+        {cell: band} for every cell within the budget, band being the
+        position in budgets of the smallest budget that covers the cell.
+        """
+        budgets = self.budgets
+        return {cell: bisect_left(budgets, value) for cell, value in enumerate(self.dist) if value != UNREACHABLE}
+
+    def __len__(self):
+        return len(self.dist) - self.dist.count(UNREACHABLE)
+
+
+def isochrone(graph, cell, budgets, profile=None, reverse=False, monitor=None):
+    """
+    Every cell reachable from cell (reverse: every cell that can reach
+    it) with a cost of at most budgets, a number or several of them.
+    A single search bounded by the largest budget answers all of them.
+    profile: weight profile (the active one, i.e. of the current hour, by default).
+    monitor: see shortest_path_tree.
+    Returns an Isochrone.
+    """
+    budgets = tuple(sorted(set(budgets))) if isinstance(budgets, (list, tuple, set)) else (budgets,)
+    if not budgets or budgets[0] < 0:
+        raise ValueError(f"Budgets must be non-negative: {budgets}")
+    profile = profile or graph.profile
+    if reverse:
+        offsets, targets, _ = graph.reverse_adjacency()
+        weights = graph.reverse_weights(profile)
+    else:
+        offsets, targets, weights = graph.offsets, graph.targets, graph.profiles[profile]
+    dist, _ = shortest_path_tree(offsets, targets, weights, cell, graph.size, budget=budgets[-1], monitor=monitor)
+    return Isochrone(cell, budgets, profile, reverse, dist, graph.version)
@@ -0,0 +1,132 @@
+from array import array
+from models.shortest_path_tree import shortest_path_tree, UNREACHABLE
+
+INF = float('inf')
+DEFAULT_LANDMARKS = 6
+
+# Graph arrays of the worker processes, sent once by the pool initializer
+_worker_graph = None
+
+
+def _init_worker(size, forward, reverse):
+    global _worker_graph
+    _worker_graph = (size, forward, reverse)
+
+
+def _worker_table(task):
+    landmark, profile, reverse = task
+    size, forward, backward = _worker_graph
+    offsets, targets, weights = (backward if reverse else forward)
+    dist, _ = shortest_path_tree(offsets, targets, weights[profile], landmark, size)
+    return task, dist
+
+
+def select_landmarks(graph, count):
+    """
+    Farthest-point selection over the non-block cells (Manhattan distance):
+    each new landmark is the cell farthest from every landmark chosen so far,
+    which spreads them over the edges of the map.
+    """
+    nodes = list(graph.node_indices())
+    if not nodes:
+        return []
+    cols = graph.cols
+    xs = [node % cols for node in nodes]
+    ys = [node // cols for node in nodes]
+
+    def distances(position):
+        x, y = xs[position], ys[position]
+        return [abs(x - nx) + abs(y - ny) for nx, ny in zip(xs, ys)]
+
+    # Start from the cell farthest from an arbitrary one
+    first = max(range(len(nodes)), key=distances(0).__getitem__)
+    chosen = [first]
+    nearest = distances(first)
+    while len(chosen) < min(count, len(nodes)):
+        following = max(range(len(nodes)), key=nearest.__getitem__)
+        if nearest[following] == 0:
+            break # Every cell is already a landmark
+        chosen.append(following)
+        nearest = [min(a, b) for a, b in zip(nearest, distances(following))]
+    return [nodes[position] for position in chosen]
+
+
+class LandmarkIndex:
+    """
+    ALT (A*, Landmarks, Triangle inequality) index of a CompactGraph.
+    For every landmark L and weight profile it keeps d(L, v) and d(v, L)
+    for all cells as int arrays. Lower bound used as A* heuristic:
+        d(v, t) >= max(d(L, t) - d(L, v), d(v, L) - d(t, L))
+    """
+    def __init__(self, graph, landmarks, tables):
+        self.graph = graph
+        self.landmarks = landmarks
+        self.tables = tables  # (profile, reverse) -> [array('i') per landmark]
+
+    @classmethod
+    def build(cls, graph, count=DEFAULT_LANDMARKS, profiles=None, workers=1):
+        """
+        Selects `count` landmarks and computes their distance tables for
+        each profile (all by default). workers > 1 spreads the one-to-all
+        searches over a process pool, the graph arrays are sent once per worker.
+        """
+        landmarks = select_landmarks(graph, count)
+        profiles = list(profiles or graph.profiles)
+        size = graph.size
+        rev_offsets, rev_sources, _ = graph.reverse_adjacency()
+        forward = (graph.offsets, graph.targets, {p: graph.profiles[p] for p in profiles})
+        backward = (rev_offsets, rev_sources, {p: graph.reverse_weights(p) for p in profiles})
+        tasks = [(landmark, profile, reverse) for profile in profiles for reverse in (False, True) for landmark in landmarks]
+
+        results = {}
+        if workers > 1 and len(tasks) > 1:
+            from concurrent.futures import ProcessPoolExecutor # Only multi-process builds pay for the import
+            # memoryviews (compiled maps) cannot be pickled: send array copies
+            to_array = lambda values: array('i', values) if isinstance(values, memoryview) else values
+            forward = (to_array(forward[0]), to_array(forward[1]), {p: to_array(w) for p, w in forward[2].items()})
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(size, forward, backward)) as pool:
+                for task, dist in pool.map(_worker_table, tasks):
+                    results[task] = dist
+        else:
+            for landmark, profile, reverse in tasks:
+                offsets, targets, weights = backward if reverse else forward
+                results[(landmark, profile, reverse)], _ = shortest_path_tree(offsets, targets, weights[profile], landmark, size)
+
+        tables = {(profile, reverse): [results[(landmark, profile, reverse)] for landmark in landmarks]
+                  for profile in profiles for reverse in (False, True)}
+        return cls(graph, landmarks, tables)
+
+    def heuristic(self, end, profile=None):
+        """
+        Returns h(v), a consistent lower bound of d(v, end) for the profile
+        (active one by default). h(v) is INF when v provably cannot reach end.
+        """
+        profile = profile or self.graph.profile
+        from_landmark = self.tables[(profile, False)]  # d(L, v)
+        to_landmark = self.tables[(profile, True)]     # d(v, L)
+        terms = [(table_from, table_from[end], table_to, table_to[end])
+                 for table_from, table_to in zip(from_landmark, to_landmark)]
+
+        def heuristic(index):
+            best = 0
+            for table_from, from_end, table_to, to_end in terms:
+                from_node, to_node = table_from[index], table_to[index]
+                # L reaches v but not end: v cannot reach end either
+                if from_end == UNREACHABLE:
+                    if from_node != UNREACHABLE:
+                        return INF
+                elif from_node != UNREACHABLE and from_end - from_node > best:
+                    best = from_end - from_node
+                # end reaches L but v does not: v cannot reach end
+                if to_node == UNREACHABLE:
+                    if to_end != UNREACHABLE:
+                        return INF
+                elif to_end != UNREACHABLE and to_node - to_end > best:
+                    best = to_node - to_end
+            return best
+        return heuristic
+
+
+def landmark_index(graph, count=DEFAULT_LANDMARKS):
+    """LandmarkIndex of graph, built on first use and kept with the graph."""
+    return graph.cached(('alt', count), lambda graph: LandmarkIndex.build(graph, count))
@@ -0,0 +1,175 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from models.compact_graph import CompactGraph
+
+# Container layout (compiled maps and other precomputed indexes):
+#   MAGIC | uint32 header length | JSON header | padding | data sections
+# Section offsets in the header are relative to the (8-byte aligned) data start.
+MAGIC = b'MWZ1'
+FORMAT_VERSION = 2 # 2: cell code 8 is 'B' (closed street)
+CACHE_EXTENSION = '.mwz'
+ALIGNMENT = 8
+
+
+def cache_path_for(csv_path):
+    return os.path.splitext(csv_path)[0] + CACHE_EXTENSION
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_info(csv_path, sha256=None):
+    """Identity of the CSV a cache was compiled from (size, mtime, content hash)."""
+    stat = os.stat(csv_path)
+    return {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': sha256 or file_sha256(csv_path),
+    }
+
+
+def _aligned(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_sections(path, header, arrays):
+    """
+    Writes a binary container: JSON header plus aligned raw arrays.
+    arrays: list of (name, array or memoryview). The file is written aside
+    and renamed into place. Returns False if it could not be written.
+    """
+    sections = {}
+    position = 0
+    for name, values in arrays:
+        position = _aligned(position)
+        view = memoryview(values)
+        sections[name] = [position, view.nbytes, view.format]
+        position += view.nbytes
+
+    header = dict(header, format=FORMAT_VERSION, byteorder=sys.byteorder, sections=sections)
+    encoded = json.dumps(header).encode('utf-8')
+    data_start = _aligned(len(MAGIC) + 4 + len(encoded))
+
+    temp_path = path + '.tmp'
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack('<I', len(encoded)))
+            f.write(encoded)
+            for name, values in arrays:
+                f.write(bytes(data_start + sections[name][0] - f.tell()))
+                f.write(memoryview(values).cast('B'))
+        os.replace(temp_path, path)
+    except OSError as error:
+        print(f"Warning: could not write {path}: {error}")
+        return False
+    return True
+
+
+def open_sections(path):
+    """
+    Memory-maps a container written by write_sections.
+    Returns (header, {name: read-only memoryview}) or (None, None) if the
+    file is missing, truncated or from another format/byte order.
+    """
+    try:
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None, None
+
+    try:
+        if mapped[:len(MAGIC)] != MAGIC:
+            return None, None
+        (header_length,) = struct.unpack_from('<I', mapped, len(MAGIC))
+        header_start = len(MAGIC) + 4
+        header = json.loads(mapped[header_start:header_start + header_length].decode('utf-8'))
+        if header.get('format') != FORMAT_VERSION or header.get('byteorder') != sys.byteorder:
+            return None, None
+
+        data = memoryview(mapped)[_aligned(header_start + header_length):]
+        sections = {}
+        for name, (start, length, fmt) in header['sections'].items():
+            if start + length > len(data):
+                return None, None # Truncated file
+            sections[name] = data[start:start + length].cast(fmt)
+    except (KeyError, TypeError, ValueError, struct.error):
+        return None, None
+    return header, sections
+
+
+def save_compiled(cache_path, graph, source):
+    """
+    Writes the cell types, CSR arrays and every profile weight vector of
+    graph to cache_path. Returns False if the cache could not be written.
+    """
+    arrays = [('cells', graph.cells), ('offsets', graph.offsets), ('targets', graph.targets)]
+    arrays += [('weights:' + name, weights) for name, weights in graph.profiles.items()]
+    header = {
+        'rows': graph.rows,
+        'cols': graph.cols,
+        'node_count': graph.node_count,
+        'source': source,
+        'profiles': list(graph.profiles),
+        'cost_tables': graph.cost_tables,
+        'labels': {str(index): value for index, value in graph.labels.items()},
+    }
+    return write_sections(cache_path, header, arrays)
+
+
+def open_compiled(cache_path):
+    """
+    Memory-maps a compiled map. Arrays of the returned CompactGraph are
+    read-only memoryviews over the file, nothing is parsed or copied.
+    Returns (graph, header) or (None, None) if the file is missing or invalid.
+    """
+    header, sections = open_sections(cache_path)
+    if header is None:
+        return None, None
+    try:
+        profiles = {name: sections['weights:' + name] for name in header['profiles']}
+        graph = CompactGraph(
+            header['rows'], header['cols'],
+            sections['cells'], sections['offsets'], sections['targets'],
+            profiles,
+            {int(index): value for index, value in header['labels'].items()},
+            header['cost_tables'],
+            node_count=header['node_count'],
+        )
+    except (KeyError, TypeError, ValueError):
+        return None, None
+    graph.content_hash = header['source']['sha256']
+    return graph, header
+
+
+def load_cached_graph(csv_path, cost_tables):
+    """
+    Returns the compiled graph for csv_path if its cache is still valid:
+    same size and mtime as the CSV, or same content hash when only the mtime
+    changed, and compiled with the same cost tables. Otherwise None.
+    """
+    graph, header = open_compiled(cache_path_for(csv_path))
+    if graph is None:
+        return None
+    try:
+        stat = os.stat(csv_path)
+    except OSError:
+        return None
+
+    source = header['source']
+    if header['cost_tables'] != cost_tables:
+        return None
+    if source['size'] != stat.st_size:
+        return None
+    if source['mtime_ns'] != stat.st_mtime_ns and source['sha256'] != file_sha256(csv_path):
+        return None # CSV edited after the cache was compiled
+    return graph
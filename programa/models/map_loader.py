@@ -1,33 +1,422 @@
 import csv
+import hashlib
+import io
+from array import array
+from collections import deque
+from models import map_cache
 from models.graph import Graph
+from models.compact_graph import CompactGraph, CELL_CODES, BLOCK, CLOSED, OTHER, cell_code
+from models.accel import optional_numpy
+from models.contraction import hierarchy_for, hierarchy_path
+
+CODE_L, CODE_R = CELL_CODES['L'], CELL_CODES['R']
+CODE_N, CODE_S = CELL_CODES['N'], CELL_CODES['S']
+CODE_C, CODE_SF, CODE_ND = CELL_CODES['C'], CELL_CODES['SF'], CELL_CODES['ND']
+
+# Neighbour offsets in the same order as the original loader: N, S, L, R.
+# Each entry is (dx, dy, arrow code that moves in that direction).
+DIRECTIONS = ((0, -1, CODE_N), (0, 1, CODE_S), (-1, 0, CODE_L), (1, 0, CODE_R))
+ARROW_CODES = (CODE_N, CODE_S, CODE_L, CODE_R)
+CROSSING_CODES = (CODE_C, CODE_ND)
+# A C/ND cell may enter a neighbour of these types, besides the arrow of that direction
+CROSSING_ENTRY_CODES = (CODE_C, CODE_SF, CODE_ND)
+# No edge ever enters these cells
+IMPASSABLE_CODES = (BLOCK, CLOSED)
+
+
+# Traffic profiles: cost of entering a cell of each type (Table 3 of the spec).
+# Types not listed (SF, ND, ...) cost DEFAULT_COST. New profiles only need an entry here.
+TRAFFIC_PROFILES = {
+    'normal': {'L': 2, 'R': 2, 'N': 1, 'S': 1, 'C': 2},
+    'peak': {'L': 2, 'R': 2, 'N': 4, 'S': 4, 'C': 3},
+}
+DEFAULT_COST = 1
+DEFAULT_PROFILE = 'normal'
+
+# Peak hours: 6-9am, 12-1pm and 5-8pm (inclusive)
+PEAK_HOURS = ((6, 9), (12, 13), (17, 20))
+
+# Edit batches kept for undo
+UNDO_LIMIT = 100
+# Rows handed to on_rows at a time while a map is read
+ROWS_PER_CHUNK = 64
+
+
+def profile_for_hour(hour):
+    for first, last in PEAK_HOURS:
+        if first <= hour <= last:
+            return 'peak'
+    return 'normal'
+
+
+def cost_table(profile=DEFAULT_PROFILE):
+    """
+    Edge cost indexed by the type code of the TARGET cell.
+    profile: name in TRAFFIC_PROFILES or a {cell value: cost} dict.
+    """
+    costs = TRAFFIC_PROFILES[profile] if isinstance(profile, str) else profile
+    table = [DEFAULT_COST] * (OTHER + 1)
+    for value, cost in costs.items():
+        table[CELL_CODES[value]] = cost
+    return table
+
+
+def encode_matrix(matrix):
+    """
+    Converts a matrix of cell values into one type code byte per cell.
+    Returns (rows, cols, cells, labels), labels keeps the raw value of OTHER cells.
+    """
+    rows = len(matrix)
+    cols = len(matrix[0]) if rows > 0 else 0
+
+    cells = array('B', bytes(rows * cols))
+    labels = {}
+    for y, row in enumerate(matrix):
+        start = y * cols
+        try:
+            # Fast path: every value is a known, already stripped symbol
+            codes = array('B', map(CELL_CODES.__getitem__, row[:cols]))
+        except KeyError:
+            codes = array('B', [CELL_CODES.get(cell_value.strip(), OTHER) for cell_value in row[:cols]])
+            for x, code in enumerate(codes):
+                if code == OTHER:
+                    labels[start + x] = row[x].strip()
+        cells[start:start + len(codes)] = codes
+    return rows, cols, cells, labels
+
+
+def cell_targets(cells, rows, cols, index):
+    """Targets of the outgoing edges of one cell, in N, S, L, R order."""
+    code = cells[index]
+    if code not in ARROW_CODES and code not in CROSSING_CODES:
+        return []
+    result = []
+    y, x = divmod(index, cols)
+    for dx, dy, arrow in DIRECTIONS:
+        nx, ny = x + dx, y + dy
+        if not (0 <= nx < cols and 0 <= ny < rows):
+            continue
+        target = ny * cols + nx
+        n_code = cells[target]
+        if n_code in IMPASSABLE_CODES:
+            continue
+        # Arrows only follow their own direction, C/ND enter
+        # streets that flow away from them and other crossings
+        if code == arrow or (code in CROSSING_CODES and (n_code == arrow or n_code in CROSSING_ENTRY_CODES)):
+            result.append(target)
+    return result
+
+
+def build_edges(cells, rows, cols):
+    """
+    Pure-Python edge builder. Returns CSR (offsets, targets) arrays.
+    Edges of a cell are listed in N, S, L, R order.
+    """
+    offsets = array('i', [0])
+    targets = array('i')
+
+    for index in range(rows * cols):
+        targets.extend(cell_targets(cells, rows, cols, index))
+        offsets.append(len(targets))
+
+    return offsets, targets
+
+
+def build_edges_numpy(np, cells, rows, cols):
+    """
+    Vectorized edge builder, same rules and edge order as build_edges.
+    Each direction is a boolean mask computed from the grid and the grid
+    shifted by one cell. Returns CSR (offsets, targets) as array('i').
+    """
+    grid = np.frombuffer(cells, dtype=np.uint8).reshape(rows, cols)
+    # Pad with blocks so shifted views never leave the map
+    padded = np.pad(grid, 1, constant_values=BLOCK)
+    # Lookup tables indexed by type code
+    crossing_lut = np.zeros(256, dtype=bool)
+    crossing_lut[list(CROSSING_CODES)] = True
+    entry_lut = np.zeros(256, dtype=bool)
+    entry_lut[list(CROSSING_ENTRY_CODES)] = True
+    crossing = crossing_lut[grid]
+
+    masks = np.empty((rows, cols, len(DIRECTIONS)), dtype=bool)
+    deltas = np.empty(len(DIRECTIONS), dtype=np.int64)
+    for d, (dx, dy, arrow) in enumerate(DIRECTIONS):
+        neighbor = padded[1 + dy:1 + dy + rows, 1 + dx:1 + dx + cols]
+        enters = (neighbor == arrow) | entry_lut[neighbor]
+        masks[:, :, d] = (neighbor != BLOCK) & (neighbor != CLOSED) & ((grid == arrow) | (crossing & enters))
+        deltas[d] = dy * cols + dx
+
+    masks = masks.reshape(rows * cols, len(DIRECTIONS))
+    # nonzero walks the mask row-major: by cell, then in N, S, L, R order
+    sources, directions = np.nonzero(masks)
+    target_array = (sources + deltas[directions]).astype(np.int32)
+
+    offset_array = np.zeros(rows * cols + 1, dtype=np.int32)
+    np.cumsum(masks.sum(axis=1), out=offset_array[1:])
+
+    offsets = array('i')
+    offsets.frombytes(offset_array.tobytes())
+    targets = array('i')
+    targets.frombytes(target_array.tobytes())
+    return offsets, targets
+
+
+class _EditedCells:
+    # Cell codes as they will be after a batch, without copying the grid
+    def __init__(self, cells, codes):
+        self.cells = cells
+        self.codes = codes
+
+    def __getitem__(self, index):
+        entry = self.codes.get(index)
+        return self.cells[index] if entry is None else entry[0]
+
+
+class MapEditor:
+    """
+    Applies cell type changes to a CompactGraph in place. Only the edges of
+    each edited cell and its four neighbours are rebuilt; the graph version
+    is bumped once per batch so route caches and indexes drop stale results.
+    The undo journal keeps the previous value of the edited cells only.
+    """
+    def __init__(self, graph):
+        self.graph = graph
+        self.journal = deque(maxlen=UNDO_LIMIT)  # batches of (index, previous value)
+
+    def affected_cells(self, indices):
+        """Edited cells plus their neighbours: the cells whose edges may change."""
+        rows, cols = self.graph.rows, self.graph.cols
+        affected = set(indices)
+        for index in indices:
+            y, x = divmod(index, cols)
+            for dx, dy, _ in DIRECTIONS:
+                if 0 <= x + dx < cols and 0 <= y + dy < rows:
+                    affected.add(index + dy * cols + dx)
+        return sorted(affected)
+
+    def apply(self, changes, record=True):
+        """
+        changes: {cell index: value} with values as in the CSV ('0', 'L', 'C', 'B', ...).
+        All changes are applied in one pass. Returns the sorted affected cells.
+        """
+        graph = self.graph
+        codes = {}
+        previous = []
+        for index, value in changes.items():
+            if not 0 <= index < graph.size:
+                raise ValueError(f"Cell {index} is outside the map")
+            value = value.strip()
+            code = cell_code(value)
+            previous.append((index, graph.value(index)))
+            codes[index] = (code, value if code == OTHER else None)
+        if not codes:
+            return []
+
+        affected = self.affected_cells(codes)
+        edited = _EditedCells(graph.cells, codes)
+        edge_lists = {index: cell_targets(edited, graph.rows, graph.cols, index) for index in affected}
+        graph.replace_cells(codes, edge_lists)
+        if record:
+            self.journal.append(previous)
+        return affected
+
+    def undo(self):
+        """Reverts the last batch. Returns the affected cells (empty if nothing to undo)."""
+        if not self.journal:
+            return []
+        return self.apply(dict(self.journal.pop()), record=False)
+
+    @property
+    def can_undo(self):
+        return bool(self.journal)
+
 
 class MapLoader:
-    def __init__(self, file_path):
+    def __init__(self, file_path, use_cache=False):
+        """
+        use_cache: load the compiled map (map_cache) saved next to the CSV
+        when it is up to date, and (re)write it after parsing the CSV.
+        """
         self.file_path = file_path
-        self.raw_matrix = []
+        self.use_cache = use_cache
+        self._raw_matrix = []
+        self.content_hash = None
+        self.graph = None
+        self.from_cache = False
+        self.editor = None
 
-    def load_graph(self, is_peak_hour=False):
+    @property
+    def raw_matrix(self):
+        # A graph opened from the compiled cache never parsed the CSV:
+        # rebuild the matrix of values from its cell types on demand
+        if not self._raw_matrix and self.from_cache and self.graph is not None:
+            self._raw_matrix = self.graph.to_matrix()
+        return self._raw_matrix
+
+    @raw_matrix.setter
+    def raw_matrix(self, matrix):
+        self._raw_matrix = matrix
+
+    def read_matrix(self, on_rows=None):
         """
-        Parses the CSV and builds a weighted graph.
-        Weights depend on is_peak_hour.
+        Reads the CSV into self.raw_matrix and hashes its content.
+        on_rows(first_row, rows) receives the rows every ROWS_PER_CHUNK rows
+        as they are parsed, so a view can draw the map while it loads.
+        Returns False if the file does not exist.
         """
-        graph = Graph()
         self.raw_matrix = []
-        
         try:
-            with open(self.file_path, 'r', encoding='utf-8') as f:
-                reader = csv.reader(f, delimiter=';')
-                for y, row in enumerate(reader):
-                    self.raw_matrix.append(row)
-                    for x, cell_value in enumerate(row):
-                        graph.add_node(x, y, cell_value.strip())
+            with open(self.file_path, 'rb') as f:
+                content = f.read()
         except FileNotFoundError:
             print(f"Error: File {self.file_path} not found.")
+            return False
+
+        self.content_hash = hashlib.sha256(content).hexdigest()
+        text = content.decode('utf-8')
+        reader = csv.reader(io.StringIO(text, newline=None), delimiter=';')
+        for row in reader:
+            self.raw_matrix.append(row)
+            if on_rows and len(self.raw_matrix) % ROWS_PER_CHUNK == 0:
+                on_rows(len(self.raw_matrix) - ROWS_PER_CHUNK, self.raw_matrix[-ROWS_PER_CHUNK:])
+        if on_rows and len(self.raw_matrix) % ROWS_PER_CHUNK:
+            first = len(self.raw_matrix) - len(self.raw_matrix) % ROWS_PER_CHUNK
+            on_rows(first, self.raw_matrix[first:])
+        return True
+
+    def load_graph(self, is_peak_hour=False, profile=None, on_rows=None):
+        """
+        Returns the CompactGraph (integer cell ids, CSR edges) of the map.
+        The CSV is parsed and the topology built only on the first call,
+        later calls just activate the weights of the requested profile.
+        With use_cache an up-to-date compiled map is memory-mapped instead,
+        a stale or missing one is rebuilt from the CSV.
+        profile: name in TRAFFIC_PROFILES, defaults to peak/normal from is_peak_hour.
+        on_rows: see read_matrix; with a compiled map the rows come from its cells.
+        """
+        if self.graph is None:
+            self.graph = self._load_cached() if self.use_cache else None
+            self.from_cache = self.graph is not None
+            if self.graph is not None and on_rows:
+                matrix = self.raw_matrix
+                for first in range(0, len(matrix), ROWS_PER_CHUNK):
+                    on_rows(first, matrix[first:first + ROWS_PER_CHUNK])
+            if self.graph is None:
+                if not self.read_matrix(on_rows):
+                    return None
+                self.graph = self.build_compact_graph(self.raw_matrix)
+                self.graph.content_hash = self.content_hash
+                if self.use_cache:
+                    source = map_cache.source_info(self.file_path, self.content_hash)
+                    map_cache.save_compiled(map_cache.cache_path_for(self.file_path), self.graph, source)
+            self.content_hash = self.graph.content_hash
+            if self.use_cache:
+                self.graph.index_path = self.file_path # Pathfinder saves the CH index next to the map
+        self.graph.set_profile(profile or ('peak' if is_peak_hour else 'normal'))
+        return self.graph
+
+    def load_hierarchy(self, profile=None, monitor=None):
+        """
+        Contraction Hierarchies index of a profile (active one by default),
+        saved next to the map and rebuilt only when the map content changes.
+        monitor: passed to the build, which it may cancel.
+        """
+        graph = self.load_graph() if self.graph is None else self.graph
+        if graph is None:
+            return None
+        profile = profile or graph.profile
+        return hierarchy_for(graph, profile, hierarchy_path(self.file_path, profile), monitor)
+
+    def _load_cached(self):
+        cost_tables = {name: cost_table(costs) for name, costs in TRAFFIC_PROFILES.items()}
+        return map_cache.load_cached_graph(self.file_path, cost_tables)
+
+    def reload(self):
+        """Forgets the built graph so the next load_graph re-reads the file."""
+        self.graph = None
+        self.editor = None
+        self.raw_matrix = []
+        return self.load_graph()
+
+    def edit_cells(self, changes, record=True):
+        """
+        Changes cell types of the loaded map in place (the CSV is not rewritten).
+        changes: {(x, y): value}, e.g. '0' block, 'L' street, 'C' crossing, 'B' closed street.
+        record: keep the batch for undo_edit (False for live incidents).
+        Returns the (x, y) cells whose drawing or edges changed.
+        """
+        graph = self.graph
+        if graph is None:
+            return []
+        if self.editor is None or self.editor.graph is not graph:
+            self.editor = MapEditor(graph)
+        for (x, y) in changes:
+            if graph.index(x, y) is None:
+                raise ValueError(f"Cell ({x},{y}) is outside the map")
+        affected = self.editor.apply({graph.index(x, y): value for (x, y), value in changes.items()}, record)
+        self._sync_matrix(changes)
+        return [graph.coords(index) for index in affected]
+
+    def undo_edit(self):
+        """Reverts the last edit_cells batch. Returns the affected (x, y) cells."""
+        if self.editor is None or not self.editor.can_undo:
+            return []
+        reverted = {self.graph.coords(index): value for index, value in self.editor.journal[-1]}
+        affected = self.editor.undo()
+        self._sync_matrix(reverted)
+        return [self.graph.coords(index) for index in affected]
+
+    def _sync_matrix(self, changes):
+        # Keeps the value matrix drawn by MapCanvas in step with the graph
+        matrix = self.raw_matrix
+        for (x, y), value in changes.items():
+            if y < len(matrix) and x < len(matrix[y]):
+                matrix[y][x] = value.strip()
+
+    @staticmethod
+    def build_compact_graph(matrix, is_peak_hour=False, profiles=None, vectorized=None):
+        """
+        Builds a CompactGraph from a matrix of cell values, with one weight
+        vector per traffic profile (TRAFFIC_PROFILES by default).
+        Rows shorter than the first one are padded with blocks.
+        vectorized: use the NumPy edge builder. None = only if NumPy is installed.
+        """
+        rows, cols, cells, labels = encode_matrix(matrix)
+
+        np = optional_numpy() if vectorized is not False else None
+        if vectorized and np is None:
+            raise ImportError("Vectorized map building requires NumPy")
+        if np is not None:
+            offsets, targets = build_edges_numpy(np, cells, rows, cols)
+        else:
+            offsets, targets = build_edges(cells, rows, cols)
+
+        graph = CompactGraph(rows, cols, cells, offsets, targets, {}, labels)
+        for name, costs in (profiles or TRAFFIC_PROFILES).items():
+            graph.add_profile(name, cost_table(costs))
+        if is_peak_hour:
+            graph.set_profile('peak')
+        return graph
+
+    def load_node_graph(self, is_peak_hour=False):
+        """
+        Parses the CSV and builds the object graph (one Node per cell).
+        Kept as the reference implementation for CompactGraph.
+        """
+        if not self.read_matrix():
             return None
+        return self.load_node_graph_from(self.raw_matrix, is_peak_hour)
+
+    @staticmethod
+    def load_node_graph_from(matrix, is_peak_hour=False):
+        graph = Graph()
+        for y, row in enumerate(matrix):
+            for x, cell_value in enumerate(row):
+                graph.add_node(x, y, cell_value.strip())
 
         # Build edges based on direction and weights
-        rows = len(self.raw_matrix)
-        cols = len(self.raw_matrix[0]) if rows > 0 else 0
+        rows = len(matrix)
+        cols = len(matrix[0]) if rows > 0 else 0
 
         # Define Costs
         # is_peak_hour: 
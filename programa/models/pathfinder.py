@@ -1,56 +1,337 @@
 import heapq
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from models.compact_graph import CompactGraph
+from models.corridors import corridor_graph
+from models.contraction import hierarchy_for
+from models.landmarks import landmark_index
+from models.components import component_index
+from models.distance_matrix import compute_rows, fill_matrix
+from models.accel import require_numpy
+from models.shortest_path_tree import PROGRESS_INTERVAL
+from models.time_dependent import time_dependent_search, weight_schedule
+from models.isochrone import isochrone
+
+INF = float('inf')
+# Threads used by Pathfinder.find_paths
+DEFAULT_WORKERS = min(8, os.cpu_count() or 1)
+
+# Search strategies for CompactGraph queries
+DIJKSTRA = 'dijkstra'
+ASTAR = 'astar'
+BIDIRECTIONAL = 'bidirectional'
+BIDIRECTIONAL_ASTAR = 'bidirectional_astar'
+CORRIDOR = 'corridor' # Dijkstra over the contracted corridor graph
+CONTRACTION = 'ch' # Contraction Hierarchies query (index built on first use)
+ALT = 'alt' # A* with landmark (triangle inequality) lower bounds
+METHODS = (DIJKSTRA, ASTAR, BIDIRECTIONAL, BIDIRECTIONAL_ASTAR, CORRIDOR, CONTRACTION, ALT)
+
+# path: list of cell indices (None if unreachable), expanded: nodes settled
+SearchResult = namedtuple('SearchResult', ['path', 'cost', 'expanded'])
+
 
 class Pathfinder:
     @staticmethod
-    def find_path(graph, start_id, end_id):
+    def find_path(graph, start_id, end_id, method=DIJKSTRA, profile=None):
         """
-        Dijkstra's Algorithm.
+        Dijkstra's Algorithm (or another method of METHODS on a CompactGraph).
         Returns (path_list_of_nodes, total_cost)
+        Accepts a Graph or a CompactGraph. For a CompactGraph ids may be
+        cell indices or "x,y" strings.
+        Search state is kept per query, so concurrent calls on one graph are safe.
         """
+        if isinstance(graph, CompactGraph):
+            start = graph.index_of(start_id)
+            end = graph.index_of(end_id)
+            if start is None or end is None:
+                return None, 0
+            path, cost, _ = Pathfinder.search(graph, start, end, method, profile=profile)
+            if path is None:
+                return None, cost
+            return [graph.node(index) for index in path], cost
+
+        if method != DIJKSTRA:
+            raise ValueError(f"Method {method} requires a CompactGraph")
+
         start_node = graph.nodes.get(start_id)
         end_node = graph.nodes.get(end_id)
 
         if not start_node or not end_node:
             return None, 0
 
-        # Reset graph state
-        for node in graph.nodes.values():
-            node.g_cost = float('inf')
-            node.parent = None
+        # Only the nodes this query touches get an entry
+        dist = {start_id: 0}
+        parent = {start_id: None}
+        priority_queue = [(0, start_id)] # (cost, node_id)
 
-        start_node.g_cost = 0
-        priority_queue = [(0, start_node.id)] # (cost, node_id)
-        
         visited = set()
 
         while priority_queue:
             current_cost, current_id = heapq.heappop(priority_queue)
-            current_node = graph.nodes[current_id]
 
             if current_id in visited:
                 continue
             visited.add(current_id)
 
             if current_id == end_id:
-                return Pathfinder._reconstruct_path(current_node), current_cost
+                return Pathfinder._reconstruct_path(graph, parent, end_id), current_cost
 
-            for neighbor, weight in current_node.edges:
+            for neighbor, weight in graph.nodes[current_id].edges:
                 if neighbor.id in visited:
                     continue
 
                 new_cost = current_cost + weight
-                if new_cost < neighbor.g_cost:
-                    neighbor.g_cost = new_cost
-                    neighbor.parent = current_node
+                if new_cost < dist.get(neighbor.id, INF):
+                    dist[neighbor.id] = new_cost
+                    parent[neighbor.id] = current_id
                     heapq.heappush(priority_queue, (new_cost, neighbor.id))
 
-        return None, float('inf') # No path found
+        return None, INF # No path found
 
     @staticmethod
-    def _reconstruct_path(end_node):
-        path = []
-        current = end_node
-        while current:
+    def find_path_indices(graph, start, end, method=DIJKSTRA, profile=None, monitor=None):
+        """
+        Shortest path over a CompactGraph using integer cell indices.
+        Returns (list_of_indices, total_cost) or (None, inf).
+        """
+        path, cost, _ = Pathfinder.search(graph, start, end, method, profile=profile, monitor=monitor)
+        return path, cost
+
+    @staticmethod
+    def find_paths(graph, pairs, method=DIJKSTRA, profile=None, workers=DEFAULT_WORKERS):
+        """
+        Runs many (start, end) index queries concurrently on one shared graph.
+        The profile is fixed for the whole batch (active one by default).
+        Returns a list of (list_of_indices, total_cost) in the order of pairs.
+        """
+        profile = profile or graph.profile
+        pairs = list(pairs)
+        if workers <= 1 or len(pairs) <= 1:
+            return [Pathfinder.find_path_indices(graph, start, end, method, profile) for start, end in pairs]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(lambda pair: Pathfinder.find_path_indices(graph, pair[0], pair[1], method, profile), pairs))
+
+    @staticmethod
+    def find_path_at(graph, start, end, departure, time_profile=None, monitor=None):
+        """
+        Time-dependent route leaving start at minute `departure` of the day:
+        every edge is costed at the minute it is reached, so a trip that
+        crosses from peak into off-peak hours is priced correctly.
+        time_profile: TimeProfile or WeightSchedule; by default the current
+        weights of the graph (incidents included) on the normal/peak schedule of the spec.
+        Returns a SearchResult, cost is the travel time in minutes.
+        """
+        return SearchResult(*time_dependent_search(graph, start, end, departure,
+                                                   time_profile or weight_schedule(graph), monitor=monitor))
+
+    @staticmethod
+    def distance_matrix(graph, sources, targets, profile=None, workers=1):
+        """
+        Travel costs from every source cell to every target cell of a CompactGraph.
+        One search per source, stopped once all its reachable targets are
+        settled (unreachable ones are ruled out by the component index first).
+        workers > 1 spreads the sources over a process pool sharing the graph
+        arrays through shared memory.
+        Returns a NumPy int32 matrix [source, target], UNREACHABLE where no route exists.
+        """
+        np = require_numpy("Pathfinder.distance_matrix")
+        profile = profile or graph.profile
+        sources, targets = list(sources), list(targets)
+        components = component_index(graph)
+        tasks = [(source, [target for target in set(targets) if components.reachable(source, target)])
+                 for source in sources]
+        return fill_matrix(np, sources, targets, compute_rows(graph, tasks, profile, workers))
+
+    @staticmethod
+    def isochrone(graph, cell, budgets, profile=None, reverse=False, monitor=None):
+        """
+        Cells reachable from cell within each cost budget (reverse: cells
+        that can reach it), from one search bounded by the largest budget.
+        Returns an Isochrone (see models.isochrone).
+        """
+        return isochrone(graph, cell, budgets, profile, reverse, monitor)
+
+    @staticmethod
+    def search(graph, start, end, method=DIJKSTRA, landmarks=None, profile=None, monitor=None):
+        """
+        Runs one query with the selected strategy.
+        profile: weight profile to use (the active one by default). It is
+        resolved once, so set_profile from another thread does not affect a
+        running query. Search state lives in per-query dicts, the graph is
+        never modified.
+        landmarks: LandmarkIndex for ALT (default index of the graph otherwise).
+        monitor: called with the nodes settled so far every PROGRESS_INTERVAL
+        nodes (not by CH queries); it may raise to abandon the search.
+        Returns a SearchResult(path, cost, expanded).
+        """
+        profile = profile or graph.profile
+        weights = graph.profiles[profile]
+        if not component_index(graph).reachable(start, end):
+            return SearchResult(None, INF, 0) # Rejected before any search
+        if method == DIJKSTRA:
+            return Pathfinder._unidirectional(graph, start, end, None, weights, monitor)
+        if method == ASTAR:
+            return Pathfinder._unidirectional(graph, start, end, Pathfinder._manhattan(graph, end, profile), weights, monitor)
+        if method == BIDIRECTIONAL:
+            return Pathfinder._bidirectional(graph, start, end, None, weights, monitor)
+        if method == BIDIRECTIONAL_ASTAR:
+            to_end = Pathfinder._manhattan(graph, end, profile)
+            from_start = Pathfinder._manhattan(graph, start, profile)
+            # Average potential: consistent for both search directions
+            return Pathfinder._bidirectional(graph, start, end, lambda index: (to_end(index) - from_start(index)) / 2, weights, monitor)
+        if method == CORRIDOR:
+            return SearchResult(*corridor_graph(graph).find_path(start, end, profile, monitor))
+        if method == CONTRACTION:
+            return SearchResult(*hierarchy_for(graph, profile).query(start, end))
+        if method == ALT:
+            landmark_bound = (landmarks or landmark_index(graph)).heuristic(end, profile)
+            grid_bound = Pathfinder._manhattan(graph, end, profile)
+            # The max of two consistent bounds is still consistent
+            return Pathfinder._unidirectional(graph, start, end, lambda index: max(landmark_bound(index), grid_bound(index)), weights, monitor)
+        raise ValueError(f"Unknown search method: {method}")
+
+    @staticmethod
+    def expansion_report(graph, pairs, method, baseline=DIJKSTRA, **options):
+        """
+        Compares expanded nodes of `method` against `baseline` over (start, end) pairs.
+        Returns {'baseline': n, 'method': n, 'reduction': fraction of expansions saved}.
+        """
+        base = sum(Pathfinder.search(graph, start, end, baseline).expanded for start, end in pairs)
+        tested = sum(Pathfinder.search(graph, start, end, method, **options).expanded for start, end in pairs)
+        return {'baseline': base, 'method': tested, 'reduction': 1 - tested / base if base else 0.0}
+
+    @staticmethod
+    def _manhattan(graph, goal, profile=None):
+        """
+        Admissible, consistent heuristic: every edge moves one cell and costs
+        at least the cheapest weight of the profile.
+        """
+        scale = graph.min_weight(profile)
+        cols = graph.cols
+        goal_y, goal_x = divmod(goal, cols)
+
+        def heuristic(index):
+            y, x = divmod(index, cols)
+            return scale * (abs(x - goal_x) + abs(y - goal_y))
+        return heuristic
+
+    @staticmethod
+    def _unidirectional(graph, start, end, heuristic, weights, monitor=None):
+        # Dijkstra when heuristic is None, A* otherwise
+        offsets, targets = graph.offsets, graph.targets
+        dist = {start: 0}
+        parent = {start: -1}
+        priority_queue = [(heuristic(start) if heuristic else 0, 0, start)] # (key, cost, node)
+        expanded = 0
+        report = PROGRESS_INTERVAL if monitor else -1
+
+        while priority_queue:
+            _, current_cost, current = heapq.heappop(priority_queue)
+            if current_cost > dist[current]:
+                continue # Stale entry
+            expanded += 1
+            if expanded == report:
+                monitor(expanded)
+                report += PROGRESS_INTERVAL
+
+            if current == end:
+                return SearchResult(Pathfinder._reconstruct_indices(parent, end), current_cost, expanded)
+
+            for edge in range(offsets[current], offsets[current + 1]):
+                neighbor = targets[edge]
+                new_cost = current_cost + weights[edge]
+                if new_cost < dist.get(neighbor, INF):
+                    dist[neighbor] = new_cost
+                    parent[neighbor] = current
+                    key = new_cost + heuristic(neighbor) if heuristic else new_cost
+                    if key != INF: # INF: the heuristic proved end unreachable from there
+                        heapq.heappush(priority_queue, (key, new_cost, neighbor))
+
+        return SearchResult(None, INF, expanded) # No path found
+
+    @staticmethod
+    def _bidirectional(graph, start, end, potential, weights, monitor=None):
+        """
+        Forward search from start and backward search (over the reverse
+        adjacency) from end, alternating on the smaller queue key.
+        potential: forward potential pf, the backward one is -pf. Stops when
+        the two smallest keys add up to the best meeting cost found.
+        """
+        if start == end:
+            return SearchResult([start], 0, 1)
+
+        offsets, targets = graph.offsets, graph.targets
+        rev_offsets, rev_sources, rev_edges = graph.reverse_adjacency()
+        pf = potential or (lambda index: 0)
+
+        dist_f, dist_b = {start: 0}, {end: 0}
+        parent_f, parent_b = {start: -1}, {end: -1} # parent_b points towards end
+        settled_f, settled_b = set(), set()
+        queue_f = [(pf(start), 0, start)]
+        queue_b = [(-pf(end), 0, end)]
+        best, meeting = INF, None
+        expanded = 0
+        report = PROGRESS_INTERVAL if monitor else -1
+
+        while queue_f and queue_b:
+            if queue_f[0][0] + queue_b[0][0] >= best:
+                break
+
+            forward = queue_f[0][0] <= queue_b[0][0]
+            queue = queue_f if forward else queue_b
+            _, current_cost, current = heapq.heappop(queue)
+            dist, other_dist = (dist_f, dist_b) if forward else (dist_b, dist_f)
+            settled = settled_f if forward else settled_b
+            if current in settled or current_cost > dist[current]:
+                continue
+            settled.add(current)
+            expanded += 1
+            if expanded == report:
+                monitor(expanded)
+                report += PROGRESS_INTERVAL
+
+            if forward:
+                arcs = ((targets[edge], weights[edge]) for edge in range(offsets[current], offsets[current + 1]))
+                parent, sign = parent_f, 1
+            else:
+                arcs = ((rev_sources[slot], weights[rev_edges[slot]]) for slot in range(rev_offsets[current], rev_offsets[current + 1]))
+                parent, sign = parent_b, -1
+
+            for neighbor, weight in arcs:
+                new_cost = current_cost + weight
+                if new_cost < dist.get(neighbor, INF):
+                    dist[neighbor] = new_cost
+                    parent[neighbor] = current
+                    heapq.heappush(queue, (new_cost + sign * pf(neighbor), new_cost, neighbor))
+                if neighbor in other_dist and dist[neighbor] + other_dist[neighbor] < best:
+                    best = dist[neighbor] + other_dist[neighbor]
+                    meeting = neighbor
+
+        if meeting is None:
+            return SearchResult(None, INF, expanded)
+
+        path = Pathfinder._reconstruct_indices(parent_f, meeting)
+        current = parent_b[meeting]
+        while current != -1:
             path.append(current)
-            current = current.parent
+            current = parent_b[current]
+        return SearchResult(path, best, expanded)
+
+    @staticmethod
+    def _reconstruct_path(graph, parent, end_id):
+        path = []
+        current = end_id
+        while current is not None:
+            path.append(graph.nodes[current])
+            current = parent[current]
         return path[::-1] # Reverse
+
+    @staticmethod
+    def _reconstruct_indices(parent, end):
+        path = []
+        current = end
+        while current != -1:
+            path.append(current)
+            current = parent[current]
+        return path[::-1]
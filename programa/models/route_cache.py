@@ -0,0 +1,78 @@
+import threading
+from collections import OrderedDict
+from models.pathfinder import Pathfinder, DIJKSTRA
+
+DEFAULT_CAPACITY = 256
+
+
+class RouteCache:
+    """
+    Bounded LRU cache of route queries over CompactGraphs.
+    Keys are (graph token, map version, weight profile, start, end), so a
+    reloaded or edited map never returns stale routes. "No path" answers are
+    cached too: they are the most expensive queries (the search explores the
+    whole reachable component before giving up).
+    """
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict() # key -> (path tuple or None, cost)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(graph, start, end, profile=None):
+        # The token is unique per graph object: two graphs of the same CSV can
+        # differ after edits, and id() is reused once a graph is collected
+        return (graph.token, graph.version, profile or graph.profile, start, end)
+
+    def route(self, graph, start, end, method=DIJKSTRA, profile=None, monitor=None):
+        """
+        Returns (list_of_indices, total_cost) like Pathfinder.find_path_indices,
+        searching only on a cache miss. Every method returns an optimal cost,
+        so the method is not part of the key. monitor goes to the search.
+        """
+        profile = profile or graph.profile
+        key = self.key(graph, start, end, profile)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if entry is None:
+            path, cost = Pathfinder.find_path_indices(graph, start, end, method, profile, monitor)
+            entry = (tuple(path) if path is not None else None, cost)
+            with self._lock:
+                self.misses += 1
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.capacity:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        path, cost = entry
+        return (list(path) if path is not None else None), cost
+
+    def invalidate(self, graph=None):
+        """Drops the routes of one map (every map if graph is None)."""
+        with self._lock:
+            if graph is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[0] == graph.token]:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'capacity': self.capacity,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,43 @@
+import heapq
+from array import array
+
+# Distance stored in int arrays for cells that cannot be reached
+UNREACHABLE = 2 ** 31 - 1
+# Nodes settled between two calls to the monitor of a search
+PROGRESS_INTERVAL = 1024
+
+
+def shortest_path_tree(offsets, targets, weights, source, size, parents=False, budget=None, monitor=None):
+    """
+    One-to-all Dijkstra over raw CSR arrays: the forward graph, or the
+    reverse graph (rev_offsets, rev_sources, reverse_weights) for distances
+    towards source. Returns (dist, parent) as array('i') of `size` entries,
+    UNREACHABLE / -1 where nothing was found. parent is None unless requested.
+    budget: cells costing more are never queued, so the search stops at
+    that cost and they stay UNREACHABLE.
+    monitor: called with the nodes settled so far every PROGRESS_INTERVAL nodes.
+    """
+    dist = array('i', [UNREACHABLE]) * size
+    parent = array('i', [-1]) * size if parents else None
+    limit = UNREACHABLE - 1 if budget is None else budget
+    dist[source] = 0
+    priority_queue = [(0, source)]
+    settled = 0
+    report = PROGRESS_INTERVAL if monitor else -1
+    while priority_queue:
+        current_cost, current = heapq.heappop(priority_queue)
+        if current_cost > dist[current]:
+            continue
+        settled += 1
+        if settled == report:
+            monitor(settled)
+            report += PROGRESS_INTERVAL
+        for edge in range(offsets[current], offsets[current + 1]):
+            neighbor = targets[edge]
+            new_cost = current_cost + weights[edge]
+            if new_cost < dist[neighbor] and new_cost <= limit:
+                dist[neighbor] = new_cost
+                if parents:
+                    parent[neighbor] = current
+                heapq.heappush(priority_queue, (new_cost, neighbor))
+    return dist, parent
@@ -0,0 +1,180 @@
+import heapq
+from array import array
+from models.compact_graph import OTHER
+from models.components import component_index
+from models.accel import optional_numpy
+from models.map_loader import cost_table, profile_for_hour
+from models.shortest_path_tree import PROGRESS_INTERVAL
+
+INF = float('inf')
+MINUTES_PER_DAY = 24 * 60
+TYPE_COUNT = OTHER + 1
+# Edge costs are read as minutes of travel
+MINUTES_PER_COST = 1
+
+
+class TimeProfile:
+    """
+    Cost of entering a cell of each type at every minute of the day, stored
+    as one flat lookup table: costs[minute * TYPE_COUNT + code]. The search
+    loop does a single index per edge, no branching on hour ranges.
+
+    Tables are FIFO-closed: leaving later never arrives earlier (entering
+    at minute t costs at most one minute more than entering at t + 1), which
+    keeps the label-setting time-dependent Dijkstra exact.
+    """
+    def __init__(self, costs):
+        self.costs = costs # array('i'), MINUTES_PER_DAY * TYPE_COUNT entries
+        self.min_cost = min(costs)
+
+    @classmethod
+    def from_slots(cls, tables, slot_minutes):
+        """
+        tables: one cost table (list indexed by type code) per slot of
+        slot_minutes, covering the whole day (e.g. 24 hourly tables, or 96
+        for quarter hours).
+        """
+        if len(tables) * slot_minutes != MINUTES_PER_DAY:
+            raise ValueError(f"{len(tables)} slots of {slot_minutes} min do not cover a day")
+        raw = []
+        for table in tables:
+            row = [int(cost * MINUTES_PER_COST) for cost in table]
+            raw.extend(row * slot_minutes)
+        costs = array('i', raw)
+
+        # FIFO closure, twice around the day so midnight wraps
+        for code in range(TYPE_COUNT):
+            following = costs[code] # minute 0 of the next day
+            for _ in range(2):
+                for minute in range(MINUTES_PER_DAY - 1, -1, -1):
+                    slot = minute * TYPE_COUNT + code
+                    if following + 1 < costs[slot]:
+                        costs[slot] = following + 1
+                    following = costs[slot]
+        return cls(costs)
+
+    @classmethod
+    def from_hours(cls, hourly_tables):
+        return cls.from_slots(hourly_tables, 60)
+
+    @classmethod
+    def default(cls):
+        """Normal/peak tables of the spec, switched at the PEAK_HOURS boundaries."""
+        return cls.from_hours([cost_table(profile_for_hour(hour)) for hour in range(24)])
+
+    def cost(self, code, minute):
+        return self.costs[(minute % MINUTES_PER_DAY) * TYPE_COUNT + code]
+
+    def edge_costs(self, graph):
+        """cost(edge, minute) of the edges of graph."""
+        codes, costs = target_codes(graph), self.costs
+        return lambda edge, minute: costs[(minute % MINUTES_PER_DAY) * TYPE_COUNT + codes[edge]]
+
+
+class WeightSchedule:
+    """
+    Time-dependent costs taken from the current edge weights of a graph: at
+    any minute an edge costs what it costs in the weight profile of that
+    hour, so cell factors (set_entry_costs) count as in static searches.
+    FIFO-closed on lookup: if waiting for a later hour is cheaper, the edge
+    costs the wait plus the later cost.
+    """
+    def __init__(self, hourly_weights, min_cost):
+        self.hourly_weights = hourly_weights # 24 weight arrays, parallel to graph.targets
+        self.min_cost = min_cost
+
+    @classmethod
+    def from_graph(cls, graph, hourly_profiles=None):
+        """hourly_profiles: profile name of each hour, normal/peak of the spec by default."""
+        names = hourly_profiles or [profile_for_hour(hour) for hour in range(24)]
+        return cls([graph.profiles[name] for name in names], min(graph.min_weight(name) for name in set(names)))
+
+    def cost(self, edge, minute):
+        minute %= MINUTES_PER_DAY
+        hour = minute // 60
+        cost = self.hourly_weights[hour][edge]
+        wait = 60 - minute % 60
+        while wait < cost:
+            hour = (hour + 1) % 24
+            cost = min(cost, wait + self.hourly_weights[hour][edge])
+            wait += 60
+        return cost
+
+    def edge_costs(self, graph):
+        return self.cost
+
+
+_default_profile = None
+
+
+def default_time_profile():
+    """TimeProfile.default(), built once."""
+    global _default_profile
+    if _default_profile is None:
+        _default_profile = TimeProfile.default()
+    return _default_profile
+
+
+def weight_schedule(graph):
+    """WeightSchedule of the graph weights, rebuilt once they change (new version)."""
+    return graph.cached('weight_schedule', WeightSchedule.from_graph)
+
+
+def target_codes(graph):
+    """Type code of the target cell of every edge, kept with the graph."""
+    def build(graph):
+        np = optional_numpy()
+        if np is not None and len(graph.targets):
+            return np.frombuffer(graph.cells, dtype=np.uint8)[np.frombuffer(graph.targets, dtype=np.int32)].tobytes()
+        cells = graph.cells
+        return bytes(cells[target] for target in graph.targets)
+    return graph.cached('target_codes', build)
+
+
+def time_dependent_search(graph, start, end, departure, profile, use_heuristic=True, monitor=None):
+    """
+    Time-dependent Dijkstra (A* with use_heuristic): the cost of each edge
+    is looked up at the minute the vehicle reaches its source cell.
+    departure: minute of the day (may exceed a day, it wraps).
+    profile: TimeProfile (costs by cell type) or WeightSchedule (by edge).
+    monitor: called with the nodes settled so far every PROGRESS_INTERVAL nodes.
+    Returns (list_of_cells, travel_minutes, expanded), path None if unreachable.
+    """
+    if not component_index(graph).reachable(start, end):
+        return None, INF, 0
+    offsets, targets = graph.offsets, graph.targets
+    edge_cost = profile.edge_costs(graph)
+    cols = graph.cols
+    goal_y, goal_x = divmod(end, cols)
+    scale = profile.min_cost if use_heuristic else 0
+
+    def heuristic(index):
+        y, x = divmod(index, cols)
+        return scale * (abs(x - goal_x) + abs(y - goal_y))
+
+    arrival = {start: departure}
+    parent = {start: -1}
+    priority_queue = [(departure + heuristic(start), departure, start)]
+    expanded = 0
+    while priority_queue:
+        _, time, current = heapq.heappop(priority_queue)
+        if time > arrival[current]:
+            continue
+        expanded += 1
+        if monitor and expanded % PROGRESS_INTERVAL == 0:
+            monitor(expanded)
+        if current == end:
+            path = []
+            while current != -1:
+                path.append(current)
+                current = parent[current]
+            return path[::-1], time - departure, expanded
+
+        for edge in range(offsets[current], offsets[current + 1]):
+            neighbor = targets[edge]
+            new_time = time + edge_cost(edge, time)
+            if new_time < arrival.get(neighbor, INF):
+                arrival[neighbor] = new_time
+                parent[neighbor] = current
+                heapq.heappush(priority_queue, (new_time + heuristic(neighbor), new_time, neighbor))
+    return None, INF, expanded
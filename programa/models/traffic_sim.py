@@ -0,0 +1,365 @@
+import random
+from itertools import chain
+from models.accel import require_numpy
+from models.components import component_index
+from models.map_loader import CROSSING_CODES, IMPASSABLE_CODES
+from models.pathfinder import Pathfinder, DIJKSTRA
+
+# Vehicles a street cell holds at once
+STREET_CAPACITY = 4
+# Vehicles an intersection (C/ND) holds at once
+CROSSING_CAPACITY = 1
+# Extra entry cost of a full cell when congestion is fed back into routing
+CONGESTION_WEIGHT = 1.0
+# Steps with every vehicle on the map stuck before run() reports a gridlock
+GRIDLOCK_STEPS = 50
+# Progress counted as a finished cell (absorbs the rounding of 1 / cost)
+EPSILON = 1e-9
+
+# Per-vehicle state arrays and their dtype
+VEHICLE_FIELDS = (
+    ('route_start', 'int64'),  # First slot of the route in route_cells
+    ('route_len', 'int64'),
+    ('offset', 'int64'),       # Position index in the route, -1 before entering the map
+    ('progress', 'float64'),   # Fraction of the current cell travelled
+    ('speed', 'float64'),      # Cells per step on the current cell
+    ('depart', 'int64'),       # First step the vehicle may enter the map
+    ('entered', 'int64'),      # Step it entered (-1 not yet)
+    ('arrived', 'int64'),      # Step it left at its destination (-1 not yet)
+    ('waits', 'int64'),        # Steps spent queued
+    ('free_flow', 'float64'),  # Steps its route takes on empty streets
+)
+
+
+def random_trips(graph, count, seed=None):
+    """
+    count (origin, destination) cell pairs, both in the same strongly
+    connected component so a route always exists.
+    """
+    rng = random.Random(seed)
+    component = component_index(graph).component
+    groups = {}
+    for cell in graph.node_indices():
+        if component[cell] != -1:
+            groups.setdefault(component[cell], []).append(cell)
+    cells = [cell for members in groups.values() if len(members) > 1 for cell in members]
+    if not cells:
+        return []
+    trips = []
+    for _ in range(count):
+        origin = rng.choice(cells)
+        members = groups[component[origin]]
+        destination = origin
+        while destination == origin:
+            destination = rng.choice(members)
+        trips.append((origin, destination))
+    return trips
+
+
+class TrafficSimulation:
+    """
+    Discrete-time traffic over a CompactGraph, without any GUI.
+    Each vehicle follows a route of cell indices that must respect the
+    one-way rules. Crossing a cell takes as many steps as the profile cost
+    of entering it; at the end of its cell a vehicle moves on only if the
+    next cell has room, otherwise it queues (longest waiting first when
+    several compete for the same cell). Space freed during a step is only
+    reused on the next one, except by two vehicles swapping between
+    adjacent crossings.
+    State lives in NumPy arrays indexed by vehicle, so a step is a fixed
+    number of array operations whatever the number of vehicles.
+    The graph is only modified by feed_back / reset_costs.
+    """
+    def __init__(self, graph, profile=None, street_capacity=STREET_CAPACITY,
+                 crossing_capacity=CROSSING_CAPACITY, method=DIJKSTRA):
+        np = self.np = require_numpy("TrafficSimulation")
+        self.graph = graph
+        self.profile = profile or graph.profile
+        self.method = method
+        self.codes = np.frombuffer(graph.cells, dtype=np.uint8).copy()
+        # Steps needed to cross each cell (the cost of entering it)
+        self.cost = np.asarray(graph.cost_tables[self.profile], dtype=float)[self.codes]
+        crossing = np.isin(self.codes, CROSSING_CODES)
+        self.capacity = np.where(crossing, crossing_capacity, street_capacity).astype(np.int64)
+        self.occupancy = np.zeros(graph.size, dtype=np.int64)
+        self.queue_steps = np.zeros(graph.size, dtype=np.int64)  # Vehicle-steps queued in each cell
+        self.route_cells = np.zeros(0, dtype=np.int64)
+        for name, dtype in VEHICLE_FIELDS:
+            setattr(self, name, np.zeros(0, dtype=dtype))
+        self.steps = 0
+        self.queued = 0          # Vehicles that could not move on the last step
+        self.stalled = 0         # Consecutive steps in which nothing on the map moved
+        self.unroutable = 0      # Trips of add_trips without a route
+        self.history = []        # Vehicles arrived at each step
+        self._blocked = np.zeros(0, dtype=np.int64)  # Vehicles queued on the map at the last step
+        self._edge_keys = None
+        self._fed = set()        # Cells whose entry cost feed_back raised
+
+    @property
+    def vehicle_count(self):
+        return len(self.offset)
+
+    @property
+    def done(self):
+        """True once every vehicle has reached its destination."""
+        return bool((self.arrived >= 0).all())
+
+    def add_trips(self, trips, depart=0):
+        """
+        Adds one vehicle per (origin, destination) pair of cell indices,
+        routed with Pathfinder on the current weights.
+        depart: first step to enter the map, one int or one per trip.
+        Returns the number of vehicles added (trips without route are
+        counted in unroutable).
+        """
+        np = self.np
+        trips = list(trips)
+        departs = np.broadcast_to(np.asarray(depart, dtype=np.int64), (len(trips),))
+        routes, kept = [], []
+        for number, (path, _) in enumerate(Pathfinder.find_paths(self.graph, trips, self.method, self.profile)):
+            if path is None:
+                self.unroutable += 1
+                continue
+            routes.append(path)
+            kept.append(departs[number])
+        return self.add_routes(routes, kept)
+
+    def add_routes(self, routes, depart=0):
+        """
+        Adds one vehicle per route (list of cell indices, origin first).
+        Raises ValueError if a route crosses a block or goes against a one-way street.
+        """
+        np = self.np
+        flat, lengths = self._pack(routes)
+        if not len(lengths):
+            return 0
+        count = len(lengths)
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        values = {
+            'route_start': starts + len(self.route_cells),
+            'route_len': lengths,
+            'offset': np.full(count, -1),
+            'progress': np.zeros(count),
+            'speed': np.zeros(count),
+            'depart': np.broadcast_to(np.asarray(depart, dtype=np.int64), (count,)),
+            'entered': np.full(count, -1),
+            'arrived': np.full(count, -1),
+            'waits': np.zeros(count),
+            'free_flow': np.add.reduceat(self.cost[flat], starts),
+        }
+        self.route_cells = np.concatenate((self.route_cells, flat))
+        for name, dtype in VEHICLE_FIELDS:
+            setattr(self, name, np.concatenate((getattr(self, name), np.asarray(values[name], dtype=dtype))))
+        return count
+
+    def _pack(self, routes):
+        # Routes as one flat array plus their lengths, checked against the graph
+        np = self.np
+        routes = [list(route) for route in routes]
+        if any(not route for route in routes):
+            raise ValueError("Empty route")
+        lengths = np.array([len(route) for route in routes], dtype=np.int64)
+        flat = np.fromiter(chain.from_iterable(routes), dtype=np.int64, count=int(lengths.sum()))
+        if not len(flat):
+            return flat, lengths
+        if flat.min() < 0 or flat.max() >= self.graph.size:
+            raise ValueError("Route cell outside the map")
+        closed = np.flatnonzero(np.isin(self.codes[flat], IMPASSABLE_CODES))
+        if len(closed):
+            raise ValueError(f"Route enters closed cell {self.graph.coords(int(flat[closed[0]]))}")
+
+        # Every consecutive pair inside a route must be an edge of the graph
+        inner = np.ones(len(flat) - 1, dtype=bool)
+        inner[np.cumsum(lengths)[:-1] - 1] = False # Last cell of a route -> first of the next
+        sources, targets = flat[:-1][inner], flat[1:][inner]
+        keys = sources * self.graph.size + targets
+        edges = self._edges()
+        slots = np.searchsorted(edges, keys)
+        found = np.zeros(len(keys), dtype=bool)
+        inside = slots < len(edges)
+        found[inside] = edges[slots[inside]] == keys[inside]
+        if not found.all():
+            wrong = np.flatnonzero(~found)[0]
+            a, b = self.graph.coords(int(sources[wrong])), self.graph.coords(int(targets[wrong]))
+            raise ValueError(f"Route moves {a} -> {b} against the one-way rules")
+        return flat, lengths
+
+    def _edges(self):
+        # Sorted source * size + target keys of every edge
+        if self._edge_keys is None:
+            np, graph = self.np, self.graph
+            offsets = np.frombuffer(graph.offsets, dtype=np.int32)
+            targets = np.frombuffer(graph.targets, dtype=np.int32).astype(np.int64)
+            sources = np.repeat(np.arange(graph.size, dtype=np.int64), np.diff(offsets))
+            self._edge_keys = np.sort(sources * graph.size + targets)
+        return self._edge_keys
+
+    def _current_cells(self, vehicles):
+        return self.route_cells[self.route_start[vehicles] + self.offset[vehicles]]
+
+    def step(self):
+        """Advances every vehicle by one time step. Returns the vehicles arrived."""
+        np = self.np
+        now = self.steps
+        on_map = (self.offset >= 0) & (self.arrived < 0)
+        self.progress[on_map] += self.speed[on_map]
+        ready = on_map & (self.progress >= 1 - EPSILON)
+        entering = (self.offset < 0) & (self.depart <= now)
+        candidates = np.flatnonzero(ready | entering)
+        following = self.offset[candidates] + 1
+
+        # Leaving the map at the destination never waits
+        last = following >= self.route_len[candidates]
+        done = candidates[last]
+        movers, following = candidates[~last], following[~last]
+        targets = self.route_cells[self.route_start[movers] + following]
+
+        # Room left in each target cell goes to the longest waiting vehicles
+        order = np.lexsort((-self.waits[movers], targets))
+        ranked = targets[order]
+        positions = np.arange(len(ranked))
+        group_start = np.ones(len(ranked), dtype=bool)
+        group_start[1:] = ranked[1:] != ranked[:-1]
+        rank = positions - np.maximum.accumulate(np.where(group_start, positions, 0))
+        admitted = np.zeros(len(movers), dtype=bool)
+        admitted[order] = rank < self.capacity[ranked] - self.occupancy[ranked]
+
+        # Two vehicles facing each other across adjacent single-vehicle cells
+        # (crossings next to each other) would wait forever: they swap places
+        waiting = np.flatnonzero(~admitted & (self.offset[movers] >= 0))
+        here, there = self._current_cells(movers[waiting]), targets[waiting]
+        single = (self.capacity[here] == 1) & (self.capacity[there] == 1)
+        waiting, here, there = waiting[single], here[single], there[single]
+        size = self.graph.size
+        admitted[waiting[np.isin(here * size + there, there * size + here)]] = True
+        moved, blocked = movers[admitted], movers[~admitted]
+
+        leaving = np.concatenate((done, moved))
+        leaving = leaving[self.offset[leaving] >= 0]
+        np.subtract.at(self.occupancy, self._current_cells(leaving), 1)
+        np.add.at(self.occupancy, targets[admitted], 1)
+
+        was_on_map = self.offset[moved] >= 0
+        self.entered[moved[~was_on_map]] = now
+        self.progress[moved] = np.where(was_on_map, np.maximum(self.progress[moved] - 1, 0.0), 0.0)
+        self.offset[moved] += 1
+        self.speed[moved] = 1.0 / self.cost[targets[admitted]]
+        self.arrived[done] = now
+
+        # Queued vehicles wait at the end of their cell (or outside the map)
+        self.waits[blocked] += 1
+        self.progress[blocked] = np.minimum(self.progress[blocked], 1.0)
+        queued = blocked[self.offset[blocked] >= 0]
+        np.add.at(self.queue_steps, self._current_cells(queued), 1)
+        self.queued = len(blocked)
+        self._blocked = queued
+        if len(moved) or len(done) or not ready[on_map].all():
+            self.stalled = 0
+        elif on_map.any():
+            self.stalled += 1
+
+        self.steps += 1
+        self.history.append(len(done))
+        return len(done)
+
+    def run(self, steps, feedback_every=None, reroute=False):
+        """
+        Runs up to `steps` steps, stopping early once every vehicle arrived
+        or after GRIDLOCK_STEPS steps in which no vehicle could move.
+        feedback_every: call feed_back every that many steps, so new routes
+        avoid congested cells; with reroute the queued vehicles are also
+        routed again from where they stand.
+        Returns stats().
+        """
+        for _ in range(steps):
+            if self.done or self.stalled >= GRIDLOCK_STEPS:
+                break
+            self.step()
+            if feedback_every and self.steps % feedback_every == 0:
+                self.feed_back()
+                if reroute:
+                    self.reroute_queued()
+        return self.stats()
+
+    def congestion_factors(self):
+        """{cell index: entry cost factor} from the current load of each occupied cell."""
+        np = self.np
+        loaded = np.flatnonzero(self.occupancy)
+        load = self.occupancy[loaded] / self.capacity[loaded]
+        return {int(cell): 1 + CONGESTION_WEIGHT * float(value) for cell, value in zip(loaded, load)}
+
+    def feed_back(self):
+        """
+        Writes the live congestion into the graph weights (every profile),
+        restoring cells that have emptied since the last call.
+        Returns the factors applied.
+        """
+        factors = self.congestion_factors()
+        for cell in self._fed - factors.keys():
+            factors[cell] = 1
+        self.graph.set_entry_costs(factors)
+        self._fed = {cell for cell, factor in factors.items() if factor != 1}
+        return factors
+
+    def reset_costs(self):
+        """Restores the profile cost of every cell feed_back changed."""
+        self.graph.set_entry_costs({cell: 1 for cell in self._fed})
+        self._fed = set()
+
+    def reroute_queued(self):
+        """
+        Routes the vehicles queued on the last step again, from their
+        current cell, on the current weights. Returns how many changed route.
+        """
+        np = self.np
+        vehicles = self._blocked
+        if not len(vehicles):
+            return 0
+        here = self._current_cells(vehicles)
+        goals = self.route_cells[self.route_start[vehicles] + self.route_len[vehicles] - 1]
+        pairs = list(zip(here.tolist(), goals.tolist()))
+        changed, routes = [], []
+        for vehicle, (path, _) in zip(vehicles, Pathfinder.find_paths(self.graph, pairs, self.method, self.profile)):
+            start, offset = self.route_start[vehicle], self.offset[vehicle]
+            remaining = self.route_cells[start + offset:start + self.route_len[vehicle]]
+            if path is not None and path != remaining.tolist():
+                changed.append(vehicle)
+                routes.append(path)
+        if not routes:
+            return 0
+        flat, lengths = self._pack(routes)
+        changed = np.asarray(changed)
+        self.route_start[changed] = len(self.route_cells) + np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        self.route_len[changed] = lengths
+        self.offset[changed] = 0 # The new route starts at the current cell
+        self.route_cells = np.concatenate((self.route_cells, flat))
+        return len(changed)
+
+    def hotspots(self, count=10):
+        """The count cells with most queueing so far: [(x, y, vehicle-steps queued)]."""
+        np = self.np
+        cells = np.argsort(self.queue_steps, kind='stable')[::-1][:count]
+        return [self.graph.coords(int(cell)) + (int(self.queue_steps[cell]),) for cell in cells if self.queue_steps[cell]]
+
+    def stats(self):
+        """Throughput and delay figures of the run so far."""
+        arrived = self.arrived >= 0
+        travel = (self.arrived - self.entered)[arrived]
+        delay = travel - self.free_flow[arrived]
+        recent = self.history[-100:]
+        return {
+            'steps': self.steps,
+            'vehicles': self.vehicle_count,
+            'unroutable': self.unroutable,
+            'arrived': int(arrived.sum()),
+            'on_map': int(((self.offset >= 0) & ~arrived).sum()),
+            'not_entered': int((self.offset < 0).sum()),
+            'queued': self.queued,
+            'gridlock': self.stalled >= GRIDLOCK_STEPS,
+            'throughput': float(arrived.sum()) / self.steps if self.steps else 0.0,  # Vehicles per step
+            'recent_throughput': sum(recent) / len(recent) if recent else 0.0,
+            'mean_travel': float(travel.mean()) if len(travel) else 0.0,
+            'mean_delay': float(delay.mean()) if len(delay) else 0.0,
+            'max_delay': float(delay.max()) if len(delay) else 0.0,
+            'full_cells': int(((self.occupancy > 0) & (self.occupancy >= self.capacity)).sum()),
+        }
@@ -0,0 +1,217 @@
+from collections import namedtuple, OrderedDict
+from models.components import component_index
+from models.distance_matrix import compute_rows, costs_to_targets
+from models.pathfinder import Pathfinder
+
+INF = float('inf')
+# Stop counts up to this are solved exactly (Held-Karp is O(2^n * n^2))
+HELD_KARP_LIMIT = 12
+# Rows of pairwise costs kept (one per stop and profile)
+DEFAULT_CAPACITY = 256
+
+# order: stops in visiting order, path: stitched list of cells (None if impossible)
+TripPlan = namedtuple('TripPlan', ['order', 'cost', 'path'])
+
+
+def tour_cost(costs, order, return_to_start=False):
+    """Cost of visiting order (indices into costs, 0 is the start)."""
+    total = 0
+    previous = 0
+    for stop in order:
+        total += costs[previous][stop]
+        previous = stop
+    if return_to_start:
+        total += costs[previous][0]
+    return total
+
+
+def held_karp(costs, return_to_start=False):
+    """
+    Exact cheapest order over stops 1..n-1 of the cost matrix (0 is the start).
+    Bitmask DP; costs may be asymmetric (one-way streets).
+    Returns (order, cost), cost INF when the stops cannot all be visited.
+    """
+    count = len(costs) - 1
+    if count == 0:
+        return [], 0
+    full = (1 << count) - 1
+    # best[mask][last]: cheapest route from the start through mask ending at stop last + 1
+    best = [[INF] * count for _ in range(1 << count)]
+    previous = [[-1] * count for _ in range(1 << count)]
+    for last in range(count):
+        best[1 << last][last] = costs[0][last + 1]
+
+    for mask in range(1, full + 1):
+        row = best[mask]
+        for last in range(count):
+            cost = row[last]
+            if cost == INF or not mask >> last & 1:
+                continue
+            for following in range(count):
+                if mask >> following & 1:
+                    continue
+                new_cost = cost + costs[last + 1][following + 1]
+                extended = mask | 1 << following
+                if new_cost < best[extended][following]:
+                    best[extended][following] = new_cost
+                    previous[extended][following] = last
+
+    closing = [(best[full][last] + (costs[last + 1][0] if return_to_start else 0), last) for last in range(count)]
+    cost, last = min(closing)
+    if cost == INF:
+        return None, INF
+
+    order = []
+    mask = full
+    while last != -1:
+        order.append(last + 1)
+        mask, last = mask & ~(1 << last), previous[mask][last]
+    order.reverse()
+    return order, cost
+
+
+def nearest_neighbor(costs):
+    unvisited = set(range(1, len(costs)))
+    order = []
+    current = 0
+    while unvisited:
+        current = min(unvisited, key=lambda stop: (costs[current][stop], stop))
+        unvisited.discard(current)
+        order.append(current)
+    return order
+
+
+def improve_order(costs, order, return_to_start=False):
+    """
+    Local search from an initial order: 2-opt (reverse a segment) and
+    Or-opt (move a run of 1-3 stops elsewhere) until no move improves it.
+    Full tour costs are compared because reversing a segment changes its
+    cost on asymmetric (one-way) matrices.
+    """
+    order = list(order)
+    best = tour_cost(costs, order, return_to_start)
+    improved = True
+    while improved:
+        improved = False
+        size = len(order)
+        # 2-opt
+        for i in range(size - 1):
+            for j in range(i + 1, size):
+                candidate = order[:i] + order[i:j + 1][::-1] + order[j + 1:]
+                cost = tour_cost(costs, candidate, return_to_start)
+                if cost < best:
+                    order, best, improved = candidate, cost, True
+        # Or-opt
+        for length in (1, 2, 3):
+            for i in range(size - length + 1):
+                segment = order[i:i + length]
+                rest = order[:i] + order[i + length:]
+                for position in range(len(rest) + 1):
+                    if position == i:
+                        continue
+                    candidate = rest[:position] + segment + rest[position:]
+                    cost = tour_cost(costs, candidate, return_to_start)
+                    if cost < best:
+                        order, best, improved = candidate, cost, True
+                        break
+    return order, best
+
+
+def solve_order(costs, return_to_start=False):
+    """Held-Karp for small stop counts, nearest neighbor + local search otherwise."""
+    if len(costs) - 1 <= HELD_KARP_LIMIT:
+        return held_karp(costs, return_to_start)
+    order, cost = improve_order(costs, nearest_neighbor(costs), return_to_start)
+    return (order, cost) if cost != INF else (None, INF)
+
+
+class TripPlanner:
+    """
+    Multi-stop routes over a CompactGraph. Pairwise costs are kept per
+    (profile, stop) as the row of costs from that stop to every stop seen
+    with it, so trying other orders repeats no search, and adding a stop
+    only searches its own row (one forward search) and its column (one
+    search over the reversed edges). Rows belong to one graph version and
+    are dropped once it moves on; at most capacity rows are kept, least
+    recently used first out.
+    """
+    def __init__(self, graph, capacity=DEFAULT_CAPACITY):
+        self.graph = graph
+        self.capacity = capacity
+        self.searches = 0            # Searches run so far (matrix rows, columns and legs)
+        self._version = graph.version
+        self._rows = OrderedDict()   # (profile, source) -> {target: cost or INF}
+
+    def cost_matrix(self, points, profile=None, monitor=None):
+        """
+        costs[i][j] from points[i] to points[j] (INF without route).
+        monitor: called with the searches run so far after each one; it may
+        raise to abandon the computation.
+        """
+        graph = self.graph
+        profile = profile or graph.profile
+        if graph.version != self._version:
+            self._rows.clear()
+            self._version = graph.version
+        components = component_index(graph)
+        wanted = list(dict.fromkeys(points))
+        rows = {}
+        for source in wanted:
+            row = self._rows.get((profile, source))
+            if row is not None:
+                rows[source] = row
+
+        # New targets of known rows: one reverse search from each target
+        for target in wanted:
+            sources = [source for source, row in rows.items() if target not in row and source != target]
+            if not sources:
+                continue
+            rev_offsets, rev_sources, _ = graph.reverse_adjacency()
+            found = costs_to_targets(rev_offsets, rev_sources, graph.reverse_weights(profile), target,
+                                     [source for source in sources if components.reachable(source, target)])
+            for source in sources:
+                rows[source][target] = found.get(source, INF)
+            self._searched(monitor)
+
+        # New stops: one forward search each
+        for source in wanted:
+            if source in rows:
+                continue
+            task = (source, [target for target in wanted if components.reachable(source, target)])
+            found, = compute_rows(graph, [task], profile)
+            rows[source] = {target: found.get(target, INF) for target in wanted}
+            self._searched(monitor)
+
+        for source, row in rows.items():
+            self._rows[(profile, source)] = row
+            self._rows.move_to_end((profile, source))
+        while len(self._rows) > self.capacity:
+            self._rows.popitem(last=False)
+        return [[0 if source == target else rows[source][target] for target in points] for source in points]
+
+    def _searched(self, monitor):
+        self.searches += 1
+        if monitor:
+            monitor(self.searches)
+
+    def plan(self, start, stops, profile=None, return_to_start=False, monitor=None):
+        """
+        Cheapest order to visit every cell of stops from start.
+        monitor: see cost_matrix, also called after each leg search.
+        Returns a TripPlan; order None and cost INF when some stop cannot be reached.
+        """
+        profile = profile or self.graph.profile
+        stops = list(stops)
+        points = [start] + stops
+        order, cost = solve_order(self.cost_matrix(points, profile, monitor), return_to_start)
+        if order is None:
+            return TripPlan(None, INF, None)
+
+        # Only the chosen legs are searched again to get their cells
+        visits = [points[stop] for stop in order] + ([start] if return_to_start else [])
+        path = [start]
+        for origin, destination in zip([start] + visits, visits):
+            leg, _ = Pathfinder.find_path_indices(self.graph, origin, destination, profile=profile)
+            path += leg[1:]
+            self._searched(monitor)
+        return TripPlan([stops[stop - 1] for stop in order], cost, path)
@@ -1,10 +1,35 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox, simpledialog
 from ui.map_canvas import MapCanvas
-from models.map_loader import MapLoader
-from models.pathfinder import Pathfinder
+from ui.palette import color
+from models.map_loader import MapLoader, profile_for_hour
+from models.pathfinder import Pathfinder, CORRIDOR, CONTRACTION
+from models.contraction import built_hierarchy
+from models.route_cache import RouteCache
+from models.components import component_index, built_components
+from models.destination_trees import DestinationTrees
+from models.trip_planner import TripPlanner
+from models.incidents import IncidentFeed, IncidentApplier, RouteLegs, revalidate
+from models.compute_service import ComputeService, PROGRESS, DONE, FAILED
 import os
 
+# Live incident reports (JSON lines) are read from this file next to the map
+INCIDENTS_FILE = "incidentes.jsonl"
+# Milliseconds between two reads of the compute service events
+COMPUTE_POLL_MS = 50
+
+# Cell types offered by "Modificar Mapa": (label, CSV value)
+EDIT_TYPES = [
+    ("⛔ Bloqueo (0)", "0"),
+    ("🚧 Calle bloqueada (B)", "B"),
+    ("← Calle (L)", "L"),
+    ("→ Calle (R)", "R"),
+    ("↑ Avenida (N)", "N"),
+    ("↓ Avenida (S)", "S"),
+    ("✚ Cruce (C)", "C"),
+    ("↔ Doble sentido (ND)", "ND"),
+]
+
 class MainWindow:
     def __init__(self, root, current_user):
         self.root = root
@@ -18,9 +43,19 @@ class MainWindow:
         self.end_point = None
         self.destinations = {} # Name -> NodeID
         self.current_hour = 12 # Default normal
+        self.route_cache = RouteCache() # Repeated start/end presses skip the search
+        self.destination_trees = DestinationTrees() # Saved destinations: routes without search
+        self.trip_planner = None # Multi-stop orders, keeps pairwise costs of the loaded map
+        self.incident_feed = None # Background reader of live incident reports
+        self.incidents = None # Applies incident batches to the loaded map
+        self.touched_cells = set() # Cells changed by incidents since the routes on screen were checked
+        self.eased_cells = set() # Those of touched_cells that got cheaper or were reopened
+        self.route_legs = RouteLegs() # D* Lite legs of the routes on screen, repaired by incidents
+        self.compute = ComputeService() # Searches run off the Tk thread
         
         # UI Components
         self._build_ui()
+        self.root.after(COMPUTE_POLL_MS, self._poll_compute)
 
     def _build_ui(self):
         # Toolbar / Sidebar
@@ -57,7 +92,10 @@ class MainWindow:
         self.spin_hour.insert(0, 12)
         self.spin_hour.pack(fill="x")
 
-        tk.Button(frame_nav, text="🚀 Calcular Ruta", command=self._calculate_route, bg="#4CAF50", fg="white", font=("Arial", 9, "bold")).pack(fill="x", pady=10)
+        tk.Button(frame_nav, text="🚀 Calcular Ruta", command=self._calculate_route, bg="#4CAF50", fg="white", font=("Arial", 9, "bold")).pack(fill="x", pady=(10, 0))
+        tk.Button(frame_nav, text="🕒 Salir a una Hora", command=self._plan_trip).pack(fill="x", pady=(2, 0))
+        self.lbl_status = tk.Label(frame_nav, text="", bg="#f0f0f0", fg="#555", font=("Consolas", 8))
+        self.lbl_status.pack(anchor="w", pady=(0, 10))
         
         # Group 3: Destinos
         frame_dest = tk.LabelFrame(toolbar, text="Destinos", bg="#f0f0f0", font=("Arial", 10, "bold"), padx=5, pady=5)
@@ -71,6 +109,26 @@ class MainWindow:
         tk.Button(btn_frame_dest, text="💾 Guardar", command=self._save_destination, width=8).pack(side="left")
         tk.Button(btn_frame_dest, text="🗑️ Borrar", command=self._delete_destination, width=8).pack(side="right")
         tk.Button(frame_dest, text="📍 Ir a Destino", command=self._load_destination_to_end).pack(fill="x", pady=2)
+        tk.Button(frame_dest, text="🧭 Planificar Viaje", command=self._plan_multi_stop).pack(fill="x", pady=2)
+
+        # Group 4: Modificar Mapa (right click on a cell applies the selected type)
+        frame_edit = tk.LabelFrame(toolbar, text="Modificar Mapa", bg="#f0f0f0", font=("Arial", 10, "bold"), padx=5, pady=5)
+        frame_edit.pack(fill="x", pady=5)
+        self.edit_value = tk.StringVar(value=EDIT_TYPES[0][0])
+        tk.OptionMenu(frame_edit, self.edit_value, *[label for label, _ in EDIT_TYPES]).pack(fill="x")
+        tk.Button(frame_edit, text="↩️ Deshacer", command=self._undo_map_edit).pack(fill="x", pady=2)
+
+        # Group 5: Isócronas (cells within each cost from Inicio, or that reach Fin within it)
+        frame_iso = tk.LabelFrame(toolbar, text="Isócronas", bg="#f0f0f0", font=("Arial", 10, "bold"), padx=5, pady=5)
+        frame_iso.pack(fill="x", pady=5)
+        tk.Label(frame_iso, text="Costos (ej. 10,20,30):", bg="#f0f0f0").pack(anchor="w")
+        self.entry_budgets = tk.Entry(frame_iso)
+        self.entry_budgets.insert(0, "10,20,30")
+        self.entry_budgets.pack(fill="x")
+        btn_frame_iso = tk.Frame(frame_iso, bg="#f0f0f0")
+        btn_frame_iso.pack(fill="x", pady=2)
+        tk.Button(btn_frame_iso, text="⏱ Desde Inicio", command=lambda: self._calculate_isochrone(reverse=False), width=10).pack(side="left")
+        tk.Button(btn_frame_iso, text="⏱ Hacia Fin", command=lambda: self._calculate_isochrone(reverse=True), width=10).pack(side="right")
 
         # Exit Button
         tk.Button(toolbar, text="❌ Salir", command=self.root.quit, bg="#FFCDD2", fg="red").pack(fill="x", pady=20, side="bottom")
@@ -86,6 +144,7 @@ class MainWindow:
         # Placeholder Canvas
         self.map_canvas = MapCanvas(self.canvas_frame, None, [], on_click_callback=self._on_map_click)
         self.map_canvas.pack(expand=True, fill="both", padx=10, pady=10)
+        self.map_canvas.bind("<Button-3>", self._modify_map_mode)
 
     def _load_map_dialog(self):
         filepath = filedialog.askopenfilename(
@@ -100,35 +159,170 @@ class MainWindow:
         """
         Loads the map from the CSV file and initializes the graph.
         Inputs: filepath (str)
+        Outputs: None (_on_map_loaded finishes the setup)
+        Restrictions: File must be a valid CSV. Parsing and compiling run on
+        the compute thread; rows are drawn as they are parsed.
+        """
+        self.compute.cancel()
+        self.graph = None
+        self.map_canvas.set_map(None, [])
+        self.lbl_status.config(text="Cargando mapa...")
+        self.compute.submit(self._map_job, MapLoader(filepath, use_cache=True), tag="map")
+
+    def _map_job(self, loader, monitor):
+        # Runs on the compute thread: no Tk calls here. Row chunks travel as progress.
+        graph = loader.load_graph(on_rows=lambda first, rows: monitor((first, rows))) # Parses and builds topology once
+        return loader, graph
+
+    def _on_map_loaded(self, loader, graph):
+        """
+        Activates a map loaded by _map_job.
+        Inputs: loader (MapLoader), graph (CompactGraph or None)
         Outputs: None (Updates internal state)
-        Restrictions: File must be a valid CSV.
+        Restrictions: Runs on the Tk thread.
         """
-        self.map_loader = MapLoader(filepath)
+        if graph is None:
+            self.lbl_status.config(text="")
+            messagebox.showerror("Error", "No se pudo cargar el mapa.")
+            return
+        for profile in (self.graph.profiles if self.graph else ()):
+            self.compute.cancel(f"index-{profile}") # Index of the previous map
+        self.map_loader = loader
+        self.route_cache.invalidate()
+        self.destination_trees.invalidate()
+        self.graph = graph
+        self.trip_planner = TripPlanner(self.graph)
+        for point in self.destinations.values():
+            index = graph.index(*point)
+            if index is not None:
+                self.destination_trees.schedule(graph, index)
         self._refresh_graph()
-        self.map_canvas.set_map(self.graph, self.map_loader.raw_matrix)
-        messagebox.showinfo("Mapa Cargado", "El mapa ha sido cargado exitosamente.")
+        self.map_canvas.set_map(self.graph, loader.raw_matrix, redraw=False)
+        self._start_incident_feed(os.path.join(os.path.dirname(loader.file_path), INCIDENTS_FILE))
+        self.lbl_status.config(text="Mapa cargado")
+        self._submit_index()
+
+    def _submit_index(self):
+        """
+        Queues the CH index of the active profile as a background job.
+        Inputs: None
+        Outputs: None
+        Restrictions: Only for the map as loaded (edits would mean contracting again);
+                      routes use corridor searches until the index is ready.
+        """
+        if not self.graph:
+            return
+        profile = self.graph.profile
+        if self.graph.version or built_hierarchy(self.graph, profile) is not None:
+            return
+        self.compute.submit(self._index_job, self.map_loader, profile,
+                            tag=f"index-{profile}", background=True)
+
+    def _index_job(self, loader, profile, monitor):
+        # Runs on the compute thread, yielding to route jobs at every monitor call:
+        # the component index first (searches need it), then maps the CH index
+        # saved next to the map, or builds and saves it
+        component_index(loader.graph)
+        loader.load_hierarchy(profile, monitor)
+        return profile
+
+    def _start_incident_feed(self, path):
+        """
+        Follows the incident file of the loaded map on a background thread.
+        Inputs: path (str), JSON-lines file, may not exist yet
+        Outputs: None (_poll_compute applies the batches with _apply_incidents)
+        Restrictions: Batches wait in the feed's queue; the reader threads never call Tk.
+        """
+        if self.incident_feed:
+            self.incident_feed.stop()
+        self.incidents = IncidentApplier(self.map_loader)
+        self._routes_replaced()
+        self.incident_feed = IncidentFeed.from_file(path).start()
+
+    def _apply_incidents(self, batch):
+        """
+        Applies one coalesced batch of incidents and re-checks the routes on screen.
+        Inputs: batch ({(x, y): Incident})
+        Outputs: None (Redraws touched cells; _poll_compute redraws the routes that go through them)
+        Restrictions: Runs on the Tk thread; the routes are repaired on the compute thread, not searched again.
+        """
+        if not self.graph or self.incidents.loader is not self.map_loader: return
+        touched = self.incidents.apply(batch)
+        if not touched: return
+        self.destination_trees.refresh(self.graph) # Trees of the previous version no longer match
+        self.map_canvas.redraw_cells([self.graph.coords(index) for index in touched])
+        self.touched_cells.update(touched)
+        self.eased_cells.update(self.incidents.eased)
+        self._submit_revalidation()
+
+    def _submit_revalidation(self):
+        # A route or plan search still running checks the map version itself
+        # and starts over, so it is not replaced by a re-check of the old routes
+        if self.compute.busy("route"): return
+        shown = list(self.map_canvas.shown_paths)
+        if not shown:
+            self._routes_replaced()
+            return
+        self.compute.submit(self._revalidate_job, self.graph, shown, frozenset(self.touched_cells),
+                            frozenset(self.eased_cells), self.graph.profile, self.graph.version,
+                            self.route_legs, tag="route")
+
+    def _revalidate_job(self, graph, shown, touched, eased, profile, version, legs, monitor):
+        # Runs on the compute thread: no Tk calls here. The legs of the routes
+        # are repaired from the touched cells instead of searched again
+        return shown, version, revalidate(graph, dict(enumerate(shown)), touched, profile, monitor, legs, eased)
+
+    def _routes_replaced(self):
+        # The routes on screen were searched on the current map (or cleared):
+        # nothing to re-check, and the legs of the previous ones are dropped
+        self.touched_cells.clear()
+        self.eased_cells.clear()
+        self.route_legs = RouteLegs()
+
+    def _on_revalidation_event(self, event):
+        if event.kind == DONE:
+            self._show_revalidated(*event.value)
+        elif event.kind == FAILED:
+            messagebox.showerror("Error", f"Error al recalcular la ruta: {event.value}")
+
+    def _show_revalidated(self, shown, version, rerouted):
+        if self.graph is None or shown != self.map_canvas.shown_paths:
+            return # Routes replaced meanwhile
+        if version != self.graph.version:
+            self._submit_revalidation() # More incidents arrived during the search
+            return
+        self.touched_cells.clear()
+        self.eased_cells.clear()
+        if not rerouted: return
+        self.map_canvas.clear_paths()
+        for number, (waypoints, path) in enumerate(shown):
+            if number in rerouted:
+                path = rerouted[number][0]
+            self.map_canvas.highlight_path(path, waypoints)
+        if any(path is None for path, _ in rerouted.values()):
+            messagebox.showwarning("Incidente", "Un incidente cortó la ruta mostrada.")
 
     def _refresh_graph(self):
         """
-        Rebuilds the graph with weights based on the current hour.
+        Activates the weight profile (normal/peak) of the current hour.
         Inputs: None (Reads from spin_hour)
         Outputs: None
+        Restrictions: O(1), the graph topology is not rebuilt.
         """
-        # Reload graph based on current hour
-        if not self.map_loader: return
+        if not self.graph: return
         
         h = int(self.spin_hour.get())
-        is_peak = (6 <= h <= 9) or (12 <= h <= 13) or (17 <= h <= 20)
-        
-        # Rebuild graph
-        self.graph = self.map_loader.load_graph(is_peak_hour=is_peak)
+        self.graph.set_profile(profile_for_hour(h))
         if self.map_canvas:
             self.map_canvas.graph = self.graph
 
     def _on_hour_change(self):
-        # When hour changes, we might need to update graph weights?
-        # Only strict requirement is calculation time, but let's update graph to be safe
+        # Swap the active weight vector, no disk I/O; a route or isochrone of the old hour is stale
+        self.compute.cancel("route")
+        self.compute.cancel("isochrone")
+        self.map_canvas.clear_overlay()
         self._refresh_graph()
+        self._submit_index()
 
     def _on_map_click(self, x, y):
         """
@@ -137,34 +331,56 @@ class MainWindow:
         Outputs: None
         Restrictions: Cannot select blocked cells.
         """
+        self.compute.cancel("route") # New points: a running search is stale
         # Select interactively
         if not self.start_point:
             self.start_point = (x, y)
             self.lbl_start.config(text=f"Inicio: ({x},{y})")
             # Visual feedback
-            self.map_canvas.create_oval(
-                x*40+10, y*40+10, x*40+30, y*40+30, 
-                fill="blue", outline="white", width=2, tags="marker_start"
-            )
+            self.map_canvas.mark_cell(x, y, color('START', self.map_canvas.theme), "marker_start")
         elif not self.end_point:
             self.end_point = (x, y)
             self.lbl_end.config(text=f"Fin: ({x},{y})")
-            self.map_canvas.create_oval(
-                x*40+10, y*40+10, x*40+30, y*40+30, 
-                fill="red", outline="white", width=2, tags="marker_end"
-            )
+            self.map_canvas.mark_cell(x, y, color('END', self.map_canvas.theme), "marker_end")
+            self._flag_if_unreachable()
         else:
             # Maybe reset if clicked again? or ignore
             pass
 
+    def _flag_if_unreachable(self):
+        """
+        Marks the end point when no route leads to it from the start point.
+        Inputs: None (Uses internal start/end points)
+        Outputs: bool, True if a route exists
+        Restrictions: O(1) lookup in the component index, no search. Until the
+                      compute service has built it, the route search answers instead.
+        """
+        self.map_canvas.delete("unreachable")
+        if not self.graph or not self.start_point or not self.end_point:
+            return True
+        start = self.graph.index(*self.start_point)
+        end = self.graph.index(*self.end_point)
+        components = built_components(self.graph)
+        if components is None or components.reachable(start, end):
+            return True
+        x, y = self.end_point
+        self.lbl_end.config(text=f"Fin: ({x},{y}) ⛔")
+        self.map_canvas.flag_unreachable(x, y)
+        return False
+
     def _clear_points(self):
+        self.compute.cancel("route")
+        self.compute.cancel("isochrone")
+        self.map_canvas.clear_overlay()
+        self.lbl_status.config(text="")
         self.start_point = None
         self.end_point = None
         self.lbl_start.config(text="Inicio: N/A")
         self.lbl_end.config(text="Fin: N/A")
         self.map_canvas.delete("marker_start")
         self.map_canvas.delete("marker_end")
-        self.map_canvas.delete("path")
+        self.map_canvas.delete("unreachable")
+        self.map_canvas.clear_paths()
 
     def _calculate_route(self):
         """
@@ -182,12 +398,138 @@ class MainWindow:
 
         self._refresh_graph() # Ensure weights are correct for current hour
 
-        start_id = f"{self.start_point[0]},{self.start_point[1]}"
-        end_id = f"{self.end_point[0]},{self.end_point[1]}"
+        start = self.graph.index(*self.start_point)
+        end = self.graph.index(*self.end_point)
+        self.map_canvas.clear_paths()
+        self._submit_route(start, end)
+
+    def _submit_route(self, start, end):
+        """
+        Queues the search of a route on the compute service.
+        Inputs: start, end (cell indices)
+        Outputs: None (_poll_compute draws the result)
+        Restrictions: Replaces (cancels) any route search still running.
+        """
+        self.lbl_status.config(text="Calculando ruta...")
+        self.compute.submit(self._route_job, self.graph, start, end, self.graph.profile,
+                            self.graph.version, tag="route")
+
+    def _route_job(self, graph, start, end, profile, version, monitor):
+        # Runs on the compute thread: no Tk calls here.
+        # Saved destination: walk its precomputed tree. Otherwise a CH query
+        # once the background job has the index of this profile, or a corridor
+        # search meanwhile (and after edits, which drop the index). Both give
+        # the same optimal route.
+        route = self.destination_trees.route(graph, start, end, profile)
+        if route is None:
+            method = CONTRACTION if built_hierarchy(graph, profile) is not None else CORRIDOR
+            route = self.route_cache.route(graph, start, end, method=method, profile=profile, monitor=monitor)
+        return start, end, version, route
+
+    def _poll_compute(self):
+        """
+        Reads progress and results of background jobs; runs every COMPUTE_POLL_MS.
+        Inputs: None
+        Outputs: None (Updates the status line, draws current routes, applies incident batches)
+        Restrictions: Results of cancelled or superseded jobs are dropped.
+        """
+        for event in self.compute.poll():
+            if not self.compute.current(event.job):
+                continue
+            if event.job.tag == "map":
+                self._on_map_event(event)
+            elif event.job.tag == "isochrone":
+                self._on_isochrone_event(event)
+            elif event.job.function == self._plan_job:
+                self._on_plan_event(event)
+            elif event.job.function == self._trip_job:
+                self._on_trip_event(event)
+            elif event.job.function == self._revalidate_job:
+                self._on_revalidation_event(event)
+            elif event.job.function == self._index_job:
+                if event.kind == DONE:
+                    self.lbl_status.config(text="Índice de rutas listo")
+            elif event.kind == PROGRESS:
+                self.lbl_status.config(text=f"Calculando... {event.value} nodos")
+            elif event.kind == DONE:
+                self._show_route(*event.value)
+            elif event.kind == FAILED:
+                self.lbl_status.config(text="")
+                messagebox.showerror("Error", f"Error al calcular la ruta: {event.value}")
+        if self.incident_feed:
+            for batch in self.incident_feed.poll():
+                self._apply_incidents(batch)
+        self.root.after(COMPUTE_POLL_MS, self._poll_compute)
+
+    def _on_map_event(self, event):
+        if event.kind == PROGRESS:
+            first, rows = event.value
+            self.map_canvas.add_rows(first, rows)
+            self.lbl_status.config(text=f"Cargando mapa... {first + len(rows)} filas")
+        elif event.kind == DONE:
+            self._on_map_loaded(*event.value)
+        elif event.kind == FAILED:
+            self.lbl_status.config(text="")
+            messagebox.showerror("Error", f"Error al cargar el mapa: {event.value}")
+
+    def _calculate_isochrone(self, reverse=False):
+        """
+        Shows the cells reachable from the start point within each budget,
+        or (reverse) the cells that can reach the end point within it.
+        Inputs: reverse (bool)
+        Outputs: None (_poll_compute draws the overlay)
+        Restrictions: Budgets are positive integers; costs follow the selected hour.
+        """
+        if not self.graph:
+            messagebox.showerror("Error", "No hay mapa cargado")
+            return
+        point = self.end_point if reverse else self.start_point
+        if not point:
+            messagebox.showerror("Error", "Seleccione Fin" if reverse else "Seleccione Inicio")
+            return
+        try:
+            budgets = sorted({int(value) for value in self.entry_budgets.get().split(",") if value.strip()})
+        except ValueError:
+            budgets = []
+        if not budgets or budgets[0] <= 0:
+            messagebox.showerror("Error", "Costos inválidos: use enteros positivos, ej. 10,20,30")
+            return
 
-        path, cost = Pathfinder.find_path(self.graph, start_id, end_id)
+        self._refresh_graph() # Profile of the current hour
+        self._submit_isochrone(self.graph.index(*point), budgets, reverse)
 
-        self.map_canvas.delete("path")
+    def _submit_isochrone(self, cell, budgets, reverse):
+        # One bounded search answers every budget; replaces a running one
+        self.lbl_status.config(text="Calculando isócrona...")
+        self.compute.submit(Pathfinder.isochrone, self.graph, cell, budgets, self.graph.profile, reverse, tag="isochrone")
+
+    def _on_isochrone_event(self, event):
+        if event.kind == PROGRESS:
+            self.lbl_status.config(text=f"Calculando isócrona... {event.value} nodos")
+        elif event.kind == DONE:
+            self._show_isochrone(event.value)
+        elif event.kind == FAILED:
+            self.lbl_status.config(text="")
+            messagebox.showerror("Error", f"Error al calcular la isócrona: {event.value}")
+
+    def _show_isochrone(self, isochrone):
+        if self.graph is None:
+            return
+        if isochrone.version != self.graph.version:
+            self._submit_isochrone(isochrone.source, list(isochrone.budgets), isochrone.reverse) # The map changed during the search
+            return
+        self.map_canvas.show_isochrone(isochrone)
+        counts = ", ".join(f"≤{budget}: {len(isochrone.cells(budget))}" for budget in isochrone.budgets)
+        self.lbl_status.config(text=f"{'Hacia Fin' if isochrone.reverse else 'Desde Inicio'} {counts} celdas")
+
+    def _show_route(self, start, end, version, route):
+        if self.graph is None or version != self.graph.version:
+            self._submit_route(start, end) # The map changed during the search
+            return
+        self.lbl_status.config(text="")
+        self._routes_replaced()
+        path, cost = route
+        self.map_canvas.clear_paths()
         if path:
             self.map_canvas.highlight_path(path)
             messagebox.showinfo("Ruta Calculada", f"Costo estimado: {cost}\nNodos: {len(path)}\n\n(Cierre esta ventana para ver la animación)")
@@ -204,13 +546,18 @@ class MainWindow:
         if name:
             self.destinations[name] = self.end_point
             self.listbox_dest.insert("end", name)
+            if self.graph:
+                # Reverse trees for every hour profile, built in the background
+                self.destination_trees.schedule(self.graph, self.graph.index(*self.end_point))
 
     def _delete_destination(self):
         sel = self.listbox_dest.curselection()
         if not sel: return
         name = self.listbox_dest.get(sel[0])
-        del self.destinations[name]
+        point = self.destinations.pop(name)
         self.listbox_dest.delete(sel[0])
+        if self.graph and point not in self.destinations.values():
+            self.destination_trees.discard(self.graph, self.graph.index(*point))
 
     def _load_destination_to_end(self):
         sel = self.listbox_dest.curselection()
@@ -221,21 +568,141 @@ class MainWindow:
         x, y = self.end_point
         self.lbl_end.config(text=f"Fin: ({x},{y})")
         self.map_canvas.delete("marker_end")
-        self.map_canvas.create_oval(
-            x*40+10, y*40+10, x*40+30, y*40+30, 
-            fill="red", outline="white", width=2, tags="marker_end"
-        )
+        self.map_canvas.mark_cell(x, y, color('END', self.map_canvas.theme), "marker_end")
+        self._flag_if_unreachable()
         
+    def _plan_multi_stop(self):
+        """
+        Visits every saved destination from the start point in the cheapest order.
+        Inputs: None (Uses start point and saved destinations)
+        Outputs: None (_poll_compute draws the stitched route)
+        Restrictions: Start point and at least one destination must be set.
+        The searches run on the compute service, like routes.
+        """
+        if not self.graph:
+            messagebox.showerror("Error", "No hay mapa cargado")
+            return
+        if not self.start_point or not self.destinations:
+            messagebox.showerror("Error", "Seleccione Inicio y guarde al menos un destino")
+            return
+
+        self._refresh_graph()
+        names = {self.graph.index(*point): name for name, point in self.destinations.items()}
+        self.map_canvas.clear_paths()
+        self._submit_plan(self.graph.index(*self.start_point), names)
+
+    def _submit_plan(self, start, names):
+        # Shares the "route" tag: a new route or plan replaces the running one
+        self.lbl_status.config(text="Planificando viaje...")
+        self.compute.submit(self._plan_job, self.trip_planner, start, names, self.graph.profile,
+                            self.graph.version, tag="route")
+
+    def _plan_job(self, planner, start, names, profile, version, monitor):
+        # Runs on the compute thread: no Tk calls here
+        return start, names, version, planner.plan(start, list(names), profile, monitor=monitor)
+
+    def _on_plan_event(self, event):
+        if event.kind == PROGRESS:
+            self.lbl_status.config(text=f"Planificando viaje... {event.value} búsquedas")
+        elif event.kind == DONE:
+            self._show_plan(*event.value)
+        elif event.kind == FAILED:
+            self.lbl_status.config(text="")
+            messagebox.showerror("Error", f"Error al planificar el viaje: {event.value}")
+
+    def _show_plan(self, start, names, version, plan):
+        if self.graph is None or version != self.graph.version:
+            self._submit_plan(start, names) # The map changed during the search
+            return
+        self.lbl_status.config(text="")
+        self._routes_replaced()
+        self.map_canvas.clear_paths()
+        if plan.order is None:
+            messagebox.showwarning("Viaje", "Algún destino no es alcanzable desde el inicio.")
+            return
+        self.map_canvas.highlight_path(plan.path, [start] + plan.order)
+        stops = "\n".join(f"{i}. {names[cell]}" for i, cell in enumerate(plan.order, 1))
+        messagebox.showinfo("Viaje Planificado", f"Costo total: {plan.cost}\n\n{stops}")
+        self.map_canvas.animate_vehicle(plan.path)
+
     def _plan_trip(self):
-        # Simple simulation: Ask for dept time, set spinbox, calculate
+        """
+        Route leaving at a chosen hour, with edge costs that follow the clock during the trip.
+        Inputs: None (Asks for the departure hour, uses the start/end points)
+        Outputs: None (_poll_compute shows the route with its arrival time)
+        Restrictions: Runs on the compute service under the "route" tag, like _calculate_route.
+        """
         h = simpledialog.askinteger("Planificar", "Hora de salida (0-23):", minvalue=0, maxvalue=23)
-        if h is not None:
-            self.spin_hour.delete(0, "end")
-            self.spin_hour.insert(0, h)
-            self._calculate_route()
+        if h is None:
+            return
+        self.spin_hour.delete(0, "end")
+        self.spin_hour.insert(0, h)
+        if not self.graph or not self.start_point or not self.end_point:
+            self._calculate_route() # Reports what is missing
+            return
+        self._on_hour_change()
+
+        self._submit_trip(self.graph.index(*self.start_point), self.graph.index(*self.end_point), h * 60)
+
+    def _submit_trip(self, start, end, departure):
+        self.lbl_status.config(text="Calculando ruta...")
+        self.compute.submit(self._trip_job, self.graph, start, end, departure, self.graph.version, tag="route")
+
+    def _trip_job(self, graph, start, end, departure, version, monitor):
+        # Runs on the compute thread: costs come from the current weights (incidents included)
+        return start, end, departure, version, Pathfinder.find_path_at(graph, start, end, departure, monitor=monitor)
+
+    def _on_trip_event(self, event):
+        if event.kind == PROGRESS:
+            self.lbl_status.config(text=f"Calculando... {event.value} nodos")
+        elif event.kind == DONE:
+            self._show_trip(*event.value)
+        elif event.kind == FAILED:
+            self.lbl_status.config(text="")
+            messagebox.showerror("Error", f"Error al calcular la ruta: {event.value}")
+
+    def _show_trip(self, start, end, departure, version, result):
+        if self.graph is None or version != self.graph.version:
+            self._submit_trip(start, end, departure) # The map changed during the search
+            return
+        self.lbl_status.config(text="")
+        self._routes_replaced()
+        self.map_canvas.clear_paths()
+        if result.path:
+            arrival = departure + result.cost
+            self.map_canvas.highlight_path(result.path)
+            messagebox.showinfo("Viaje Planificado", f"Salida: {departure // 60:02d}:00\nLlegada: {arrival // 60 % 24:02d}:{arrival % 60:02d}\nDuración: {result.cost} min")
+            self.map_canvas.animate_vehicle(result.path)
+        else:
+            messagebox.showwarning("Ruta", "No se encontró un camino válido.")
+
+    def _modify_map_mode(self, event):
+        """
+        Right click handler: sets the clicked cell to the selected type.
+        Inputs: event (Tk mouse event)
+        Outputs: None (Graph edited in place, only affected cells redrawn)
+        Restrictions: A map must be loaded.
+        """
+        if not self.graph: return
+        x, y = self.map_canvas.cell_at(event)
+        if self.graph.index(x, y) is None: return
+
+        value = dict(EDIT_TYPES)[self.edit_value.get()]
+        self._after_map_edit(self.map_loader.edit_cells({(x, y): value}))
+
+    def _undo_map_edit(self):
+        if not self.map_loader: return
+        self._after_map_edit(self.map_loader.undo_edit())
 
-    def _modify_map_mode(self):
-        messagebox.showinfo("Modificar Mapa", "Funcionalidad Extra: Haga click derecho en el mapa para agregar un POI (Punto de Interés). (No implementado visualmente en este demo rápido)")
+    def _after_map_edit(self, affected):
+        # Caches key on the graph version; saved destinations need new trees
+        if not affected: return
+        self.destination_trees.refresh(self.graph)
+        self.map_canvas.redraw_cells(affected)
+        self.map_canvas.clear_paths()
+        self._routes_replaced()
+        self.map_canvas.clear_overlay()
+        self._flag_if_unreachable()
 
     def _toggle_theme(self):
         current = self.map_canvas.theme
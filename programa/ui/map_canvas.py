@@ -1,202 +1,346 @@
 import tkinter as tk
+from ui.palette import color, cell_style, glyph_color, band_color, rgb
+from ui.tiles import TileCache, FrameTimer, render_ppm, cells_per_tile, GLYPH_MIN_CELL
+from ui.animation import AnimationScheduler
+
+# Zoom limits (pixels per cell) and factor of one mouse wheel step
+MIN_CELL_SIZE = 2
+MAX_CELL_SIZE = 64
+ZOOM_STEP = 1.25
+# Largest size the canvas asks for; bigger maps are scrolled
+MAX_VIEW_WIDTH = 1000
+MAX_VIEW_HEIGHT = 700
+# Seconds one redraw of the viewport may take (see frame_stats)
+FRAME_BUDGET = 1 / 30
 
 class MapCanvas(tk.Canvas):
+    """
+    Map view that only draws what is visible: cells are painted into tile
+    images (cached per theme and zoom level) and arrow glyphs are canvas
+    text items on the visible cells only, omitted when zoomed out.
+    Mouse wheel zooms around the pointer, dragging with the middle button
+    (or Shift + left button) pans.
+    """
     def __init__(self, parent, graph, matrix, cell_size=40, on_click_callback=None):
-        super().__init__(parent, bg="#1E1E1E", highlightthickness=0)
+        super().__init__(parent, bg=color('BACKGROUND', "dark"), highlightthickness=0)
         self.graph = graph
         self.matrix = matrix
         self.cell_size = cell_size
         self.on_click_callback = on_click_callback
         self.theme = "dark" # dark or light
-        
-        self.width = len(matrix[0]) * cell_size if matrix else 600
-        self.height = len(matrix) * cell_size if matrix else 400
-        self.config(width=self.width, height=self.height)
 
         self.start_node = None
         self.end_node = None
-        
+        self.shown_paths = [] # (waypoints, cells) of the routes on screen, as cell indices
+
+        self.tiles = TileCache(self._build_tile)
+        self.frame_timer = FrameTimer(FRAME_BUDGET)
+        self.animator = AnimationScheduler(self)
+        self._tile_items = {} # (tile_x, tile_y) -> canvas image item of the current zoom/theme
+        self.overlay_tints = {} # (x, y) -> RGB bytes laid over the cell (isochrone on screen)
+        self._overlay_bounds = None # (first_x, first_y, last_x, last_y) of the tinted cells
+        self._overlay_key = None # (theme, cell_size, cells) shown by the overlay image
+        self._overlay_image = None
+        self._render_pending = False
+        self._resize()
+
         self.bind("<Button-1>", self._on_click)
+        self.bind("<Motion>", self._on_hover)
+        self.bind("<Configure>", lambda event: self.schedule_render())
+        self.bind("<ButtonPress-2>", self._start_pan)
+        self.bind("<B2-Motion>", self._pan)
+        self.bind("<Shift-ButtonPress-1>", self._start_pan)
+        self.bind("<Shift-B1-Motion>", self._pan)
+        self.bind("<MouseWheel>", lambda event: self.zoom(ZOOM_STEP if event.delta > 0 else 1 / ZOOM_STEP, event.x, event.y))
+        self.bind("<Button-4>", lambda event: self.zoom(ZOOM_STEP, event.x, event.y))
+        self.bind("<Button-5>", lambda event: self.zoom(1 / ZOOM_STEP, event.x, event.y))
         self.draw_map()
 
-    def set_map(self, graph, matrix):
+    def set_map(self, graph, matrix, redraw=True):
+        # redraw=False: the rows were already drawn by add_rows while loading
         self.graph = graph
         self.matrix = matrix
+        self.shown_paths = []
+        self.animator.clear()
+        self._clear_overlay_state()
+        self._resize()
+        if redraw:
+            self.draw_map()
+
+    def _resize(self):
+        matrix = self.matrix
         self.width = len(matrix[0]) * self.cell_size if matrix else 600
         self.height = len(matrix) * self.cell_size if matrix else 400
-        self.config(width=self.width, height=self.height)
-        self.draw_map()
+        self.config(width=min(self.width, MAX_VIEW_WIDTH), height=min(self.height, MAX_VIEW_HEIGHT),
+                    scrollregion=(0, 0, self.width, self.height))
+
+    def add_rows(self, first, rows):
+        """
+        Draws rows of a map that is still loading (MapLoader on_rows chunks).
+        The map is not clickable until set_map gives it a graph.
+        """
+        if first == 0:
+            self.animator.clear()
+            self.delete("all")
+            self.graph = None
+            self.matrix = []
+            self.shown_paths = []
+            self._tile_items = {}
+            self._clear_overlay_state()
+            self.tiles.clear()
+        self.matrix[first:first + len(rows)] = rows
+        self._resize()
+        # The tiles of the last rows were drawn before these rows arrived
+        self.tiles.invalidate_rows(first, first + len(rows))
+        count = cells_per_tile(self.cell_size)
+        for tile in [tile for tile in self._tile_items if tile[1] * count < first + len(rows) and (tile[1] + 1) * count > first]:
+            self.delete(self._tile_items.pop(tile))
+        self.schedule_render()
 
     def set_theme(self, mode):
         self.theme = mode
-        bg = "#1E1E1E" if mode == "dark" else "#FFFFFF"
-        self.config(bg=bg)
+        self.config(bg=color('BACKGROUND', mode))
         self.draw_map()
 
     def draw_map(self):
-        self.delete("all")
-        if not self.matrix: return
-
-        rows = len(self.matrix)
-        cols = len(self.matrix[0])
-
-        # Colors
-        if self.theme == "dark":
-            COLOR_BLOCK = "#333333"
-            COLOR_CALLE = "#FFFFFF" # Directions on Dark
-            COLOR_BG_CALLE = "#1E1E1E" # Actually transparent? No, grid.
-            # Let's keep logic simple: 
-            # 0 = Block
-            # L/R/N/S = Streets/Aves
-        else:
-            COLOR_BLOCK = "#E0E0E0"
-        
-        # Unified Palette
-        # Key: (DarkColor, LightColor)
-        PALETTE = {
-            'BLOCK': ("#333333", "#E0E0E0"),
-            'CALLE': ("#FFFFFF", "#CCCCCC"),
-            'AVENIDA': ("#FFEB3B", "#FBC02D"),
-            'CRUCE': ("#F44336", "#D32F2F"),
-            'SF': ("#4CAF50", "#388E3C"),
-            'TEXT': ("#000000", "#000000"), # Arrows always black on colored cells?
-            'TEXT_DARK_BG': ("#FFFFFF", "#000000") # Text on block?
-        }
-        
-        p_idx = 0 if self.theme == "dark" else 1
-
-        for y in range(rows):
-            for x in range(cols):
-                val = self.matrix[y][x]
-                x1 = x * self.cell_size
-                y1 = y * self.cell_size
-                x2 = x1 + self.cell_size
-                y2 = y1 + self.cell_size
-
-                color = PALETTE['BLOCK'][p_idx]
-                text = ""
-
-                if val == '0': color = PALETTE['BLOCK'][p_idx]
-                elif val == 'L': 
-                    color = PALETTE['CALLE'][p_idx] 
-                    text = "←" 
-                elif val == 'R': 
-                    color = PALETTE['CALLE'][p_idx] 
-                    text = "→" 
-                elif val == 'N': 
-                    color = PALETTE['AVENIDA'][p_idx]
-                    text = "↑" 
-                elif val == 'S': 
-                    color = PALETTE['AVENIDA'][p_idx]
-                    text = "↓" 
-                elif val == 'C': 
-                    color = PALETTE['CRUCE'][p_idx]
-                    text = "C"
-                elif val == 'SF': 
-                    color = PALETTE['SF'][p_idx]
-                    text = "🏁"
-                elif val == 'ND':
-                    color = PALETTE['CALLE'][p_idx]
-                    text = "↔"
-                
-                # Draw Cell
-                tag = f"cell_{x}_{y}"
-                # Border color
-                border = "#222" if self.theme == "dark" else "#999"
-                self.create_rectangle(x1, y1, x2, y2, fill=color, outline=border, tags=("cell", tag))
-
-                # Draw Text (Direction)
-                if text:
-                    # Determine text color contrast
-                    textcolor = "black" 
-                    if self.theme == "dark" and color == PALETTE['BLOCK'][0]: textcolor = "white"
-                    
-                    font_size = 14 if text in ["C", "SF"] else 18
-                    self.create_text(x1 + self.cell_size/2, y1 + self.cell_size/2, text=text, fill=textcolor, font=("Arial", font_size, "bold"), tags=("text", tag))
-
-        # Bind hover
-        self.bind("<Motion>", self._on_hover)
+        # Full redraw of the view (new map, theme or zoom); tiles come from the cache
+        self.delete("tile", "glyph")
+        self._tile_items = {}
+        self.render()
+
+    def redraw_cells(self, cells):
+        """
+        Redraws only the tiles holding the given (x, y) cells after a map
+        edit, instead of repainting the whole map.
+        """
+        self._invalidate(cells)
+        self.render()
+
+    def _invalidate(self, cells):
+        self.tiles.invalidate_cells(cells)
+        self._overlay_key = None
+        count = cells_per_tile(self.cell_size)
+        for tile in {(x // count, y // count) for x, y in cells}:
+            item = self._tile_items.pop(tile, None)
+            if item is not None:
+                self.delete(item)
+
+    def schedule_render(self):
+        # Coalesces the redraws asked by several events into one
+        if not self._render_pending:
+            self._render_pending = True
+            self.after_idle(self.render)
+
+    def render(self):
+        """Draws the tiles and glyphs of the visible cells only."""
+        self._render_pending = False
+        with self.frame_timer.measure():
+            self.delete("glyph")
+            if not self.matrix:
+                return
+            rows, cols = len(self.matrix), len(self.matrix[0])
+            first_x, first_y, last_x, last_y = self.visible_cells()
+            count = cells_per_tile(self.cell_size)
+            visible = {(tile_x, tile_y)
+                       for tile_y in range(first_y // count, min(last_y, rows - 1) // count + 1)
+                       for tile_x in range(first_x // count, min(last_x, cols - 1) // count + 1)}
+            for tile in [tile for tile in self._tile_items if tile not in visible]:
+                self.delete(self._tile_items.pop(tile))
+            for tile_x, tile_y in visible:
+                if (tile_x, tile_y) not in self._tile_items:
+                    image = self.tiles.get((self.theme, self.cell_size, tile_x, tile_y))
+                    self._tile_items[(tile_x, tile_y)] = self.create_image(
+                        tile_x * count * self.cell_size, tile_y * count * self.cell_size,
+                        image=image, anchor="nw", tags="tile")
+            self._render_overlay(first_x, first_y, min(last_x, cols - 1), min(last_y, rows - 1))
+            if self.cell_size >= GLYPH_MIN_CELL:
+                self._draw_glyphs(first_x, first_y, min(last_x, cols - 1), min(last_y, rows - 1))
+            # Tiles at the bottom, then the overlay: routes, markers and the vehicle stay visible
+            self.tag_lower("glyph")
+            self.tag_lower("overlay")
+            self.tag_lower("tile")
+
+    def visible_cells(self):
+        """(first_x, first_y, last_x, last_y) of the cells inside the viewport."""
+        left, top = self.canvasx(0), self.canvasy(0)
+        width = self.winfo_width() if self.winfo_width() > 1 else int(self.cget("width"))
+        height = self.winfo_height() if self.winfo_height() > 1 else int(self.cget("height"))
+        size = self.cell_size
+        return (max(0, int(left // size)), max(0, int(top // size)),
+                int((left + width) // size), int((top + height) // size))
+
+    def frame_stats(self):
+        """Redraw durations: see FrameTimer.stats (seconds, budget FRAME_BUDGET)."""
+        return self.frame_timer.stats()
+
+    def _build_tile(self, key):
+        theme, cell_size, tile_x, tile_y = key
+        count = cells_per_tile(cell_size)
+        rows, cols = len(self.matrix), len(self.matrix[0])
+        x0, y0 = tile_x * count, tile_y * count
+        data = render_ppm(self.matrix, x0, y0, min(count, cols - x0), min(count, rows - y0), cell_size, theme)
+        return tk.PhotoImage(master=self, data=data, format="PPM")
+
+    def _render_overlay(self, first_x, first_y, last_x, last_y):
+        # One image over the visible part of the tinted area, rebuilt only when that changes
+        if self.overlay_tints:
+            low_x, low_y, high_x, high_y = self._overlay_bounds
+            first_x, first_y = max(first_x, low_x), max(first_y, low_y)
+            last_x, last_y = min(last_x, high_x), min(last_y, high_y)
+        if not self.overlay_tints or first_x > last_x or first_y > last_y:
+            self.delete("overlay")
+            self._overlay_key = None
+            return
+        key = (self.theme, self.cell_size, first_x, first_y, last_x, last_y)
+        if key == self._overlay_key:
+            return
+        data = render_ppm(self.matrix, first_x, first_y, last_x - first_x + 1, last_y - first_y + 1,
+                          self.cell_size, self.theme, self.overlay_tints)
+        self.delete("overlay")
+        self._overlay_image = tk.PhotoImage(master=self, data=data, format="PPM")
+        self.create_image(first_x * self.cell_size, first_y * self.cell_size, image=self._overlay_image,
+                          anchor="nw", tags="overlay")
+        self._overlay_key = key
+
+    def _draw_glyphs(self, first_x, first_y, last_x, last_y):
+        size = self.cell_size
+        font_sizes = {}
+        for y in range(first_y, last_y + 1):
+            row = self.matrix[y]
+            for x in range(first_x, min(last_x + 1, len(row))):
+                key, text = cell_style(row[x])
+                if not text:
+                    continue
+                font_size = font_sizes.get(text)
+                if font_size is None:
+                    # Same proportions as the 14/18 pt glyphs of 40px cells
+                    font_size = font_sizes[text] = max(6, size * (14 if text == "C" else 18) // 40)
+                self.create_text(x * size + size / 2, y * size + size / 2, text=text,
+                                 fill=glyph_color(key, self.theme), font=("Arial", font_size, "bold"),
+                                 tags="glyph")
+
+    # --- Navigation ---
+
+    def zoom(self, factor, pointer_x=0, pointer_y=0):
+        """Changes the cell size by factor, keeping the cell under the pointer in place."""
+        new_size = max(MIN_CELL_SIZE, min(MAX_CELL_SIZE, round(self.cell_size * factor)))
+        if new_size == self.cell_size:
+            new_size = max(MIN_CELL_SIZE, min(MAX_CELL_SIZE, self.cell_size + (1 if factor > 1 else -1)))
+            if new_size == self.cell_size:
+                return
+        scale = new_size / self.cell_size
+        anchor_x, anchor_y = self.canvasx(pointer_x) * scale, self.canvasy(pointer_y) * scale
+        self.delete("tile", "glyph", "highlight")
+        self.scale("all", 0, 0, scale, scale) # Routes, markers, vehicle
+        self.cell_size = new_size
+        self._resize()
+        if self.width:
+            self.xview_moveto(max(0, anchor_x - pointer_x) / self.width)
+        if self.height:
+            self.yview_moveto(max(0, anchor_y - pointer_y) / self.height)
+        self.draw_map()
+
+    def _start_pan(self, event):
+        self.scan_mark(event.x, event.y)
+
+    def _pan(self, event):
+        self.scan_dragto(event.x, event.y, gain=1)
+        self.schedule_render()
+
+    def cell_at(self, event):
+        """Map (x, y) of the cell under a mouse event."""
+        return int(self.canvasx(event.x) // self.cell_size), int(self.canvasy(event.y) // self.cell_size)
 
     def _on_hover(self, event):
-        x = int(event.x // self.cell_size)
-        y = int(event.y // self.cell_size)
-        
-        # Reset previous highlight (optional, or just redraw on move? Canvas is efficient enough)
-        # Actually, simpler to just delete a specific 'highlight' tag
+        x, y = self.cell_at(event)
         self.delete("highlight")
-        
         if 0 <= y < len(self.matrix) and 0 <= x < len(self.matrix[0]):
-             x1 = x * self.cell_size
-             y1 = y * self.cell_size
-             x2 = x1 + self.cell_size
-             y2 = y1 + self.cell_size
-             self.create_rectangle(x1, y1, x2, y2, outline="#00FF00", width=3, tags="highlight")
+            x1 = x * self.cell_size
+            y1 = y * self.cell_size
+            self.create_rectangle(x1, y1, x1 + self.cell_size, y1 + self.cell_size, outline="#00FF00", width=3, tags="highlight")
+
+    def mark_cell(self, x, y, fill, tag):
+        # Start/end marker over a cell
+        size = self.cell_size
+        self.create_oval(x * size + size / 4, y * size + size / 4, x * size + 3 * size / 4, y * size + 3 * size / 4,
+                         fill=fill, outline="white", width=2, tags=tag)
 
+    def _cell_xy(self, node):
+        # Accepts Node/CellNode objects or CompactGraph cell indices
+        if isinstance(node, int):
+            return self.graph.coords(node)
+        return node.x, node.y
 
-    def highlight_path(self, path_nodes):
-        # path_nodes: List of Node objects
+    def highlight_path(self, path_nodes, waypoints=None):
+        # path_nodes: List of Node objects or cell indices
+        # waypoints: cells the route must visit (start and end by default)
         if not path_nodes: return
-        
+
+        cells = [self.graph.index(*self._cell_xy(node)) for node in path_nodes]
+        self.shown_paths.append((list(waypoints) if waypoints else [cells[0], cells[-1]], cells))
         points = []
         for node in path_nodes:
-            center_x = node.x * self.cell_size + self.cell_size/2
-            center_y = node.y * self.cell_size + self.cell_size/2
+            x, y = self._cell_xy(node)
+            center_x = x * self.cell_size + self.cell_size/2
+            center_y = y * self.cell_size + self.cell_size/2
             points.append(center_x)
             points.append(center_y)
         
         if len(points) >= 4:
-            self.create_line(points, fill="#00E5FF", width=4, capstyle=tk.ROUND, joinstyle=tk.ROUND, tags="path")
+            self.create_line(points, fill=color('PATH', self.theme), width=4, capstyle=tk.ROUND, joinstyle=tk.ROUND, tags="path")
+
+    def show_isochrone(self, isochrone):
+        """
+        Tints the cells of an Isochrone by budget band (ISOCHRONE_COLORS),
+        drawn as a single image item instead of one item per cell.
+        """
+        self.set_overlay({self.graph.coords(cell): rgb(band_color(band)) for cell, band in isochrone.bands().items()})
+
+    def set_overlay(self, tints):
+        # tints: {(x, y): RGB bytes}, an empty dict removes the overlay
+        self.overlay_tints = tints
+        self._overlay_bounds = (min(x for x, _ in tints), min(y for _, y in tints),
+                                max(x for x, _ in tints), max(y for _, y in tints)) if tints else None
+        self._overlay_key = None
+        self.render()
+
+    def clear_overlay(self):
+        self.set_overlay({})
+
+    def _clear_overlay_state(self):
+        self.delete("overlay")
+        self.overlay_tints = {}
+        self._overlay_bounds = None
+        self._overlay_key = None
+        self._overlay_image = None
+
+    def clear_paths(self):
+        self.delete("path")
+        self.shown_paths = []
 
     def animate_vehicle(self, path_nodes, callback=None):
+        # Vehicles share the scheduler's single frame loop
         if not path_nodes or len(path_nodes) < 2: return
-        
-        # Draw vehicle
-        start_node = path_nodes[0]
-        sx = start_node.x * self.cell_size + self.cell_size/2
-        sy = start_node.y * self.cell_size + self.cell_size/2
-        
-        vehicle = self.create_oval(sx-8, sy-8, sx+8, sy+8, fill="#FF00FF", outline="white", width=2, tags="vehicle")
-        
-        self._animate_step(vehicle, path_nodes, 1, callback)
+        return self.animator.add([self._cell_xy(node) for node in path_nodes], callback)
 
-    def _animate_step(self, vehicle, nodes, target_idx, callback):
-        if target_idx >= len(nodes):
-            self.delete(vehicle)
-            if callback: callback()
-            return
-            
-        target_node = nodes[target_idx]
-        tx = target_node.x * self.cell_size + self.cell_size/2
-        ty = target_node.y * self.cell_size + self.cell_size/2
-        
-        coords = self.coords(vehicle)
-        cx = (coords[0] + coords[2]) / 2
-        cy = (coords[1] + coords[3]) / 2
-        
-        dx = tx - cx
-        dy = ty - cy
-        dist = (dx**2 + dy**2)**0.5
-        
-        if dist < 5:
-            # Reached node
-            self._animate_step(vehicle, nodes, target_idx + 1, callback)
-        else:
-            # Move towards target
-            step = 5 # Speed
-            nx = dx / dist * step
-            ny = dy / dist * step
-            self.move(vehicle, nx, ny)
-            self.after(20, lambda: self._animate_step(vehicle, nodes, target_idx, callback))
+    def flag_unreachable(self, x, y):
+        # Crosses out a cell that no route can reach
+        margin = self.cell_size * 0.15
+        x1 = x * self.cell_size + margin
+        y1 = y * self.cell_size + margin
+        x2 = x1 + self.cell_size - 2 * margin
+        y2 = y1 + self.cell_size - 2 * margin
+        self.create_line(x1, y1, x2, y2, fill="#FF1744", width=3, tags="unreachable")
+        self.create_line(x1, y2, x2, y1, fill="#FF1744", width=3, tags="unreachable")
 
     def _on_click(self, event):
-        x = int(event.x // self.cell_size)
-        y = int(event.y // self.cell_size)
+        x, y = self.cell_at(event)
         
         # Validate connection
         if not self.graph: return
-        node = self.graph.get_node(x, y)
+        index = self.graph.index(x, y)
         
-        if node and node.value != '0':
+        if index is not None and not self.graph.is_block(index):
             if self.on_click_callback:
                 self.on_click_callback(x, y)
             
@@ -0,0 +1,69 @@
+# Unified Palette
+# Key: (DarkColor, LightColor)
+PALETTE = {
+    'BLOCK': ("#333333", "#E0E0E0"),
+    'CALLE': ("#FFFFFF", "#CCCCCC"),
+    'AVENIDA': ("#FFEB3B", "#FBC02D"),
+    'CRUCE': ("#F44336", "#D32F2F"),
+    'SF': ("#4CAF50", "#388E3C"),
+    'BLOQUEADA': ("#FF9800", "#F57C00"),
+    'BORDER': ("#222222", "#999999"),
+    'BACKGROUND': ("#1E1E1E", "#FFFFFF"),
+    'TEXT': ("#000000", "#000000"), # Arrows always black on colored cells
+    'TEXT_DARK_BG': ("#FFFFFF", "#000000"), # Text on block
+    'PATH': ("#00E5FF", "#00E5FF"),
+    'START': ("#0000FF", "#0000FF"),
+    'END': ("#FF0000", "#FF0000"),
+}
+
+# Cell value -> (palette key, glyph drawn on the cell)
+CELL_STYLES = {
+    '0': ('BLOCK', ""),
+    'L': ('CALLE', "←"),
+    'R': ('CALLE', "→"),
+    'N': ('AVENIDA', "↑"),
+    'S': ('AVENIDA', "↓"),
+    'C': ('CRUCE', "C"),
+    'SF': ('SF', "🏁"),
+    'ND': ('CALLE', "↔"),
+    'B': ('BLOQUEADA', "🚧"),
+}
+# Unknown values are drawn like blocks
+DEFAULT_STYLE = ('BLOCK', "")
+
+# Isochrone bands, nearest budget first
+ISOCHRONE_COLORS = ("#00C853", "#AEEA00", "#FFD600", "#FF9100", "#FF3D00")
+# Weight of a tint over the cell colour
+TINT_ALPHA = 0.6
+
+
+def theme_index(theme):
+    return 0 if theme == "dark" else 1
+
+
+def color(key, theme):
+    return PALETTE[key][theme_index(theme)]
+
+
+def cell_style(value):
+    """(palette key, glyph) of a cell value."""
+    return CELL_STYLES.get(value, DEFAULT_STYLE)
+
+
+def glyph_color(key, theme):
+    return color('TEXT_DARK_BG' if key == 'BLOCK' else 'TEXT', theme)
+
+
+def rgb(hex_color):
+    """'#RRGGBB' -> 3 bytes."""
+    return bytes.fromhex(hex_color[1:])
+
+
+def blend(base, tint, alpha=TINT_ALPHA):
+    """RGB bytes of tint laid over base with opacity alpha."""
+    return bytes(round(b * (1 - alpha) + t * alpha) for b, t in zip(base, tint))
+
+
+def band_color(band):
+    """Colour of isochrone band number band (the last colour repeats)."""
+    return ISOCHRONE_COLORS[min(band, len(ISOCHRONE_COLORS) - 1)]
@@ -0,0 +1,184 @@
+import os
+import struct
+import zlib
+from models.accel import require_numpy
+from models.compact_graph import CELL_TYPES
+from models.map_loader import encode_matrix
+from ui.palette import PALETTE, DEFAULT_STYLE, cell_style, color, theme_index, rgb
+from ui.tiles import BORDER_MIN_CELL
+
+# Offscreen rendering of maps, routes and per-cell heatmaps into NumPy RGB
+# images (height x width x 3, uint8), written as PNG or PPM without Tk.
+# Cells look exactly like the tiles of MapCanvas (same palette and borders).
+
+DEFAULT_CELL_SIZE = 8
+# Low -> high colour ramp of heatmaps
+HEAT_COLORS = ("#2C7BB6", "#ABD9E9", "#FFFFBF", "#FDAE61", "#D7191C")
+# Weight of the heatmap colour over the cell colour
+HEAT_ALPHA = 0.75
+# Heatmap values are quantized to this many colours
+HEAT_LEVELS = 256
+PNG_COMPRESSION = 6
+
+
+def _codes(np, source):
+    # (rows, cols) type codes of a CompactGraph or a matrix of cell values
+    if hasattr(source, 'cells'):
+        return np.frombuffer(source.cells, dtype=np.uint8).reshape(source.rows, source.cols)
+    rows, cols, cells, _ = encode_matrix(source)
+    return np.frombuffer(cells, dtype=np.uint8).reshape(rows, cols)
+
+
+def _cell_colors(np, theme):
+    # RGB of each type code, OTHER (last) drawn like unknown values
+    index = theme_index(theme)
+    keys = [cell_style(value)[0] for value in CELL_TYPES] + [DEFAULT_STYLE[0]]
+    return np.array([list(rgb(PALETTE[key][index])) for key in keys], dtype=np.uint8)
+
+
+def heat_colors(values, limits=None):
+    """
+    Ramp colour of each value (any shape, float), from HEAT_COLORS[0] at
+    limits[0] to HEAT_COLORS[-1] at limits[1]. limits default to the
+    finite min and max. Returns an array of shape values.shape + (3,).
+    """
+    np = require_numpy("Raster export")
+    values = np.asarray(values, dtype=float)
+    finite = values[np.isfinite(values)]
+    low, high = limits if limits is not None else ((finite.min(), finite.max()) if finite.size else (0.0, 1.0))
+    span = high - low
+    t = np.clip((np.nan_to_num(values, nan=low) - low) / span, 0.0, 1.0) if span > 0 else np.zeros(values.shape)
+    stops = np.array([list(rgb(hex_color)) for hex_color in HEAT_COLORS], dtype=float)
+    positions = np.linspace(0.0, 1.0, len(stops))
+    return np.stack([np.interp(t, positions, stops[:, channel]) for channel in range(3)], axis=-1)
+
+
+def render_map(source, cell_size=DEFAULT_CELL_SIZE, theme="dark", heat=None, limits=None, alpha=HEAT_ALPHA):
+    """
+    Image of a CompactGraph (or matrix of cell values): every cell a
+    cell_size square with the MapCanvas border line once cells are at
+    least BORDER_MIN_CELL pixels.
+    heat: optional per-cell values (rows x cols, or rows * cols by cell
+    index) blended over the cells with alpha; NaN/inf cells are left
+    uncoloured. limits: (low, high) of the colour ramp, see heat_colors.
+    """
+    np = require_numpy("Raster export")
+    codes = _codes(np, source)
+    rows, cols = codes.shape
+    palette = _cell_colors(np, theme)
+    if heat is None:
+        colors = palette[codes]
+    else:
+        levels = _heat_levels(np, heat, rows, cols, limits)
+        # Colour of every (cell type, heat level) pair; the extra last level is "no value"
+        ramp = heat_colors(np.linspace(0.0, 1.0, HEAT_LEVELS), (0.0, 1.0))
+        blend = np.empty((len(palette), HEAT_LEVELS + 1, 3), dtype=np.uint8)
+        blend[:, :HEAT_LEVELS] = np.rint(palette[:, None, :] * (1 - alpha) + ramp[None, :, :] * alpha)
+        blend[:, HEAT_LEVELS] = palette
+        colors = blend[codes, levels]
+
+    # One cell_size x cell_size block of pixels per cell, border on its right and bottom
+    image = colors if cell_size == 1 else np.repeat(np.repeat(colors, cell_size, axis=1), cell_size, axis=0)
+    if cell_size >= BORDER_MIN_CELL:
+        border = np.frombuffer(rgb(color('BORDER', theme)), dtype=np.uint8)
+        image[cell_size - 1::cell_size] = border
+        image[:, cell_size - 1::cell_size] = border
+    return image
+
+
+def _heat_levels(np, heat, rows, cols, limits):
+    # Ramp level (0..HEAT_LEVELS - 1) of each cell, HEAT_LEVELS where there is no value
+    heat = np.asarray(heat, dtype=float)
+    if heat.size != rows * cols:
+        raise ValueError(f"Heatmap has {heat.size} values for {rows}x{cols} cells")
+    heat = heat.reshape(rows, cols)
+    known = np.isfinite(heat)
+    if limits is None:
+        limits = (heat[known].min(), heat[known].max()) if known.any() else (0.0, 1.0)
+    low, high = limits
+    scaled = (np.where(known, heat, low) - low) * ((HEAT_LEVELS - 1) / (high - low) if high > low else 0.0)
+    levels = np.rint(np.clip(scaled, 0, HEAT_LEVELS - 1)).astype(np.intp)
+    levels[~known] = HEAT_LEVELS
+    return levels
+
+
+def _fill(image, top, left, bottom, right, rgb_color):
+    # Clipped rectangle [top, bottom) x [left, right)
+    height, width = image.shape[:2]
+    image[max(0, top):min(height, bottom), max(0, left):min(width, right)] = rgb_color
+
+
+def mark_cell(image, x, y, cell_size, fill):
+    """Start/end marker: the middle half of the cell, as MapCanvas.mark_cell."""
+    np = require_numpy("Raster export")
+    quarter = cell_size // 4
+    _fill(image, y * cell_size + quarter, x * cell_size + quarter,
+          (y + 1) * cell_size - quarter, (x + 1) * cell_size - quarter, np.frombuffer(rgb(fill), dtype=np.uint8))
+
+
+def draw_path(image, cells, cell_size, theme="dark", width=None, markers=True):
+    """
+    Draws a route, a list of (x, y) cells (graph.coords of each index),
+    as a line through the cell centres in the MapCanvas path colour.
+    markers: also mark the first and last cell like the GUI does.
+    """
+    np = require_numpy("Raster export")
+    cells = list(cells)
+    if not cells:
+        return image
+    width = width or max(1, cell_size // 8)
+    fill = np.frombuffer(rgb(color('PATH', theme)), dtype=np.uint8)
+    half = width // 2
+    centres = [(x * cell_size + cell_size // 2, y * cell_size + cell_size // 2) for x, y in cells]
+    for (x0, y0), (x1, y1) in zip(centres, centres[1:]):
+        if x0 == x1 or y0 == y1:
+            _fill(image, min(y0, y1) - half, min(x0, x1) - half, max(y0, y1) - half + width, max(x0, x1) - half + width, fill)
+            continue
+        # Not a grid step: square stamps along the segment
+        steps = max(abs(x1 - x0), abs(y1 - y0)) + 1
+        xs = np.rint(np.linspace(x0, x1, steps)).astype(int)
+        ys = np.rint(np.linspace(y0, y1, steps)).astype(int)
+        for x, y in zip(xs, ys):
+            _fill(image, y - half, x - half, y - half + width, x - half + width, fill)
+    if len(centres) == 1:
+        x, y = centres[0]
+        _fill(image, y - half, x - half, y - half + width, x - half + width, fill)
+    if markers:
+        mark_cell(image, *cells[0], cell_size, color('START', theme))
+        mark_cell(image, *cells[-1], cell_size, color('END', theme))
+    return image
+
+
+def encode_ppm(image):
+    """Binary PPM (P6) bytes of an RGB image."""
+    height, width = image.shape[:2]
+    return b'P6 %d %d 255\n' % (width, height) + image.tobytes()
+
+
+def _png_chunk(tag, data):
+    return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data))
+
+
+def encode_png(image, level=PNG_COMPRESSION):
+    """PNG bytes of an RGB image (8-bit truecolour, no row filters)."""
+    np = require_numpy("Raster export")
+    height, width = image.shape[:2]
+    raw = np.zeros((height, 1 + 3 * width), dtype=np.uint8) # Filter byte 0 on every row
+    raw[:, 1:] = image.reshape(height, 3 * width)
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + _png_chunk(b'IHDR', header)
+            + _png_chunk(b'IDAT', zlib.compress(raw.tobytes(), level)) + _png_chunk(b'IEND', b''))
+
+
+def save_image(path, image):
+    """Writes image as PNG or PPM, chosen by the extension of path."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.png':
+        data = encode_png(image)
+    elif extension in ('.ppm', '.pnm'):
+        data = encode_ppm(image)
+    else:
+        raise ValueError(f"Unsupported image format: {extension or path}")
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
@@ -0,0 +1,146 @@
+import time
+from collections import OrderedDict, deque
+from ui.palette import PALETTE, CELL_STYLES, DEFAULT_STYLE, theme_index, rgb, blend
+
+# Side of a tile image in pixels (rounded down to whole cells)
+TILE_PIXELS = 256
+# Arrow glyphs are only drawn on cells at least this many pixels wide
+GLYPH_MIN_CELL = 16
+# Cells smaller than this get no border line
+BORDER_MIN_CELL = 4
+# Tile images kept in memory
+TILE_CACHE_SIZE = 256
+# Frames kept by FrameTimer
+FRAME_HISTORY = 120
+
+
+def cells_per_tile(cell_size):
+    return max(1, TILE_PIXELS // cell_size)
+
+
+def tile_span(tile, cell_size):
+    """Cells (first, last + 1) covered by a tile index along one axis."""
+    count = cells_per_tile(cell_size)
+    return tile * count, (tile + 1) * count
+
+
+def render_ppm(matrix, x0, y0, cols, rows, cell_size, theme, tints=None):
+    """
+    Binary PPM (P6) image of the block of cells [x0, x0 + cols) x [y0, y0 + rows)
+    with each cell a cell_size square and a one pixel border on its right
+    and bottom edges. Rows shorter than the block are padded with blocks.
+    tints: {(x, y): RGB bytes} laid over those cells with TINT_ALPHA.
+    """
+    index = theme_index(theme)
+    fills = {value: rgb(PALETTE[key][index]) for value, (key, _) in CELL_STYLES.items()}
+    default = rgb(PALETTE[DEFAULT_STYLE[0]][index])
+    border = rgb(PALETTE['BORDER'][index])
+    inner = cell_size - 1 if cell_size >= BORDER_MIN_CELL else cell_size
+    runs = {}  # fill -> pixel row segment of one cell
+    blends = {}  # (fill, tint) -> tinted fill
+    lines = []
+    for y in range(y0, y0 + rows):
+        row = matrix[y] if y < len(matrix) else ()
+        segments = []
+        for x in range(x0, x0 + cols):
+            fill = fills.get(row[x], default) if x < len(row) else default
+            if tints:
+                tint = tints.get((x, y))
+                if tint is not None:
+                    tinted = blends.get((fill, tint))
+                    if tinted is None:
+                        tinted = blends[(fill, tint)] = blend(fill, tint)
+                    fill = tinted
+            segment = runs.get(fill)
+            if segment is None:
+                segment = runs[fill] = fill * inner + border * (cell_size - inner)
+            segments.append(segment)
+        line = b''.join(segments)
+        lines.append(line * inner + border * (cols * cell_size) * (cell_size - inner))
+    header = b'P6 %d %d 255\n' % (cols * cell_size, rows * cell_size)
+    return header + b''.join(lines)
+
+
+class TileCache:
+    """
+    LRU store of rendered tiles keyed by (theme, cell_size, tile_x, tile_y).
+    build(key) creates the tile image on a miss. Edited cells drop only the
+    tiles that contain them, at every zoom level.
+    """
+    def __init__(self, build, capacity=TILE_CACHE_SIZE):
+        self.build = build
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._tiles = OrderedDict()
+
+    def get(self, key):
+        tile = self._tiles.get(key)
+        if tile is not None:
+            self._tiles.move_to_end(key)
+            self.hits += 1
+            return tile
+        self.misses += 1
+        tile = self._tiles[key] = self.build(key)
+        while len(self._tiles) > self.capacity:
+            self._tiles.popitem(last=False)
+        return tile
+
+    def invalidate_cells(self, cells):
+        """Drops the tiles that contain any of the (x, y) cells."""
+        for key in list(self._tiles):
+            _, cell_size, tile_x, tile_y = key
+            first_x, last_x = tile_span(tile_x, cell_size)
+            first_y, last_y = tile_span(tile_y, cell_size)
+            if any(first_x <= x < last_x and first_y <= y < last_y for x, y in cells):
+                del self._tiles[key]
+
+    def invalidate_rows(self, first, last):
+        """Drops the tiles that overlap rows first..last - 1."""
+        for key in list(self._tiles):
+            first_y, last_y = tile_span(key[3], key[1])
+            if first_y < last and last_y > first:
+                del self._tiles[key]
+
+    def clear(self):
+        self._tiles.clear()
+
+    def __len__(self):
+        return len(self._tiles)
+
+
+class FrameTimer:
+    """Durations of the last FRAME_HISTORY redraws, checked against a budget in seconds."""
+    def __init__(self, budget, history=FRAME_HISTORY):
+        self.budget = budget
+        self.frames = deque(maxlen=history)
+
+    def measure(self):
+        return _Frame(self)
+
+    def stats(self):
+        frames = sorted(self.frames)
+        if not frames:
+            return {'frames': 0, 'last': 0.0, 'mean': 0.0, 'p95': 0.0, 'max': 0.0, 'over_budget': 0}
+        return {
+            'frames': len(frames),
+            'last': self.frames[-1],
+            'mean': sum(frames) / len(frames),
+            'p95': frames[min(len(frames) - 1, int(len(frames) * 0.95))],
+            'max': frames[-1],
+            'over_budget': sum(1 for frame in frames if frame > self.budget),
+        }
+
+
+class _Frame:
+    # with timer.measure(): ... records the duration of the block
+    def __init__(self, timer):
+        self.timer = timer
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.frames.append(time.perf_counter() - self.started)
+        return False
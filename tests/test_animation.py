@@ -0,0 +1,109 @@
+import sys
+import os
+import random
+import pytest
+
+# Add program to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'programa'))
+
+from ui.animation import Track, TrackSet, AnimationScheduler, VECTOR_MIN_VEHICLES
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeCanvas:
+    """Records what the scheduler asks of a Tk canvas."""
+    cell_size = 10
+
+    def __init__(self):
+        self.items = {}
+        self.timers = []
+        self.coords_calls = 0
+        self._next = 0
+
+    def create_oval(self, *coords, **options):
+        self._next += 1
+        self.items[self._next] = coords
+        return self._next
+
+    def coords(self, item, *coords):
+        self.coords_calls += 1
+        self.items[item] = coords
+
+    def delete(self, item):
+        self.items.pop(item, None)
+
+    def after(self, delay, callback):
+        self.timers.append((delay, callback))
+
+    def run_timer(self):
+        _, callback = self.timers.pop(0)
+        callback()
+
+
+def centre(canvas, item):
+    x1, y1, x2, y2 = canvas.items[item]
+    return (x1 + x2) / 2 / canvas.cell_size, (y1 + y2) / 2 / canvas.cell_size
+
+
+def test_track_positions():
+    track = Track([(0, 0), (1, 0), (1, 1), (1, 1), (3, 1)])
+    assert track.length == 4
+    assert track.position(-1) == (0.5, 0.5)
+    assert track.position(0.5) == (1.0, 0.5)
+    assert track.position(2.5) == (2.0, 1.5) # Across the repeated point
+    assert track.position(10) == (3.5, 1.5)
+
+
+def test_vectorized_positions_match():
+    np = pytest.importorskip("numpy")
+    rng = random.Random(2)
+    tracks = []
+    for _ in range(VECTOR_MIN_VEHICLES + 5):
+        cells = [(rng.randrange(20), rng.randrange(20))]
+        for _ in range(rng.randint(0, 15)):
+            x, y = cells[-1]
+            cells.append(rng.choice([(x + 1, y), (x, y + 1), (x - 1, y), (x, y - 1)]))
+        tracks.append(Track(cells))
+    distances = [rng.uniform(-1, track.length + 1) for track in tracks]
+    packed = TrackSet(tracks, np)
+    assert packed.np is not None
+    xs, ys = packed.positions(distances)
+    for track, distance, x, y in zip(tracks, distances, xs, ys):
+        assert track.position(distance) == pytest.approx((x, y))
+
+
+def test_one_timer_drives_every_vehicle():
+    canvas, clock = FakeCanvas(), FakeClock()
+    scheduler = AnimationScheduler(canvas, interval=0.02, clock=clock)
+    done = []
+    short = scheduler.add([(0, 0), (1, 0)], callback=lambda: done.append('short'), speed=10)
+    long = scheduler.add([(0, 0), (0, 5)], callback=lambda: done.append('long'), speed=10)
+    assert len(canvas.timers) == 1
+
+    clock.now = 0.05
+    canvas.run_timer()
+    assert canvas.coords_calls == 2 and len(canvas.timers) == 1
+    assert scheduler.dropped == 1 # The 0.04 slot was missed
+    assert centre(canvas, short) == pytest.approx((1.0, 0.5))
+    assert centre(canvas, long) == pytest.approx((0.5, 1.0))
+
+    clock.now = 0.11 # Reached its end: removed, callback called
+    canvas.run_timer()
+    assert done == ['short'] and short not in canvas.items
+    assert scheduler.dropped == 3 # and the 0.08 and 0.10 slots were skipped
+
+    clock.now = 1.0
+    canvas.run_timer()
+    assert done == ['short', 'long']
+    assert canvas.timers == [] and not canvas.items # The loop stops when idle
+    assert scheduler.vehicles == []
+
+    scheduler.add([(0, 0), (1, 0)])
+    assert len(canvas.timers) == 1 # and restarts with a new vehicle
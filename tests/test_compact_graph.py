@@ -0,0 +1,132 @@
+import sys
+import os
+import random
+
+import pytest
+
+# Add program to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'programa'))
+
+from models.map_loader import MapLoader, cost_table, profile_for_hour
+from models.pathfinder import Pathfinder
+
+MAP_PATH = os.path.join(os.path.dirname(__file__), '..', 'programa', 'data', 'mapa.csv')
+CELL_VALUES = ['0', '0', 'L', 'R', 'N', 'S', 'C', 'C', 'SF', 'ND']
+
+
+def random_matrix(cols, rows, seed):
+    rng = random.Random(seed)
+    return [[rng.choice(CELL_VALUES) for _ in range(cols)] for _ in range(rows)]
+
+
+def edge_sets(node_graph, compact):
+    for node in node_graph.get_all_nodes():
+        legacy = sorted((target.id, weight) for target, weight in node.edges)
+        index = compact.index(node.x, node.y)
+        current = sorted((compact.node_id(target), weight) for target, weight in compact.edges(index))
+        yield node.id, legacy, current
+
+
+def test_compact_edges_match_node_graph():
+    for is_peak in (False, True):
+        loader = MapLoader(MAP_PATH)
+        node_graph = loader.load_node_graph(is_peak_hour=is_peak)
+        compact = loader.load_graph(is_peak_hour=is_peak)
+
+        assert compact.node_count == sum(1 for n in node_graph.get_all_nodes() if n.value != '0')
+        for node_id, legacy, current in edge_sets(node_graph, compact):
+            assert legacy == current, node_id
+
+
+def test_compact_edges_match_on_random_maps():
+    for seed in range(5):
+        matrix = random_matrix(12, 9, seed)
+        compact = MapLoader.build_compact_graph(matrix)
+
+        node_graph = MapLoader.load_node_graph_from(matrix)
+        for node_id, legacy, current in edge_sets(node_graph, compact):
+            assert legacy == current, node_id
+
+
+def test_compact_costs_match_node_graph():
+    loader = MapLoader(MAP_PATH)
+    node_graph = loader.load_node_graph()
+    compact = loader.load_graph()
+
+    ids = [n.id for n in node_graph.get_all_nodes() if n.value != '0']
+    for start_id in ids[::9]:
+        for end_id in ids[::4]:
+            legacy_path, legacy_cost = Pathfinder.find_path(node_graph, start_id, end_id)
+            path, cost = Pathfinder.find_path(compact, start_id, end_id)
+            assert (legacy_path is None) == (path is None)
+            if path:
+                assert cost == legacy_cost
+                assert path[0].id == start_id and path[-1].id == end_id
+
+
+def test_string_id_adapter():
+    compact = MapLoader(MAP_PATH).load_graph()
+
+    node = compact.get_node(1, 4)
+    assert node.value == 'R'
+    assert [target.id for target, _ in node.edges] == ['2,4']
+    assert compact.nodes['8,1'].value == 'C'
+    assert '0,0' not in compact.nodes # Blocks have no node
+    assert compact.get_node(-1, 0) is None
+
+    path, _ = Pathfinder.find_path(compact, "1,1", "8,1")
+    assert path is None
+    path, cost = Pathfinder.find_path(compact, "8,1", "1,1")
+    assert [n.id for n in path] == ["8,1", "7,1", "6,1", "5,1", "4,1", "3,1", "2,1", "1,1"]
+    assert cost == 14
+
+
+def test_profiles_share_topology():
+    loader = MapLoader(MAP_PATH)
+    graph = loader.load_graph(is_peak_hour=False)
+    normal_targets = graph.targets
+
+    assert set(graph.profiles) == {'normal', 'peak'}
+    _, normal_cost = Pathfinder.find_path(graph, "8,1", "1,1")
+
+    # Second call swaps the weight vector instead of re-reading the CSV
+    assert loader.load_graph(is_peak_hour=True) is graph
+    assert graph.targets is normal_targets
+    assert graph.profile == 'peak'
+    _, peak_cost = Pathfinder.find_path(graph, "8,1", "1,1")
+
+    reference = MapLoader(MAP_PATH).load_node_graph(is_peak_hour=True)
+    _, reference_cost = Pathfinder.find_path(reference, "8,1", "1,1")
+    assert peak_cost == reference_cost
+    assert normal_cost == 14
+
+
+def test_custom_profile():
+    graph = MapLoader(MAP_PATH).load_graph()
+    graph.add_profile('night', cost_table({'L': 1, 'R': 1, 'N': 1, 'S': 1, 'C': 1}))
+    graph.set_profile('night')
+    _, cost = Pathfinder.find_path(graph, "8,1", "1,1")
+    assert cost == 7
+
+
+def test_profile_for_hour():
+    assert [h for h in range(24) if profile_for_hour(h) == 'peak'] == [6, 7, 8, 9, 12, 13, 17, 18, 19, 20]
+
+
+def test_vectorized_build_matches_loops():
+    pytest.importorskip("numpy")
+    loader = MapLoader(MAP_PATH)
+    loader.read_matrix()
+    matrices = [loader.raw_matrix] + [random_matrix(31, 17, seed) for seed in range(20)]
+    matrices.append([['C', 'ND', 'x'], ['SF', ' N', 'S']])
+
+    for matrix in matrices:
+        looped = MapLoader.build_compact_graph(matrix, vectorized=False)
+        vectorized = MapLoader.build_compact_graph(matrix, vectorized=True)
+        assert vectorized.offsets == looped.offsets
+        assert vectorized.targets == looped.targets
+        assert vectorized.profiles == looped.profiles
+
+        node_graph = MapLoader.load_node_graph_from(matrix)
+        for node_id, legacy, current in edge_sets(node_graph, vectorized):
+            assert legacy == current, node_id
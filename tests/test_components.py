@@ -0,0 +1,102 @@
+import sys
+import os
+import random
+
+# Add program to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'programa'))
+
+from models.map_loader import MapLoader, MapEditor
+from models import components
+from models.components import ComponentIndex, component_index, built_components
+from models.pathfinder import Pathfinder, DIJKSTRA
+
+MAP_PATH = os.path.join(os.path.dirname(__file__), '..', 'programa', 'data', 'mapa.csv')
+CELL_VALUES = ['0', 'L', 'R', 'N', 'S', 'C', 'C', 'SF', 'ND']
+
+
+def reachable_set(graph, start):
+    seen = {start}
+    stack = [start]
+    while stack:
+        for target, _ in graph.edges(stack.pop()):
+            if target not in seen:
+                seen.add(target)
+                stack.append(target)
+    return seen
+
+
+def check_against_search(graph, index):
+    nodes = list(graph.node_indices())
+    for start in nodes:
+        reached = reachable_set(graph, start)
+        for end in nodes:
+            assert index.reachable(start, end) == (end in reached), (start, end)
+
+
+def test_reachability_on_map():
+    graph = MapLoader(MAP_PATH).load_graph()
+    check_against_search(graph, component_index(graph))
+
+
+def test_reachability_on_random_maps():
+    for seed in range(6):
+        rng = random.Random(seed)
+        matrix = [[rng.choice(CELL_VALUES) for _ in range(12)] for _ in range(9)]
+        check_against_search(MapLoader.build_compact_graph(matrix), ComponentIndex(MapLoader.build_compact_graph(matrix)))
+
+
+def test_against_traffic_is_rejected_without_search():
+    graph = MapLoader(MAP_PATH).load_graph()
+    start, end = graph.index(1, 1), graph.index(8, 1)
+    assert not component_index(graph).reachable(start, end)
+    assert Pathfinder.search(graph, start, end, DIJKSTRA) == (None, float('inf'), 0)
+
+
+def test_deep_map_needs_no_recursion():
+    # One long one-way street: every cell is its own component
+    length = 20000
+    graph = MapLoader.build_compact_graph([['R'] * length])
+    index = ComponentIndex(graph)
+    assert index.count == length
+    assert index.reachable(0, length - 1) and not index.reachable(length - 1, 0)
+
+
+def test_interval_labels_are_exact(monkeypatch):
+    monkeypatch.setattr(components, 'MAX_REACHABILITY_COMPONENTS', 0)
+    graph = MapLoader(MAP_PATH).load_graph()
+    index = ComponentIndex(graph)
+    assert index.reach is None and len(index.labels) == components.LABEL_TRAVERSALS
+    check_against_search(graph, index)
+    for seed in range(6):
+        rng = random.Random(seed)
+        matrix = [[rng.choice(CELL_VALUES) for _ in range(12)] for _ in range(9)]
+        graph = MapLoader.build_compact_graph(matrix)
+        check_against_search(graph, ComponentIndex(graph))
+
+
+def test_fragmented_map_above_the_bitset_limit():
+    # Separate one-way streets: every cell is a component of its own
+    width, streets = 200, 90
+    matrix = []
+    for _ in range(streets):
+        matrix += [['R'] * width, ['0'] * width]
+    graph = MapLoader.build_compact_graph(matrix)
+    index = ComponentIndex(graph)
+    assert index.count == width * streets > components.MAX_REACHABILITY_COMPONENTS
+    assert index.reach is None
+    rng = random.Random(1)
+    for _ in range(2000):
+        (x0, s0), (x1, s1) = [(rng.randrange(width), rng.randrange(streets)) for _ in range(2)]
+        start, end = graph.index(x0, 2 * s0), graph.index(x1, 2 * s1)
+        assert index.reachable(start, end) == (s0 == s1 and x0 <= x1)
+
+
+def test_built_lazily_and_kept_by_weight_updates():
+    graph = MapLoader(MAP_PATH, use_cache=False).load_graph()
+    assert built_components(graph) is None # Loading does not label components
+    index = component_index(graph)
+    cell = next(iter(graph.node_indices()))
+    graph.set_entry_costs({cell: 3.0})
+    assert built_components(graph) is index
+    MapEditor(graph).apply({cell: '0'})
+    assert built_components(graph) is None
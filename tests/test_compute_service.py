@@ -0,0 +1,151 @@
+import sys
+import os
+import threading
+import time
+import pytest
+
+# Add program to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'programa'))
+
+from models.map_loader import MapLoader
+from models.pathfinder import Pathfinder, DIJKSTRA, ASTAR, BIDIRECTIONAL, CORRIDOR
+from models.shortest_path_tree import PROGRESS_INTERVAL
+from models.compute_service import ComputeService, SearchCancelled, PROGRESS, DONE, FAILED, CANCELLED
+
+MAP_PATH = os.path.join(os.path.dirname(__file__), '..', 'programa', 'data', 'mapa.csv')
+
+
+def open_grid(size):
+    # Two-way streets everywhere: searches settle most of the map
+    return MapLoader.build_compact_graph([['ND'] * size for _ in range(size)])
+
+
+def events_until(service, job, kinds, timeout=5.0):
+    collected = []
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        collected += service.poll()
+        if any(event.job is job and event.kind in kinds for event in collected):
+            return collected
+        time.sleep(0.01)
+    raise AssertionError(f"{job} did not finish")
+
+
+@pytest.mark.parametrize("method", [DIJKSTRA, ASTAR, BIDIRECTIONAL])
+def test_search_reports_progress_and_can_be_abandoned(method):
+    graph = open_grid(60)
+    start, end = 0, graph.size - 1
+    reports = []
+    result = Pathfinder.search(graph, start, end, method, monitor=reports.append)
+    assert result.cost == Pathfinder.search(graph, start, end, method).cost
+    assert reports == [PROGRESS_INTERVAL * (k + 1) for k in range(result.expanded // PROGRESS_INTERVAL)]
+
+    def abandon(expanded):
+        raise SearchCancelled()
+    if reports:
+        with pytest.raises(SearchCancelled):
+            Pathfinder.search(graph, start, end, method, monitor=abandon)
+
+
+def test_job_result_and_progress_reach_the_poller():
+    graph = open_grid(60)
+    service = ComputeService()
+    try:
+        job = service.submit(Pathfinder.find_path_indices, graph, 0, graph.size - 1, tag="route")
+        events = events_until(service, job, (DONE,))
+        assert [event.kind for event in events].count(PROGRESS) >= 1
+        path, cost = events[-1].value
+        assert (path, cost) == Pathfinder.find_path_indices(graph, 0, graph.size - 1)
+        assert service.current(job)
+        assert not service.busy("route") # Result handed out by poll()
+    finally:
+        service.shutdown()
+
+
+def test_busy_until_the_result_is_polled():
+    service = ComputeService()
+    release = threading.Event()
+    try:
+        job = service.submit(lambda monitor: release.wait(5), tag="route")
+        assert service.busy("route") and not service.busy("isochrone")
+        release.set()
+        deadline = time.monotonic() + 5
+        while job.finished is False and time.monotonic() < deadline:
+            assert service.busy("route") # Done on the worker, not read yet
+            service.poll()
+            time.sleep(0.01)
+        assert job.finished and not service.busy("route")
+        service.submit(lambda monitor: None, tag="route")
+        service.cancel("route")
+        assert not service.busy("route")
+    finally:
+        service.shutdown()
+
+
+def test_new_job_cancels_the_stale_one():
+    service = ComputeService()
+    started = threading.Event()
+
+    def endless(monitor):
+        started.set()
+        count = 0
+        while True:
+            count += 1
+            monitor(count)
+
+    try:
+        stale = service.submit(endless, tag="route")
+        assert started.wait(5)
+        graph = MapLoader(MAP_PATH).load_graph()
+        fresh = service.submit(Pathfinder.find_path_indices, graph, graph.index(5, 1), graph.index(6, 14), tag="route")
+        assert not service.current(stale)
+        events = events_until(service, fresh, (DONE,))
+        assert any(event.job is stale and event.kind == CANCELLED for event in events)
+        assert service.current(fresh)
+        service.cancel("route")
+        assert not service.current(fresh) # A finished result can still go stale before drawing
+    finally:
+        service.shutdown()
+
+
+def test_errors_are_reported():
+    service = ComputeService()
+    try:
+        job = service.submit(lambda monitor: 1 / 0)
+        events = events_until(service, job, (FAILED,))
+        assert isinstance(events[-1].value, ZeroDivisionError)
+    finally:
+        service.shutdown()
+
+
+def test_corridor_search_accepts_a_monitor():
+    graph = MapLoader(MAP_PATH).load_graph()
+    start, end = graph.index(5, 1), graph.index(6, 14)
+    assert Pathfinder.search(graph, start, end, CORRIDOR, monitor=print).cost == Pathfinder.search(graph, start, end).cost
+
+
+def test_background_job_lets_waiting_jobs_run_first():
+    service = ComputeService()
+    order = []
+    started = threading.Event()
+
+    def index(monitor):
+        started.set()
+        for step in range(200):
+            time.sleep(0.005)
+            monitor(step)
+        order.append('index')
+
+    def route(monitor):
+        order.append('route')
+        return 'route'
+
+    background = service.submit(index, tag="index", background=True)
+    assert started.wait(5.0)
+    job = service.submit(route, tag="route")
+    events_until(service, job, (DONE,))
+    assert order == ['route'] # Ran inside the index job's monitor
+    service.cancel("index")
+    events_until(service, background, (CANCELLED,))
+    assert order == ['route']
+    service.shutdown()
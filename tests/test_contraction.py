@@ -0,0 +1,107 @@
+import sys
+import os
+import random
+import shutil
+
+# Add program to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'programa'))
+
+from models.map_loader import MapLoader
+from models.contraction import ContractionHierarchy, hierarchy_path, hierarchy_for, built_hierarchy
+from models.compute_service import SearchCancelled
+from models.pathfinder import Pathfinder, CONTRACTION
+
+MAP_PATH = os.path.join(os.path.dirname(__file__), '..', 'programa', 'data', 'mapa.csv')
+
+
+def check_against_dijkstra(graph, hierarchy, pairs):
+    for start, end in pairs:
+        reference_path, reference_cost = Pathfinder.find_path_indices(graph, start, end)
+        path, cost, _ = hierarchy.query(start, end)
+        assert cost == reference_cost, (graph.node_id(start), graph.node_id(end))
+        if reference_path is None:
+            assert path is None
+            continue
+        assert path[0] == start and path[-1] == end
+        assert sum(dict(graph.edges(a))[b] for a, b in zip(path, path[1:])) == cost
+
+
+def test_hierarchy_matches_dijkstra_on_map():
+    for profile in ('normal', 'peak'):
+        graph = MapLoader(MAP_PATH).load_graph(profile=profile)
+        hierarchy = ContractionHierarchy.build(graph)
+        nodes = list(graph.node_indices())
+        check_against_dijkstra(graph, hierarchy, [(a, b) for a in nodes[::4] for b in nodes[::3]])
+
+
+def test_hierarchy_matches_dijkstra_on_random_maps():
+    values = ['0', 'L', 'R', 'N', 'S', 'C', 'C', 'ND', 'SF']
+    for seed in range(6):
+        rng = random.Random(seed)
+        matrix = [[rng.choice(values) for _ in range(13)] for _ in range(11)]
+        graph = MapLoader.build_compact_graph(matrix, is_peak_hour=seed % 2 == 0)
+        hierarchy = ContractionHierarchy.build(graph)
+        nodes = list(graph.node_indices())
+        check_against_dijkstra(graph, hierarchy, [(rng.choice(nodes), rng.choice(nodes)) for _ in range(80)])
+
+
+def test_hierarchy_saved_next_to_map(tmp_path):
+    csv_path = str(tmp_path / 'mapa.csv')
+    shutil.copy(MAP_PATH, csv_path)
+
+    loader = MapLoader(csv_path)
+    built = loader.load_hierarchy('peak')
+    assert os.path.exists(hierarchy_path(csv_path, 'peak'))
+
+    # A new session maps the saved index instead of contracting again
+    loaded = ContractionHierarchy.load(hierarchy_path(csv_path, 'peak'))
+    assert isinstance(loaded.up_targets, memoryview)
+    assert loaded.content_hash == built.content_hash
+    other = MapLoader(csv_path)
+    graph = other.load_graph(profile='peak')
+    assert isinstance(other.load_hierarchy('peak').rank, memoryview)
+    nodes = list(graph.node_indices())
+    check_against_dijkstra(graph, loaded, [(a, b) for a in nodes[::9] for b in nodes[::5]])
+
+
+def test_pathfinder_saves_the_index_of_cached_maps(tmp_path):
+    csv_path = str(tmp_path / 'mapa.csv')
+    shutil.copy(MAP_PATH, csv_path)
+    graph = MapLoader(csv_path, use_cache=True).load_graph()
+    start, end = graph.index(5, 1), graph.index(8, 10)
+    expected = Pathfinder.find_path_indices(graph, start, end)
+    assert Pathfinder.find_path_indices(graph, start, end, CONTRACTION) == expected
+    assert os.path.exists(hierarchy_path(csv_path, 'normal'))
+
+    # The next session maps it from disk
+    graph = MapLoader(csv_path, use_cache=True).load_graph()
+    assert Pathfinder.find_path_indices(graph, start, end, CONTRACTION) == expected
+    assert isinstance(hierarchy_for(graph).rank, memoryview)
+
+    # Without use_cache nothing is written next to the map
+    other = str(tmp_path / 'otro.csv')
+    shutil.copy(MAP_PATH, other)
+    graph = MapLoader(other).load_graph()
+    Pathfinder.find_path_indices(graph, start, end, CONTRACTION)
+    assert not os.path.exists(hierarchy_path(other, 'normal'))
+
+
+def test_build_can_be_cancelled_and_is_only_kept_once_done():
+    graph = MapLoader.build_compact_graph([['ND'] * 40 for _ in range(40)])
+
+    def cancel(progress):
+        raise SearchCancelled()
+
+    try:
+        hierarchy_for(graph, monitor=cancel)
+        assert False, "build was not cancelled"
+    except SearchCancelled:
+        pass
+    assert built_hierarchy(graph) is None
+    hierarchy = hierarchy_for(graph, monitor=lambda progress: None)
+    assert built_hierarchy(graph) is hierarchy
+    # An edit drops it; an index built from the old version is not kept
+    version = graph.version
+    graph.invalidate()
+    assert graph.keep(('ch', graph.profile), hierarchy, version) is hierarchy
+    assert built_hierarchy(graph) is None
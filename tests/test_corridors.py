@@ -0,0 +1,82 @@
+import sys
+import os
+import random
+
+# Add program to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'programa'))
+
+from models.map_loader import MapLoader
+from models.corridors import CorridorGraph
+from models.pathfinder import Pathfinder
+
+MAP_PATH = os.path.join(os.path.dirname(__file__), '..', 'programa', 'data', 'mapa.csv')
+
+
+def check_against_dijkstra(graph, pairs):
+    corridors = CorridorGraph(graph)
+    for start, end in pairs:
+        reference_path, reference_cost = Pathfinder.find_path_indices(graph, start, end)
+        path, cost, _ = corridors.find_path(start, end)
+        assert cost == reference_cost, (graph.node_id(start), graph.node_id(end))
+        if reference_path is None:
+            assert path is None
+            continue
+        assert path[0] == start and path[-1] == end
+        total = 0
+        for current, following in zip(path, path[1:]):
+            total += dict(graph.edges(current))[following]
+        assert total == cost
+
+
+def test_corridors_contract_map():
+    graph = MapLoader(MAP_PATH).load_graph()
+    corridors = CorridorGraph(graph)
+    assert corridors.node_count < graph.node_count
+    assert corridors.edge_count < graph.edge_count
+
+
+def test_corridor_routes_match_dijkstra():
+    for is_peak in (False, True):
+        graph = MapLoader(MAP_PATH).load_graph(is_peak_hour=is_peak)
+        nodes = list(graph.node_indices())
+        # Includes starts and ends in the middle of corridors
+        check_against_dijkstra(graph, [(start, end) for start in nodes[::3] for end in nodes[::7]])
+
+
+def test_same_corridor_both_directions():
+    graph = MapLoader(MAP_PATH).load_graph()
+    corridors = CorridorGraph(graph)
+    # (7,1) -> (3,1) follows the L street, (3,1) -> (7,1) must go around
+    path, cost, _ = corridors.find_path(graph.index(7, 1), graph.index(3, 1))
+    assert [graph.node_id(i) for i in path] == ["7,1", "6,1", "5,1", "4,1", "3,1"]
+    assert cost == 8
+    check_against_dijkstra(graph, [(graph.index(3, 1), graph.index(7, 1)), (graph.index(4, 1), graph.index(6, 1))])
+
+
+def test_pure_cycle_and_random_maps():
+    ring = [['R', 'R', 'S'],
+            ['N', '0', 'S'],
+            ['N', 'L', 'L']]
+    graph = MapLoader.build_compact_graph(ring)
+    nodes = list(graph.node_indices())
+    check_against_dijkstra(graph, [(a, b) for a in nodes for b in nodes])
+
+    values = ['0', 'L', 'R', 'N', 'S', 'L', 'R', 'N', 'S', 'C', 'ND', 'SF']
+    for seed in range(10):
+        rng = random.Random(seed)
+        matrix = [[rng.choice(values) for _ in range(14)] for _ in range(10)]
+        graph = MapLoader.build_compact_graph(matrix, is_peak_hour=seed % 2 == 0)
+        nodes = list(graph.node_indices())
+        check_against_dijkstra(graph, [(rng.choice(nodes), rng.choice(nodes)) for _ in range(60)])
+
+
+def test_searches_read_the_snapshot_taken_at_build():
+    loader = MapLoader(MAP_PATH)
+    graph = loader.load_graph()
+    corridors = CorridorGraph(graph)
+    start, end = graph.index(5, 1), graph.index(8, 10)
+    before = corridors.find_path(start, end)
+    # Blocking whole rows shrinks the live edge arrays under the index
+    loader.edit_cells({(x, y): '0' for y in range(graph.rows // 2, graph.rows) for x in range(graph.cols)})
+    assert graph.version != corridors.version
+    assert corridors.find_path(start, end) == before
@@ -0,0 +1,103 @@
+import sys
+import os
+
+# Add program to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'programa'))
+
+from models.map_loader import MapLoader
+from models.pathfinder import Pathfinder
+from models.destination_trees import DestinationTrees, ReverseTree
+
+MAP_PATH = os.path.join(os.path.dirname(__file__), '..', 'programa', 'data', 'mapa.csv')
+
+
+def test_tree_routes_match_search():
+    graph = MapLoader(MAP_PATH).load_graph()
+    destination = graph.index(1, 1)
+    for profile in ('normal', 'peak'):
+        tree = ReverseTree.build(graph, destination, profile)
+        for start in graph.node_indices():
+            path, cost = tree.route(start)
+            expected_path, expected_cost = Pathfinder.find_path_indices(graph, start, destination, profile=profile)
+            assert cost == expected_cost
+            if expected_path is None:
+                assert path is None
+            else:
+                assert path[0] == start and path[-1] == destination
+                weights = graph.profiles[profile]
+                assert sum(min(weights[edge] for edge in range(graph.offsets[a], graph.offsets[a + 1]) if graph.targets[edge] == b)
+                           for a, b in zip(path, path[1:])) == cost
+
+
+def test_background_build_and_route():
+    graph = MapLoader(MAP_PATH).load_graph()
+    trees = DestinationTrees()
+    destination = graph.index(1, 1)
+    for future in trees.schedule(graph, destination):
+        future.result()
+    assert len(trees) == len(graph.profiles)
+    start = graph.index(8, 1)
+    assert trees.route(graph, start, destination, 'peak') == Pathfinder.find_path_indices(graph, start, destination, profile='peak')
+    assert trees.route(graph, start, graph.index(17, 19)) is None # Not a saved destination
+    trees.shutdown()
+
+
+def test_lru_bound_and_invalidation():
+    graph = MapLoader(MAP_PATH).load_graph()
+    trees = DestinationTrees(capacity=2 * graph.size) # Room for two trees
+    nodes = list(graph.node_indices())
+    for destination in nodes[:3]:
+        trees.tree(graph, destination, 'normal', wait=True)
+    assert len(trees) == 2
+    assert trees.tree(graph, nodes[0], 'normal') is None # Evicted
+    assert trees.tree(graph, nodes[2], 'normal') is not None
+    trees.invalidate()
+    assert len(trees) == 0
+    graph.version += 1 # Edited map: old trees no longer match
+    trees.tree(graph, nodes[2], 'normal', wait=True)
+    graph.version -= 1
+    assert trees.tree(graph, nodes[2], 'normal') is None
+
+
+def test_saved_destinations_follow_map_versions():
+    loader = MapLoader(MAP_PATH)
+    graph = loader.load_graph()
+    trees = DestinationTrees()
+    destination, start = graph.index(1, 1), graph.index(8, 1)
+    for future in trees.schedule(graph, destination, ['normal']):
+        future.result()
+    loader.edit_cells({(4, 1): 'B'}) # Closes the street on the way
+
+    # First miss after the edit schedules the tree of the new version
+    assert trees.route(graph, start, destination) is None
+    assert trees.tree(graph, destination, wait=True) is not None
+    assert trees.route(graph, start, destination) == Pathfinder.find_path_indices(graph, start, destination)
+    assert len(trees) == 1 # The tree of the old version was dropped
+
+    loader.undo_edit()
+    for future in trees.refresh(graph):
+        future.result()
+    assert trees.tree(graph, destination, 'peak') is not None
+    assert trees.route(graph, start, destination) == Pathfinder.find_path_indices(graph, start, destination)
+
+    trees.discard(graph, destination)
+    assert trees.refresh(graph) == [] and trees.tree(graph, destination) is None
+    trees.shutdown()
+
+
+def test_failed_build_can_be_scheduled_again(monkeypatch):
+    graph = MapLoader(MAP_PATH).load_graph()
+    trees = DestinationTrees()
+    destination = graph.index(1, 1)
+
+    def fail(*args):
+        raise RuntimeError("build failed")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(ReverseTree, 'build', fail)
+        futures = trees.schedule(graph, destination, ['normal'])
+        for future in futures:
+            assert future.exception() is not None
+    assert [future.result() for future in trees.schedule(graph, destination, ['normal'])]
+    assert trees.tree(graph, destination, 'normal') is not None
+    trees.shutdown()
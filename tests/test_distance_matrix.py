@@ -0,0 +1,46 @@
+import sys
+import os
+import pytest
+
+# Add program to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'programa'))
+
+from models.map_loader import MapLoader
+from models.pathfinder import Pathfinder
+from models.shortest_path_tree import UNREACHABLE
+
+MAP_PATH = os.path.join(os.path.dirname(__file__), '..', 'programa', 'data', 'mapa.csv')
+
+
+def expected_matrix(graph, sources, targets, profile):
+    rows = []
+    for source in sources:
+        row = []
+        for target in targets:
+            _, cost = Pathfinder.find_path_indices(graph, source, target, profile=profile)
+            row.append(UNREACHABLE if cost == float('inf') else cost)
+        rows.append(row)
+    return rows
+
+
+def test_matrix_matches_pairwise_search():
+    pytest.importorskip("numpy")
+    graph = MapLoader(MAP_PATH).load_graph()
+    nodes = list(graph.node_indices())
+    sources, targets = nodes[::9], nodes[::13] + [nodes[0]]
+    for profile in ('normal', 'peak'):
+        matrix = Pathfinder.distance_matrix(graph, sources, targets, profile)
+        assert matrix.shape == (len(sources), len(targets))
+        assert str(matrix.dtype) == 'int32'
+        assert matrix.tolist() == expected_matrix(graph, sources, targets, profile)
+
+
+def test_process_pool_matches_serial():
+    pytest.importorskip("numpy")
+    loader = MapLoader(MAP_PATH)
+    graph = loader.load_graph()
+    nodes = list(graph.node_indices())
+    sources, targets = nodes[::5], nodes[::7]
+    serial = Pathfinder.distance_matrix(graph, sources, targets, 'peak')
+    parallel = Pathfinder.distance_matrix(graph, sources, targets, 'peak', workers=2)
+    assert (serial == parallel).all()
@@ -0,0 +1,117 @@
+import sys
+import os
+import heapq
+import random
+
+# Add program to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'programa'))
+
+from models.map_loader import MapLoader
+from models.incidents import Incident, IncidentApplier
+from models.dynamic_route import DynamicRoute
+
+MAP_PATH = os.path.join(os.path.dirname(__file__), '..', 'programa', 'data', 'mapa.csv')
+INF = float('inf')
+
+
+def reference_cost(route):
+    # Plain Dijkstra with the overlay costs of the route
+    graph = route.graph
+    dist = {route.start: 0}
+    queue = [(0, route.start)]
+    while queue:
+        cost, cell = heapq.heappop(queue)
+        if cell == route.goal:
+            return cost
+        if cost > dist[cell]:
+            continue
+        for edge in range(graph.offsets[cell], graph.offsets[cell + 1]):
+            new_cost = cost + route.edge_cost(edge)
+            if new_cost < dist.get(graph.targets[edge], INF):
+                dist[graph.targets[edge]] = new_cost
+                heapq.heappush(queue, (new_cost, graph.targets[edge]))
+    return INF
+
+
+def check_path(route):
+    path = route.path()
+    if route.cost == INF:
+        assert path is None
+        return
+    assert path[0] == route.start and path[-1] == route.goal
+    graph = route.graph
+    total = 0
+    for a, b in zip(path, path[1:]):
+        total += min(route.edge_cost(e) for e in range(graph.offsets[a], graph.offsets[a + 1]) if graph.targets[e] == b)
+    assert total == route.cost
+
+
+def test_initial_route_is_optimal():
+    graph = MapLoader(MAP_PATH).load_graph()
+    route = DynamicRoute(graph, graph.index(5, 1), graph.index(6, 14))
+    assert route.cost == reference_cost(route)
+    check_path(route)
+
+
+def test_repairs_after_closures_and_reopenings():
+    graph = MapLoader(MAP_PATH).load_graph(is_peak_hour=True)
+    rng = random.Random(3)
+    route = DynamicRoute(graph, graph.index(5, 1), graph.index(6, 14))
+    closed = []
+    for step in range(25):
+        path = route.path()
+        if path and len(path) > 2 and rng.random() < 0.7:
+            cell = rng.choice(path[1:-1]) # Accident on the current route
+            route.close_cells([cell])
+            closed.append(cell)
+        elif closed:
+            route.reopen_cells([closed.pop(rng.randrange(len(closed)))])
+        assert route.cost == reference_cost(route), step
+        check_path(route)
+
+
+def test_cost_changes_and_vehicle_moves():
+    graph = MapLoader(MAP_PATH).load_graph()
+    rng = random.Random(7)
+    route = DynamicRoute(graph, graph.index(5, 1), graph.index(6, 14))
+    for step in range(15):
+        path = route.path()
+        if path and len(path) > 3:
+            route.move_to(path[2])
+        elif step % 5 == 4:
+            route.move_to(rng.choice(list(graph.node_indices()))) # Detour off the route
+        cells = rng.sample(list(graph.node_indices()), 10)
+        route.set_costs({cell: rng.randint(1, 9) for cell in cells})
+        assert route.cost == reference_cost(route), step
+        check_path(route)
+
+
+def test_repair_expands_less_than_recomputing():
+    graph = MapLoader(MAP_PATH).load_graph()
+    route = DynamicRoute(graph, graph.index(5, 1), graph.index(6, 14))
+    initial = route.expanded
+    path = route.path()
+    repaired = route.close_cells([path[-3]])
+    assert repaired < initial
+
+
+def test_follows_incidents_and_edits_of_the_graph():
+    loader = MapLoader(MAP_PATH)
+    graph = loader.load_graph()
+    rng = random.Random(5)
+    route = DynamicRoute(graph, graph.index(5, 1), graph.index(6, 14))
+    route.close_cells([route.path()[4]]) # Overlay of this route only
+    applier = IncidentApplier(loader)
+    for step in range(12):
+        path = route.path()
+        if path and len(path) > 4 and step % 3 != 2:
+            cell = rng.choice(path[2:-2])
+            kind = rng.choice(['accident', 'congestion'])
+        else:
+            cell, kind = rng.choice(sorted(applier.closed or applier.congested or [route.start])), 'clear'
+        x, y = graph.coords(cell)
+        # Closures rebuild the edges of the cell and its neighbours (new edge ids)
+        touched = applier.apply({(x, y): Incident(kind, x, y, 3)})
+        route.sync(touched)
+        assert route.cost == reference_cost(route), step
+        check_path(route)
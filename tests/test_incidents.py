@@ -0,0 +1,179 @@
+import sys
+import os
+import json
+import socket
+import time
+import pytest
+
+# Add program to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'programa'))
+
+from models.map_loader import MapLoader
+from models.pathfinder import Pathfinder
+from models.incidents import (Incident, IncidentFeed, IncidentApplier, parse_incident,
+                              RouteLegs, coalesce, revalidate)
+
+MAP_PATH = os.path.join(os.path.dirname(__file__), '..', 'programa', 'data', 'mapa.csv')
+
+
+def snapshot(graph):
+    return (list(graph.cells), list(graph.offsets), list(graph.targets),
+            {name: list(weights) for name, weights in graph.profiles.items()})
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+def test_parse_and_coalesce():
+    assert parse_incident('{"type": "congestion", "x": 1, "y": 2, "factor": 3}') == Incident('congestion', 1, 2, 3.0)
+    for line in ['not json', '{"type": "flood", "x": 1, "y": 1}', '{"type": "accident"}',
+                 '{"type": "congestion", "x": 1, "y": 1, "factor": 0}']:
+        with pytest.raises(ValueError):
+            parse_incident(line)
+    batch = coalesce([Incident('accident', 1, 1, 1), Incident('congestion', 2, 2, 2), Incident('clear', 1, 1, 1)])
+    assert list(batch) == [(2, 2), (1, 1)]
+    assert batch[(1, 1)].kind == 'clear'
+
+
+def test_batches_update_the_graph_and_clear_restores_it():
+    loader = MapLoader(MAP_PATH)
+    graph = loader.load_graph()
+    original = snapshot(graph)
+    start, end = graph.index(5, 1), graph.index(6, 14)
+    path, cost = Pathfinder.find_path_indices(graph, start, end)
+    slow, closed = path[len(path) // 3], path[2 * len(path) // 3]
+    applier = IncidentApplier(loader)
+
+    touched = applier.apply({graph.coords(slow): Incident('congestion', *graph.coords(slow), 5),
+                             graph.coords(closed): Incident('accident', *graph.coords(closed), 1)})
+    assert slow in touched and closed in touched
+    assert closed not in list(graph.targets)
+    assert loader.raw_matrix[graph.coords(closed)[1]][graph.coords(closed)[0]] == 'B'
+    assert not loader.editor.can_undo # Incidents stay out of the edit journal
+    detour, detour_cost = Pathfinder.find_path_indices(graph, start, end)
+    assert detour is None or (closed not in detour and detour_cost >= cost)
+
+    applier.apply({graph.coords(cell): Incident('clear', *graph.coords(cell), 1) for cell in (slow, closed)})
+    assert snapshot(graph) == original
+
+
+def test_congestion_survives_a_closure_next_to_it():
+    loader = MapLoader(MAP_PATH)
+    graph = loader.load_graph()
+    path, _ = Pathfinder.find_path_indices(graph, graph.index(5, 1), graph.index(6, 14))
+    slow, neighbour = path[4], path[5]
+    applier = IncidentApplier(loader)
+    applier.apply({graph.coords(slow): Incident('congestion', *graph.coords(slow), 4)})
+    expected = snapshot(graph)[3]
+    applier.apply({graph.coords(neighbour): Incident('closure', *graph.coords(neighbour), 1)})
+    applier.apply({graph.coords(neighbour): Incident('clear', *graph.coords(neighbour), 1)})
+    assert snapshot(graph)[3] == expected
+
+
+def test_only_touched_routes_are_searched_again():
+    graph = MapLoader(MAP_PATH).load_graph()
+    first, _ = Pathfinder.find_path_indices(graph, graph.index(5, 1), graph.index(6, 14))
+    second, _ = Pathfinder.find_path_indices(graph, graph.index(8, 2), graph.index(8, 10))
+    only_first = [cell for cell in first if cell not in second]
+    routes = {'a': ([first[0], first[-1]], first), 'b': ([second[0], second[-1]], second)}
+    result = revalidate(graph, routes, only_first[:1])
+    assert list(result) == ['a']
+    assert result['a'][0] == first
+
+
+def test_file_feed_batches_reports_in_time_windows(tmp_path):
+    loader = MapLoader(MAP_PATH)
+    graph = loader.load_graph()
+    applier = IncidentApplier(loader)
+    path = str(tmp_path / 'incidentes.jsonl')
+    applied = []
+    feed = IncidentFeed.from_file(path, lambda batch: applied.append((batch, applier.apply(batch))), window=0.3).start()
+    try:
+        cells = [(5, 1), (8, 2), (5, 9)]
+        with open(path, 'a') as f:
+            for x, y in cells:
+                f.write(json.dumps({'type': 'congestion', 'x': x, 'y': y, 'factor': 2}) + '\n')
+            f.write('garbage\n')
+            f.write(json.dumps({'type': 'congestion', 'x': 5, 'y': 1, 'factor': 3}) + '\n')
+        assert wait_for(lambda: applied)
+        batch, touched = applied[0]
+        assert set(batch) == set(cells)
+        assert batch[(5, 1)].factor == 3
+        assert set(touched) == {graph.index(x, y) for x, y in cells}
+        assert feed.rejected == 1
+    finally:
+        feed.stop()
+    assert not feed.running
+
+
+@pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason="Unix sockets not available")
+def test_socket_feed(tmp_path):
+    address = str(tmp_path / 'incidents.sock')
+    batches = []
+    feed = IncidentFeed.from_socket(address, window=0.1).start() # Batches wait for poll()
+    try:
+        assert wait_for(lambda: os.path.exists(address))
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(address)
+            client.sendall(b'{"type": "accident", "x": 8, "y": 2}\n{"type": "clear", "x": 5, "y": 9}\n')
+        assert wait_for(lambda: batches.extend(feed.poll()) or batches)
+        assert set(batches[0]) == {(8, 2), (5, 9)}
+    finally:
+        feed.stop()
+
+
+def test_route_legs_are_repaired_across_batches():
+    loader = MapLoader(MAP_PATH)
+    graph = loader.load_graph()
+    start, stop, end = graph.index(5, 1), graph.index(8, 10), graph.index(6, 14)
+    first, _ = Pathfinder.find_path_indices(graph, start, stop)
+    second, _ = Pathfinder.find_path_indices(graph, stop, end)
+    routes = {'trip': ([start, stop, end], first + second[1:])}
+    applier = IncidentApplier(loader)
+    legs = RouteLegs()
+    closed = first[-2] # Leaves a longer way around
+    touched = applier.apply({graph.coords(closed): Incident('accident', *graph.coords(closed), 1)})
+    path, cost = revalidate(graph, routes, touched, legs=legs)['trip']
+    assert len(legs) == 2 and closed not in path
+    assert cost == Pathfinder.find_path_indices(graph, start, stop)[1] + Pathfinder.find_path_indices(graph, stop, end)[1]
+
+    # Later batches repair the kept legs, even away from the route
+    routes = {'trip': ([start, stop, end], path)}
+    for cell, kind in ((second[2], 'congestion'), (closed, 'clear')):
+        touched = applier.apply({graph.coords(cell): Incident(kind, *graph.coords(cell), 6)})
+        path, cost = revalidate(graph, routes, touched, legs=legs)['trip']
+        assert cost == Pathfinder.find_path_indices(graph, start, stop)[1] + Pathfinder.find_path_indices(graph, stop, end)[1]
+        routes = {'trip': ([start, stop, end], path)}
+    assert path[:len(first)] == first # Back on the shorter way once it reopens
+    assert revalidate(graph, {}, [], legs=legs) == {} and len(legs) == 0
+
+
+def test_detour_returns_once_the_closure_clears():
+    loader = MapLoader(MAP_PATH)
+    graph = loader.load_graph()
+    start, end = graph.index(8, 10), graph.index(6, 14)
+    shortest, cost = Pathfinder.find_path_indices(graph, start, end)
+    applier = IncidentApplier(loader)
+    closed = graph.index(7, 11)
+    assert closed in shortest
+    applier.apply({graph.coords(closed): Incident('accident', *graph.coords(closed), 1)})
+    detour, detour_cost = Pathfinder.find_path_indices(graph, start, end) # Searched while closed
+    assert detour_cost > cost
+
+    # The clear only touches cells off the detour: it is checked because the cell eased
+    touched = applier.apply({graph.coords(closed): Incident('clear', *graph.coords(closed), 1)})
+    assert applier.eased == [closed] and set(touched).isdisjoint(detour)
+    routes = {'a': ([start, end], detour)}
+    assert revalidate(graph, routes, touched) == {}
+    assert revalidate(graph, routes, touched, eased=applier.eased) == {'a': (shortest, cost)}
+
+    # Costs going up off the route cannot make it longer: not checked
+    far = graph.index(17, 19)
+    touched = applier.apply({graph.coords(far): Incident('congestion', *graph.coords(far), 3)})
+    assert applier.eased == [] and revalidate(graph, {'a': ([start, end], shortest)}, touched) == {}
@@ -0,0 +1,74 @@
+import sys
+import os
+import pytest
+
+# Add program to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'programa'))
+
+from models.map_loader import MapLoader
+from models.pathfinder import Pathfinder
+from models.isochrone import isochrone
+from models.shortest_path_tree import UNREACHABLE
+from ui.palette import PALETTE, rgb, blend, band_color, ISOCHRONE_COLORS
+from ui.tiles import render_ppm
+
+MAP_PATH = os.path.join(os.path.dirname(__file__), '..', 'programa', 'data', 'mapa.csv')
+
+
+@pytest.fixture(scope="module")
+def graph():
+    return MapLoader(MAP_PATH).load_graph()
+
+
+def test_matches_point_to_point_costs(graph):
+    start = graph.index(5, 1)
+    for profile in ('normal', 'peak'):
+        result = Pathfinder.isochrone(graph, start, 12, profile=profile)
+        for cell in graph.node_indices():
+            _, cost = Pathfinder.find_path_indices(graph, start, cell, profile=profile)
+            if cost <= 12:
+                assert result.cost(cell) == cost
+            else:
+                assert result.cost(cell) is None
+
+
+def test_reverse_is_who_reaches_the_cell(graph):
+    end = graph.index(8, 10)
+    result = isochrone(graph, end, 15, reverse=True)
+    assert result.reverse and result.cost(end) == 0
+    for cell in graph.node_indices():
+        _, cost = Pathfinder.find_path_indices(graph, cell, end)
+        assert result.cost(cell) == (cost if cost <= 15 else None)
+
+
+def test_several_budgets_from_one_search(graph):
+    start = graph.index(6, 14)
+    settled = []
+    result = isochrone(graph, start, [20, 5, 10], monitor=settled.append)
+    assert result.budgets == (5, 10, 20) and result.budget == 20
+    single = isochrone(graph, start, 20)
+    assert result.dist == single.dist
+    bands = result.bands()
+    assert len(bands) == len(result) == len(result.cells())
+    for number, budget in enumerate(result.budgets):
+        within = result.cells(budget)
+        assert within == sorted(cell for cell, band in bands.items() if band <= number)
+        assert within == isochrone(graph, start, budget).cells()
+    assert result.cells(100) == result.cells() # Nothing is known beyond the searched budget
+
+    whole = isochrone(graph, start, UNREACHABLE - 1)
+    assert len(whole) > len(result) # The bound stops the search early
+    assert isochrone(graph, start, 0).cells() == [start]
+    with pytest.raises(ValueError):
+        isochrone(graph, start, -1)
+
+
+def test_tinted_tiles():
+    matrix = [['L', 'C']]
+    plain = render_ppm(matrix, 0, 0, 2, 1, 1, "dark")
+    tint = rgb(band_color(0))
+    tinted = render_ppm(matrix, 0, 0, 2, 1, 1, "dark", {(1, 0): tint})
+    header = len(b'P6 2 1 255\n')
+    assert tinted[header:header + 3] == plain[header:header + 3] == rgb(PALETTE['CALLE'][0])
+    assert tinted[header + 3:] == blend(rgb(PALETTE['CRUCE'][0]), tint)
+    assert band_color(99) == ISOCHRONE_COLORS[-1]
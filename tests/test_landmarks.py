@@ -0,0 +1,67 @@
+import sys
+import os
+import random
+
+# Add program to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'programa'))
+
+from models.map_loader import MapLoader
+from models.landmarks import LandmarkIndex, select_landmarks
+from models.pathfinder import Pathfinder, ALT, DIJKSTRA
+from models.shortest_path_tree import UNREACHABLE
+
+MAP_PATH = os.path.join(os.path.dirname(__file__), '..', 'programa', 'data', 'mapa.csv')
+
+
+def test_landmarks_spread_over_map():
+    graph = MapLoader(MAP_PATH).load_graph()
+    landmarks = select_landmarks(graph, 4)
+    assert len(set(landmarks)) == 4
+    assert all(not graph.is_block(landmark) for landmark in landmarks)
+
+
+def test_heuristic_is_admissible():
+    graph = MapLoader(MAP_PATH).load_graph()
+    index = LandmarkIndex.build(graph, 4)
+    nodes = list(graph.node_indices())
+    for profile in ('normal', 'peak'):
+        graph.set_profile(profile)
+        for end in nodes[::13]:
+            heuristic = index.heuristic(end)
+            for start in nodes[::3]:
+                _, cost = Pathfinder.find_path_indices(graph, start, end)
+                assert heuristic(start) <= cost
+
+
+def test_alt_matches_dijkstra():
+    values = ['0', 'L', 'R', 'N', 'S', 'C', 'C', 'ND', 'SF']
+    for seed in range(5):
+        rng = random.Random(seed)
+        matrix = [[rng.choice(values) for _ in range(14)] for _ in range(12)]
+        graph = MapLoader.build_compact_graph(matrix, is_peak_hour=seed % 2 == 0)
+        index = LandmarkIndex.build(graph, 3)
+        nodes = list(graph.node_indices())
+        for _ in range(60):
+            start, end = rng.choice(nodes), rng.choice(nodes)
+            reference = Pathfinder.search(graph, start, end, DIJKSTRA)
+            result = Pathfinder.search(graph, start, end, ALT, landmarks=index)
+            assert result.cost == reference.cost
+
+
+def test_parallel_build_matches_serial():
+    graph = MapLoader(MAP_PATH).load_graph()
+    serial = LandmarkIndex.build(graph, 3)
+    parallel = LandmarkIndex.build(graph, 3, workers=2)
+    assert parallel.landmarks == serial.landmarks
+    assert parallel.tables == serial.tables
+    assert UNREACHABLE in serial.tables[('normal', False)][0] # Blocks are never reached
+
+
+def test_alt_reduces_expanded_nodes():
+    graph = MapLoader(MAP_PATH).load_graph()
+    index = LandmarkIndex.build(graph, 6)
+    nodes = list(graph.node_indices())
+    pairs = [(a, b) for a in nodes[::17] for b in nodes[::11]]
+    report = Pathfinder.expansion_report(graph, pairs, ALT, landmarks=index)
+    assert report['method'] < report['baseline']
+    assert 0 < report['reduction'] < 1
@@ -0,0 +1,80 @@
+import sys
+import os
+import shutil
+
+# Add program to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'programa'))
+
+from models.map_loader import MapLoader
+from models.map_cache import cache_path_for
+from models.pathfinder import Pathfinder
+
+MAP_PATH = os.path.join(os.path.dirname(__file__), '..', 'programa', 'data', 'mapa.csv')
+
+
+def copy_map(tmp_path):
+    csv_path = str(tmp_path / 'mapa.csv')
+    shutil.copy(MAP_PATH, csv_path)
+    return csv_path
+
+
+def test_compiled_map_roundtrip(tmp_path):
+    csv_path = copy_map(tmp_path)
+    first = MapLoader(csv_path, use_cache=True)
+    built = first.load_graph()
+    assert not first.from_cache
+    assert os.path.exists(cache_path_for(csv_path))
+
+    second = MapLoader(csv_path, use_cache=True)
+    cached = second.load_graph(is_peak_hour=True)
+    assert second.from_cache
+    assert isinstance(cached.targets, memoryview) # Mapped, not parsed
+    assert cached.content_hash == built.content_hash
+    assert list(cached.cells) == list(built.cells)
+    assert list(cached.offsets) == list(built.offsets)
+    assert list(cached.targets) == list(built.targets)
+    for name in built.profiles:
+        assert list(cached.profiles[name]) == list(built.profiles[name])
+    assert second.raw_matrix == [[cell.strip() for cell in row] for row in first.raw_matrix]
+
+    built.set_profile('peak')
+    assert Pathfinder.find_path_indices(cached, 27, 20) == Pathfinder.find_path_indices(built, 27, 20)
+
+
+def test_stale_cache_is_rebuilt(tmp_path):
+    csv_path = copy_map(tmp_path)
+    MapLoader(csv_path, use_cache=True).load_graph()
+
+    # Same content, newer mtime: hash still matches, cache is reused
+    stat = os.stat(csv_path)
+    os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    loader = MapLoader(csv_path, use_cache=True)
+    loader.load_graph()
+    assert loader.from_cache
+
+    # Edited CSV: falls back to the CSV and rewrites the cache
+    with open(csv_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    with open(csv_path, 'w', encoding='utf-8') as f:
+        f.write(content.replace('0;L;C;L;L;C', '0;R;C;R;R;C', 1))
+    os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2 * 10**9))
+
+    loader = MapLoader(csv_path, use_cache=True)
+    graph = loader.load_graph()
+    assert not loader.from_cache
+    assert graph.value(graph.index(1, 1)) == 'R'
+
+    loader = MapLoader(csv_path, use_cache=True)
+    assert loader.load_graph().value(graph.index(1, 1)) == 'R'
+    assert loader.from_cache
+
+
+def test_corrupt_cache_falls_back_to_csv(tmp_path):
+    csv_path = copy_map(tmp_path)
+    with open(cache_path_for(csv_path), 'wb') as f:
+        f.write(b'MWZ1garbage')
+
+    loader = MapLoader(csv_path, use_cache=True)
+    graph = loader.load_graph()
+    assert not loader.from_cache
+    assert graph.node_count > 0
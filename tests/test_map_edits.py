@@ -0,0 +1,88 @@
+import sys
+import os
+import random
+import shutil
+
+# Add program to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'programa'))
+
+from models.map_loader import MapLoader, MapEditor
+from models.pathfinder import Pathfinder
+from models.route_cache import RouteCache
+
+MAP_PATH = os.path.join(os.path.dirname(__file__), '..', 'programa', 'data', 'mapa.csv')
+EDIT_VALUES = ['0', 'L', 'R', 'N', 'S', 'C', 'ND', 'SF', 'B']
+
+
+def assert_same_graph(graph, expected):
+    assert list(graph.cells) == list(expected.cells)
+    assert list(graph.offsets) == list(expected.offsets)
+    assert list(graph.targets) == list(expected.targets)
+    for name in expected.profiles:
+        assert list(graph.profiles[name]) == list(expected.profiles[name])
+    assert graph.node_count == expected.node_count
+
+
+def test_batches_match_a_full_rebuild():
+    rng = random.Random(4)
+    matrix = [[rng.choice(EDIT_VALUES[:-1]) for _ in range(12)] for _ in range(9)]
+    graph = MapLoader.build_compact_graph(matrix)
+    editor = MapEditor(graph)
+    for _ in range(20):
+        changes = {}
+        for _ in range(rng.randint(1, 6)):
+            x, y = rng.randrange(12), rng.randrange(9)
+            matrix[y][x] = rng.choice(EDIT_VALUES)
+            changes[graph.index(x, y)] = matrix[y][x]
+        affected = editor.apply(changes)
+        assert set(changes) <= set(affected)
+        assert_same_graph(graph, MapLoader.build_compact_graph(matrix))
+
+
+def test_undo_restores_the_map():
+    graph = MapLoader(MAP_PATH).load_graph()
+    original = MapLoader(MAP_PATH).load_graph()
+    editor = MapEditor(graph)
+    nodes = list(graph.node_indices())
+    editor.apply({nodes[3]: 'B', nodes[40]: '0'})
+    editor.apply({nodes[40]: 'C', 5: 'N'})
+    assert graph.version == 2
+    editor.undo()
+    editor.undo()
+    assert not editor.can_undo
+    assert_same_graph(graph, original)
+
+
+def test_accident_closes_the_cell():
+    loader = MapLoader(MAP_PATH)
+    graph = loader.load_graph()
+    start, end = graph.index(5, 1), graph.index(6, 14)
+    path, cost = Pathfinder.find_path_indices(graph, start, end)
+    middle = path[len(path) // 2]
+    cache = RouteCache()
+    cache.route(graph, start, end)
+
+    affected = loader.edit_cells({graph.coords(middle): 'B'})
+    assert graph.coords(middle) in affected
+    assert middle not in list(graph.targets)
+    detour, detour_cost = cache.route(graph, start, end) # New version: not served from cache
+    assert cache.misses == 2
+    assert detour is None or (middle not in detour and detour_cost >= cost)
+    x, y = graph.coords(middle)
+    assert loader.raw_matrix[y][x] == 'B'
+
+    loader.undo_edit()
+    assert loader.raw_matrix[y][x] != 'B'
+    assert Pathfinder.find_path_indices(graph, start, end)[1] == cost
+
+
+def test_compiled_map_is_copied_on_first_edit(tmp_path):
+    csv_path = str(tmp_path / 'mapa.csv')
+    shutil.copy(MAP_PATH, csv_path)
+    MapLoader(csv_path, use_cache=True).load_graph()
+    loader = MapLoader(csv_path, use_cache=True)
+    graph = loader.load_graph()
+    assert loader.from_cache and isinstance(graph.targets, memoryview)
+    loader.edit_cells({(8, 1): 'C'})
+    assert not isinstance(graph.targets, memoryview)
+    assert loader.raw_matrix[1][8] == 'C'
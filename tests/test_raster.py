@@ -0,0 +1,85 @@
+import sys
+import os
+import struct
+import zlib
+import pytest
+
+# Add program to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'programa'))
+
+np = pytest.importorskip("numpy")
+
+from models.map_loader import MapLoader
+from models.pathfinder import Pathfinder
+from ui.palette import PALETTE, rgb
+from ui.tiles import render_ppm
+from ui.raster import render_map, draw_path, heat_colors, encode_png, encode_ppm, save_image, HEAT_COLORS
+
+MAP_PATH = os.path.join(os.path.dirname(__file__), '..', 'programa', 'data', 'mapa.csv')
+
+
+def color_of(key, theme=0):
+    return list(rgb(PALETTE[key][theme]))
+
+
+def test_map_matches_the_canvas_tiles():
+    loader = MapLoader(MAP_PATH)
+    loader.read_matrix()
+    matrix = loader.raw_matrix
+    rows, cols = len(matrix), len(matrix[0])
+    for cell_size, theme in [(1, "dark"), (3, "light"), (10, "dark")]:
+        image = render_map(matrix, cell_size, theme)
+        assert image.shape == (rows * cell_size, cols * cell_size, 3)
+        assert encode_ppm(image) == render_ppm(matrix, 0, 0, cols, rows, cell_size, theme)
+
+
+def test_graph_and_matrix_render_alike():
+    loader = MapLoader(MAP_PATH)
+    graph = loader.load_graph()
+    assert (render_map(graph, 4) == render_map(loader.raw_matrix, 4)).all()
+
+
+def test_path_overlay():
+    graph = MapLoader(MAP_PATH).load_graph()
+    path, _ = Pathfinder.find_path_indices(graph, graph.index(5, 1), graph.index(8, 10))
+    cells = [graph.coords(index) for index in path]
+    image = draw_path(render_map(graph, 16), cells, 16, width=4)
+    x, y = cells[len(cells) // 2]
+    assert image[y * 16 + 8, x * 16 + 8].tolist() == color_of('PATH')
+    assert image[1 * 16 + 8, 5 * 16 + 8].tolist() == color_of('START')
+    assert image[10 * 16 + 8, 8 * 16 + 8].tolist() == color_of('END')
+    assert image[0, 0].tolist() == color_of('BLOCK') # Far from the route
+
+
+def test_heatmap():
+    ramp = heat_colors([0, 5, 10])
+    assert ramp[0].tolist() == list(rgb(HEAT_COLORS[0]))
+    assert ramp[2].tolist() == list(rgb(HEAT_COLORS[-1]))
+    assert heat_colors([3, 3]).tolist() == [list(rgb(HEAT_COLORS[0]))] * 2
+
+    matrix = [['L', 'L'], ['L', 'L']]
+    heat = [[0, 1], [float('nan'), 1]]
+    image = render_map(matrix, 1, heat=heat, alpha=1.0)
+    assert image[0, 0].tolist() == list(rgb(HEAT_COLORS[0]))
+    assert image[0, 1].tolist() == list(rgb(HEAT_COLORS[-1]))
+    assert image[1, 0].tolist() == color_of('CALLE') # No value: plain cell
+    with pytest.raises(ValueError):
+        render_map(matrix, 1, heat=[1, 2, 3])
+
+
+def test_png_round_trip(tmp_path):
+    image = render_map([['L', 'C'], ['0', 'SF']], 5)
+    data = encode_png(image)
+    assert data.startswith(b'\x89PNG\r\n\x1a\n')
+    width, height = struct.unpack('>II', data[16:24])
+    assert (width, height) == (10, 10)
+    length = struct.unpack('>I', data[33:37])[0]
+    assert data[37:41] == b'IDAT'
+    raw = np.frombuffer(zlib.decompress(data[41:41 + length]), dtype=np.uint8).reshape(10, 31)
+    assert not raw[:, 0].any() # No row filters
+    assert (raw[:, 1:].reshape(10, 10, 3) == image).all()
+
+    assert open(save_image(str(tmp_path / "mapa.png"), image), 'rb').read() == data
+    assert open(save_image(str(tmp_path / "mapa.ppm"), image), 'rb').read() == encode_ppm(image)
+    with pytest.raises(ValueError):
+        save_image(str(tmp_path / "mapa.gif"), image)
@@ -0,0 +1,79 @@
+import sys
+import os
+
+# Add program to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'programa'))
+
+from models.map_loader import MapLoader
+from models.pathfinder import Pathfinder, CORRIDOR
+from models.route_cache import RouteCache
+
+MAP_PATH = os.path.join(os.path.dirname(__file__), '..', 'programa', 'data', 'mapa.csv')
+
+
+def test_hits_return_the_same_route():
+    graph = MapLoader(MAP_PATH).load_graph()
+    cache = RouteCache()
+    start, end = graph.index(8, 1), graph.index(1, 1)
+    first = cache.route(graph, start, end, CORRIDOR)
+    second = cache.route(graph, start, end, CORRIDOR)
+    assert first == second == Pathfinder.find_path_indices(graph, start, end)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_profile_is_part_of_the_key():
+    graph = MapLoader(MAP_PATH).load_graph()
+    cache = RouteCache()
+    start, end = graph.index(8, 1), graph.index(17, 19)
+    normal = cache.route(graph, start, end, profile='normal')
+    peak = cache.route(graph, start, end, profile='peak')
+    assert cache.misses == 2
+    assert normal == Pathfinder.find_path_indices(graph, start, end, profile='normal')
+    assert peak == Pathfinder.find_path_indices(graph, start, end, profile='peak')
+
+
+def test_negative_results_are_cached():
+    graph = MapLoader(MAP_PATH).load_graph()
+    cache = RouteCache()
+    start, end = graph.index(1, 4), graph.index(8, 4)
+    assert cache.route(graph, start, end) == (None, float('inf'))
+    assert cache.route(graph, start, end) == (None, float('inf'))
+    assert cache.hits == 1
+
+
+def test_lru_eviction():
+    graph = MapLoader(MAP_PATH).load_graph()
+    cache = RouteCache(capacity=2)
+    nodes = list(graph.node_indices())
+    cache.route(graph, nodes[0], nodes[1])
+    cache.route(graph, nodes[0], nodes[2])
+    cache.route(graph, nodes[0], nodes[1]) # Refresh the first entry
+    cache.route(graph, nodes[0], nodes[3]) # Evicts (0, 2)
+    assert len(cache) == 2 and cache.evictions == 1
+    cache.route(graph, nodes[0], nodes[1])
+    assert cache.stats()['hits'] == 2
+
+
+def test_invalidated_by_version_and_reload():
+    graph = MapLoader(MAP_PATH).load_graph()
+    cache = RouteCache()
+    start, end = graph.index(8, 1), graph.index(1, 1)
+    cache.route(graph, start, end)
+    graph.version += 1 # In-place edit
+    cache.route(graph, start, end)
+    assert cache.misses == 2
+    cache.invalidate(graph)
+    assert len(cache) == 0
+
+
+def test_graphs_never_share_entries():
+    cache = RouteCache()
+    open_map = MapLoader.build_compact_graph([['L', 'L', 'L']])
+    cache.route(open_map, 2, 0)
+    token = open_map.token
+    del open_map
+    # A new graph with the same version, maybe at the same address
+    closed = MapLoader.build_compact_graph([['L', '0', 'L']])
+    assert closed.token != token and closed.version == 0
+    assert cache.route(closed, 2, 0) == (None, float('inf'))
+    assert cache.misses == 2
@@ -0,0 +1,115 @@
+import sys
+import os
+import random
+import pytest
+
+# Add program to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'programa'))
+
+from models.map_loader import MapLoader
+from models.pathfinder import Pathfinder, METHODS, DIJKSTRA, ASTAR
+
+MAP_PATH = os.path.join(os.path.dirname(__file__), '..', 'programa', 'data', 'mapa.csv')
+CELL_VALUES = ['0', 'L', 'R', 'N', 'S', 'C', 'C', 'C', 'SF', 'ND', 'ND']
+
+
+def random_graph(seed, cols=15, rows=11):
+    rng = random.Random(seed)
+    matrix = [[rng.choice(CELL_VALUES) for _ in range(cols)] for _ in range(rows)]
+    return MapLoader.build_compact_graph(matrix, is_peak_hour=seed % 2 == 1)
+
+
+def assert_valid_path(graph, path, cost, start, end):
+    assert path[0] == start and path[-1] == end
+    total = 0
+    for current, following in zip(path, path[1:]):
+        weights = [w for target, w in graph.edges(current) if target == following]
+        assert weights, (current, following)
+        total += min(weights)
+    assert total == cost
+
+
+def check_all_methods(graph, pairs):
+    for start, end in pairs:
+        reference = Pathfinder.search(graph, start, end, DIJKSTRA)
+        for method in METHODS:
+            result = Pathfinder.search(graph, start, end, method)
+            assert result.cost == reference.cost, (method, start, end)
+            if reference.path is None:
+                assert result.path is None
+            else:
+                assert_valid_path(graph, result.path, result.cost, start, end)
+
+
+def test_methods_agree_on_map():
+    for is_peak in (False, True):
+        graph = MapLoader(MAP_PATH).load_graph(is_peak_hour=is_peak)
+        nodes = list(graph.node_indices())
+        pairs = [(start, end) for start in nodes[::11] for end in nodes[::5]]
+        check_all_methods(graph, pairs)
+
+
+def test_methods_agree_on_random_maps():
+    for seed in range(8):
+        graph = random_graph(seed)
+        nodes = list(graph.node_indices())
+        rng = random.Random(seed)
+        check_all_methods(graph, [(rng.choice(nodes), rng.choice(nodes)) for _ in range(40)])
+
+
+def test_astar_expands_fewer_nodes():
+    graph = MapLoader(MAP_PATH).load_graph()
+    start, end = graph.index(8, 1), graph.index(17, 19)
+    dijkstra = Pathfinder.search(graph, start, end, DIJKSTRA)
+    astar = Pathfinder.search(graph, start, end, ASTAR)
+    assert astar.cost == dijkstra.cost
+    assert astar.expanded <= dijkstra.expanded
+
+
+def test_legacy_find_path_accepts_method():
+    graph = MapLoader(MAP_PATH).load_graph()
+    path, cost = Pathfinder.find_path(graph, "8,1", "1,1", method=ASTAR)
+    assert cost == 14
+    assert [n.id for n in path][-1] == "1,1"
+
+
+def test_explicit_profile_ignores_active_one():
+    graph = MapLoader(MAP_PATH).load_graph()
+    start, end = graph.index(8, 1), graph.index(17, 19)
+    graph.set_profile('peak')
+    peak = Pathfinder.search(graph, start, end)
+    graph.set_profile('normal')
+    for method in METHODS:
+        assert Pathfinder.search(graph, start, end, method, profile='peak').cost == peak.cost
+    assert graph.profile == 'normal'
+
+
+def test_concurrent_queries_match_serial():
+    graph = MapLoader(MAP_PATH).load_graph()
+    nodes = list(graph.node_indices())
+    pairs = [(start, end) for start in nodes[::7] for end in nodes[::9]]
+    serial = [Pathfinder.find_path_indices(graph, start, end, profile='peak') for start, end in pairs]
+    for method in (DIJKSTRA, ASTAR):
+        assert [cost for _, cost in Pathfinder.find_paths(graph, pairs, method, 'peak', workers=4)] == [cost for _, cost in serial]
+
+
+def test_legacy_search_keeps_nodes_untouched():
+    loader = MapLoader(MAP_PATH)
+    graph = loader.load_node_graph(is_peak_hour=False)
+    before = {node_id: dict(vars(node)) for node_id, node in graph.nodes.items()}
+    first, _ = Pathfinder.find_path(graph, "8,1", "1,1")
+    second, _ = Pathfinder.find_path(graph, "8,1", "1,1")
+    assert [n.id for n in first] == [n.id for n in second]
+    assert {node_id: dict(vars(node)) for node_id, node in graph.nodes.items()} == before
+
+
+def test_legacy_search_attributes_stay_readable():
+    graph = MapLoader(MAP_PATH).load_node_graph(is_peak_hour=False)
+    Pathfinder.find_path(graph, "8,1", "1,1")
+    node = graph.get_node(1, 1)
+    with pytest.deprecated_call():
+        assert node.parent is None and node.g_cost == float('inf') and node.h_cost == 0
+    with pytest.deprecated_call():
+        graph.reset_costs()
+    with pytest.raises(AttributeError):
+        node.parent = graph.get_node(8, 1)
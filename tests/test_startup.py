@@ -0,0 +1,86 @@
+import sys
+import os
+import json
+import shutil
+import subprocess
+import time
+
+# Add program to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'programa'))
+
+from models.map_loader import MapLoader, ROWS_PER_CHUNK
+from models.compute_service import ComputeService, PROGRESS, DONE
+
+PROGRAM_DIR = os.path.join(os.path.dirname(__file__), '..', 'programa')
+MAP_PATH = os.path.join(PROGRAM_DIR, 'data', 'mapa.csv')
+# Imported only when a feature needs them, never at startup
+LAZY_MODULES = ['numpy', 'multiprocessing', 'concurrent.futures.process', 'socket']
+
+STARTUP_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import main
+login_only = 'ui.main_window' not in sys.modules
+import ui.main_window
+elapsed = time.perf_counter() - started
+print(json.dumps({'elapsed': elapsed, 'budget': main.STARTUP_BUDGET, 'login_only': login_only,
+                  'loaded': [name for name in %r if name in sys.modules]}))
+"""
+
+
+def measure_startup():
+    output = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT % LAZY_MODULES], cwd=PROGRAM_DIR,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output)
+
+
+def test_startup_stays_within_budget():
+    runs = [measure_startup() for _ in range(3)]
+    best = min(run['elapsed'] for run in runs)
+    assert best < runs[0]['budget'], f"Startup imports took {best:.3f}s"
+    assert runs[0]['login_only'] # main.py does not import the main window eagerly
+    assert runs[0]['loaded'] == []
+
+
+def collect_rows(loader):
+    chunks = []
+    graph = loader.load_graph(on_rows=lambda first, rows: chunks.append((first, list(rows))))
+    return graph, chunks
+
+
+def test_rows_are_streamed_while_loading(tmp_path):
+    csv_path = str(tmp_path / 'mapa.csv')
+    rows = [';'.join(['C'] * 5)] * (2 * ROWS_PER_CHUNK + 3)
+    with open(csv_path, 'w') as f:
+        f.write('\n'.join(rows) + '\n')
+
+    for run in range(2): # The second run reads the compiled map
+        loader = MapLoader(csv_path, use_cache=True)
+        graph, chunks = collect_rows(loader)
+        assert loader.from_cache == (run == 1)
+        assert [first for first, _ in chunks] == [0, ROWS_PER_CHUNK, 2 * ROWS_PER_CHUNK]
+        assert [row for _, chunk in chunks for row in chunk] == loader.raw_matrix
+        assert graph.rows == len(rows)
+
+
+def test_map_loads_on_the_compute_service(tmp_path):
+    csv_path = str(tmp_path / 'mapa.csv')
+    shutil.copy(MAP_PATH, csv_path)
+    service = ComputeService()
+    try:
+        def load(loader, monitor):
+            return loader, loader.load_graph(on_rows=lambda first, rows: monitor((first, rows)))
+        job = service.submit(load, MapLoader(csv_path, use_cache=True), tag="map")
+        events = []
+        deadline = time.monotonic() + 5
+        while not any(event.kind == DONE for event in events):
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+            events += service.poll()
+        drawn = [row for event in events if event.kind == PROGRESS for row in event.value[1]]
+        loader, graph = events[-1].value
+        assert drawn == loader.raw_matrix
+        assert graph.size == MapLoader(MAP_PATH).load_graph().size
+        assert service.current(job)
+    finally:
+        service.shutdown()
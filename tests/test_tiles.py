@@ -0,0 +1,71 @@
+import sys
+import os
+
+# Add program to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'programa'))
+
+from models.compact_graph import CELL_TYPES
+from ui.palette import PALETTE, CELL_STYLES, cell_style, rgb
+from ui.tiles import (TileCache, FrameTimer, render_ppm, cells_per_tile, tile_span,
+                      TILE_PIXELS, BORDER_MIN_CELL)
+
+
+def pixel(ppm, x, y):
+    header_end = ppm.index(b'\n') + 1
+    width = int(ppm.split()[1])
+    start = header_end + 3 * (y * width + x)
+    return ppm[start:start + 3]
+
+
+def test_every_cell_type_has_a_style():
+    assert set(CELL_TYPES) <= set(CELL_STYLES)
+    assert cell_style('??') == ('BLOCK', "")
+
+
+def test_tile_pixels():
+    matrix = [['L', 'N'], ['C']] # Short row: padded with a block
+    ppm = render_ppm(matrix, 0, 0, 2, 2, 10, "dark")
+    assert ppm.startswith(b'P6 20 20 255\n')
+    assert len(ppm) == len(b'P6 20 20 255\n') + 20 * 20 * 3
+    assert pixel(ppm, 0, 0) == rgb(PALETTE['CALLE'][0])
+    assert pixel(ppm, 15, 5) == rgb(PALETTE['AVENIDA'][0])
+    assert pixel(ppm, 5, 15) == rgb(PALETTE['CRUCE'][0])
+    assert pixel(ppm, 15, 15) == rgb(PALETTE['BLOCK'][0])
+    assert pixel(ppm, 9, 3) == rgb(PALETTE['BORDER'][0])
+    assert pixel(ppm, 3, 9) == rgb(PALETTE['BORDER'][0])
+
+    light = render_ppm(matrix, 1, 0, 1, 1, BORDER_MIN_CELL - 1, "light") # No border when zoomed out
+    assert set(light[light.index(b'\n') + 1:][i:i + 3] for i in range(0, 27, 3)) == {rgb(PALETTE['AVENIDA'][1])}
+
+
+def test_tile_cache_reuses_and_invalidates_tiles():
+    built = []
+    cache = TileCache(lambda key: built.append(key) or key, capacity=3)
+    for key in [("dark", 40, 0, 0), ("dark", 40, 1, 0), ("dark", 40, 0, 0), ("dark", 8, 0, 0)]:
+        cache.get(key)
+    assert len(built) == 3 and cache.hits == 1
+
+    count = cells_per_tile(40)
+    assert tile_span(1, 40) == (count, 2 * count)
+    cache.invalidate_cells([(count, 0)]) # Inside tile (1, 0) at 40px and tile (0, 0) at 8px
+    assert len(cache) == 1
+    cache.get(("dark", 40, 2, 0))
+    cache.get(("dark", 40, 3, 0))
+    cache.get(("dark", 40, 4, 0))
+    assert len(cache) == 3 # LRU bound
+
+    cache.invalidate_rows(0, 1)
+    assert len(cache) == 0
+    assert cells_per_tile(TILE_PIXELS * 2) == 1
+
+
+def test_frame_timer():
+    timer = FrameTimer(budget=0.5)
+    assert timer.stats()['frames'] == 0
+    for _ in range(3):
+        with timer.measure():
+            pass
+    timer.frames.append(1.0)
+    stats = timer.stats()
+    assert stats['frames'] == 4 and stats['max'] == 1.0 and stats['last'] == 1.0
+    assert stats['over_budget'] == 1
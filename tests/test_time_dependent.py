@@ -0,0 +1,76 @@
+import sys
+import os
+
+# Add program to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'programa'))
+
+from models.map_loader import MapLoader, cost_table
+from models.pathfinder import Pathfinder
+from models.compact_graph import CELL_CODES
+from models.time_dependent import TimeProfile, WeightSchedule, time_dependent_search, default_time_profile
+
+MAP_PATH = os.path.join(os.path.dirname(__file__), '..', 'programa', 'data', 'mapa.csv')
+
+
+def test_constant_profile_matches_static_search():
+    graph = MapLoader(MAP_PATH).load_graph()
+    nodes = list(graph.node_indices())
+    for name in ('normal', 'peak'):
+        profile = TimeProfile.from_hours([cost_table(name)] * 24)
+        for start in nodes[::7]:
+            for end in nodes[::11]:
+                _, cost = Pathfinder.find_path_indices(graph, start, end, profile=name)
+                assert time_dependent_search(graph, start, end, 600, profile)[1] == cost
+
+
+def test_lookup_table_follows_peak_hours():
+    profile = default_time_profile()
+    avenue = CELL_CODES['N']
+    assert profile.cost(avenue, 3 * 60) == 1
+    assert profile.cost(avenue, 7 * 60) == 4
+    assert profile.cost(avenue, 10 * 60 + 30) == 1
+    assert profile.cost(avenue, 24 * 60 + 7 * 60) == 4 # Wraps around midnight
+
+
+def test_trip_crossing_into_peak_is_costed_per_edge():
+    graph = MapLoader(MAP_PATH).load_graph()
+    start, end = graph.index(5, 1), graph.index(6, 14)
+    _, normal = Pathfinder.find_path_indices(graph, start, end, profile='normal')
+    _, peak = Pathfinder.find_path_indices(graph, start, end, profile='peak')
+    _, minutes, _ = Pathfinder.find_path_at(graph, start, end, 5 * 60 + 50)
+    assert normal < minutes < peak
+
+
+def test_later_departure_never_arrives_earlier():
+    graph = MapLoader(MAP_PATH).load_graph()
+    start, end = graph.index(5, 1), graph.index(6, 14)
+    arrivals = [departure + Pathfinder.find_path_at(graph, start, end, departure).cost
+                for departure in range(5 * 60 + 30, 10 * 60 + 10)]
+    assert arrivals == sorted(arrivals)
+
+
+def test_astar_and_dijkstra_agree():
+    graph = MapLoader(MAP_PATH).load_graph()
+    profile = default_time_profile()
+    nodes = list(graph.node_indices())
+    for departure in (0, 355, 540, 1019):
+        for start in nodes[::13]:
+            for end in nodes[::9]:
+                astar = time_dependent_search(graph, start, end, departure, profile)
+                dijkstra = time_dependent_search(graph, start, end, departure, profile, use_heuristic=False)
+                assert astar[1] == dijkstra[1]
+
+
+def test_trip_costs_follow_incident_factors():
+    graph = MapLoader(MAP_PATH).load_graph()
+    start, end = graph.index(5, 1), graph.index(6, 14)
+    departure = 5 * 60 + 50
+    path, minutes, _ = Pathfinder.find_path_at(graph, start, end, departure)
+    assert minutes == Pathfinder.find_path_at(graph, start, end, departure, default_time_profile()).cost
+
+    # Congest every cell of the route: the trip gets slower or goes around it
+    graph.set_entry_costs({cell: 5.0 for cell in path[1:-1]})
+    detour = Pathfinder.find_path_at(graph, start, end, departure)
+    assert detour.cost > minutes
+    assert time_dependent_search(graph, start, end, departure, WeightSchedule.from_graph(graph),
+                                 use_heuristic=False)[1] == detour.cost
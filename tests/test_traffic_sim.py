@@ -0,0 +1,110 @@
+import sys
+import os
+import pytest
+
+# Add program to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'programa'))
+
+np = pytest.importorskip("numpy")
+
+from models.map_loader import MapLoader
+from models.traffic_sim import TrafficSimulation, random_trips, CONGESTION_WEIGHT, GRIDLOCK_STEPS
+
+MAP_PATH = os.path.join(os.path.dirname(__file__), '..', 'programa', 'data', 'mapa.csv')
+
+# One-way street to the right crossed by an avenue going south
+CROSSING = [
+    ['0', '0', 'S', '0', '0'],
+    ['R', 'R', 'C', 'R', 'R'],
+    ['0', '0', 'S', '0', '0'],
+]
+STREET = [5, 6, 7, 8, 9]
+AVENUE = [2, 7, 12]
+# Clockwise loop of four cells
+RING = [['R', 'S'], ['N', 'L']]
+# Two equally long ways from (0, 0) to (3, 2)
+TWO_WAYS = [
+    ['C', 'R', 'R', 'C'],
+    ['S', '0', '0', 'S'],
+    ['C', 'R', 'R', 'C'],
+]
+
+
+def test_free_flow_vehicle_has_no_delay():
+    simulation = TrafficSimulation(MapLoader.build_compact_graph(CROSSING))
+    simulation.add_routes([STREET])
+    stats = simulation.run(100)
+    assert simulation.done and stats['arrived'] == 1
+    assert stats['mean_travel'] == 10 # Five cells costing 2 each (normal profile)
+    assert stats['mean_delay'] == 0
+    assert not simulation.occupancy.any()
+
+
+def test_routes_must_follow_one_way_streets():
+    simulation = TrafficSimulation(MapLoader.build_compact_graph(CROSSING))
+    with pytest.raises(ValueError):
+        simulation.add_routes([[9, 8]])
+    with pytest.raises(ValueError):
+        simulation.add_routes([[0, 5]]) # Block cell
+    assert simulation.vehicle_count == 0
+
+
+def test_crossing_capacity_makes_vehicles_queue():
+    simulation = TrafficSimulation(MapLoader.build_compact_graph(CROSSING), street_capacity=2)
+    simulation.add_routes([AVENUE] * 4 + [STREET] * 2)
+    while not simulation.done:
+        simulation.step()
+        assert (simulation.occupancy <= simulation.capacity).all()
+        assert simulation.occupancy[7] <= 1
+        assert simulation.steps < 200
+    stats = simulation.stats()
+    assert stats['arrived'] == 6 and stats['mean_delay'] > 0
+    assert simulation.hotspots(1)[0][:2] in [(2, 0), (1, 1)] # Queued in front of the crossing
+    assert sum(simulation.history) == 6
+
+
+def test_full_ring_is_reported_as_gridlock():
+    simulation = TrafficSimulation(MapLoader.build_compact_graph(RING), street_capacity=1)
+    simulation.add_routes([[0, 1, 3], [1, 3, 2], [3, 2, 0], [2, 0, 1]])
+    stats = simulation.run(1000)
+    assert stats['gridlock'] and stats['on_map'] == 4 and stats['arrived'] == 0
+    assert GRIDLOCK_STEPS <= simulation.steps < 1000
+
+
+def test_queued_vehicle_is_rerouted_around_congestion():
+    graph = MapLoader.build_compact_graph(TWO_WAYS)
+    simulation = TrafficSimulation(graph, street_capacity=1)
+    simulation.add_routes([[1, 2, 3, 7, 11], [0, 1, 2, 3, 7, 11]])
+    simulation.run(3)
+    assert simulation.queued == 1 # The second one waits at (0, 0) for (1, 0)
+    simulation.feed_back()
+    assert simulation.reroute_queued() == 1
+    stats = simulation.run(100)
+    assert stats['arrived'] == 2
+    start, length = simulation.route_start[1], simulation.route_len[1]
+    assert simulation.route_cells[start:start + length].tolist() == [0, 4, 8, 9, 10, 11]
+    simulation.reset_costs()
+    assert graph.profiles == MapLoader.build_compact_graph(TWO_WAYS).profiles
+
+
+def test_city_load_and_congestion_feedback():
+    loader = MapLoader(MAP_PATH)
+    graph = loader.load_graph()
+    original = {name: list(weights) for name, weights in graph.profiles.items()}
+    simulation = TrafficSimulation(graph)
+    trips = random_trips(graph, 80, seed=5)
+    assert all(origin != destination for origin, destination in trips)
+    simulation.add_trips(trips, depart=[number // 8 for number in range(len(trips))])
+    assert simulation.vehicle_count + simulation.unroutable == 80
+
+    simulation.run(15)
+    factors = simulation.feed_back()
+    assert factors and max(factors.values()) == 1 + CONGESTION_WEIGHT # Some cell is full
+    assert graph.profiles != original
+
+    stats = simulation.run(5000, feedback_every=10, reroute=True)
+    assert simulation.done and not stats['gridlock']
+    assert stats['arrived'] == simulation.vehicle_count
+    assert stats['throughput'] > 0 and not simulation.occupancy.any()
+    simulation.feed_back() # Empty map: every raised cost is restored
+    assert {name: list(weights) for name, weights in graph.profiles.items()} == original
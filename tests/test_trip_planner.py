@@ -0,0 +1,95 @@
+import sys
+import os
+import random
+import itertools
+
+# Add program to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'programa'))
+
+from models.map_loader import MapLoader
+from models.pathfinder import Pathfinder
+from models import trip_planner
+from models.trip_planner import TripPlanner, held_karp, improve_order, nearest_neighbor, tour_cost
+
+MAP_PATH = os.path.join(os.path.dirname(__file__), '..', 'programa', 'data', 'mapa.csv')
+
+
+def random_costs(seed, size):
+    rng = random.Random(seed)
+    return [[0 if i == j else rng.randint(1, 50) for j in range(size)] for i in range(size)]
+
+
+def brute_force(costs, return_to_start):
+    return min(tour_cost(costs, order, return_to_start) for order in itertools.permutations(range(1, len(costs))))
+
+
+def test_held_karp_is_exact():
+    for seed in range(10):
+        costs = random_costs(seed, 7)
+        for return_to_start in (False, True):
+            order, cost = held_karp(costs, return_to_start)
+            assert sorted(order) == list(range(1, 7))
+            assert cost == tour_cost(costs, order, return_to_start) == brute_force(costs, return_to_start)
+
+
+def test_local_search_improves_greedy_order():
+    for seed in range(5):
+        costs = random_costs(seed, 20)
+        start = nearest_neighbor(costs)
+        order, cost = improve_order(costs, start)
+        assert sorted(order) == list(range(1, 20))
+        assert cost == tour_cost(costs, order) <= tour_cost(costs, start)
+
+
+def test_plan_on_map():
+    graph = MapLoader(MAP_PATH).load_graph()
+    planner = TripPlanner(graph)
+    start = graph.index(5, 1)
+    stops = [graph.index(8, 2), graph.index(5, 9), graph.index(6, 14), graph.index(8, 10)]
+    plan = planner.plan(start, stops)
+    assert sorted(plan.order) == sorted(stops)
+    legs = [start] + plan.order
+    assert plan.cost == sum(Pathfinder.find_path_indices(graph, a, b)[1] for a, b in zip(legs, legs[1:]))
+    assert plan.path[0] == start and plan.path[-1] == plan.order[-1]
+
+
+def test_reordering_reuses_cached_costs(monkeypatch):
+    graph = MapLoader(MAP_PATH).load_graph()
+    planner = TripPlanner(graph)
+    start = graph.index(5, 1)
+    stops = [graph.index(8, 2), graph.index(5, 9), graph.index(6, 14)]
+    first = planner.plan(start, stops)
+
+    def no_search(*args, **kwargs):
+        raise AssertionError("pairwise costs should come from the cache")
+    monkeypatch.setattr(trip_planner, 'compute_rows', lambda graph, tasks, profile: [] if not tasks else no_search())
+    second = planner.plan(start, list(reversed(stops)))
+    assert second.cost == first.cost
+
+
+def test_adding_a_stop_searches_one_row_and_one_column():
+    graph = MapLoader(MAP_PATH).load_graph()
+    planner = TripPlanner(graph)
+    start = graph.index(5, 1)
+    stops = [graph.index(8, 2), graph.index(5, 9), graph.index(6, 14)]
+    planner.cost_matrix([start] + stops)
+    assert planner.searches == 4
+    points = [start] + stops + [graph.index(8, 10)]
+    costs = planner.cost_matrix(points)
+    assert planner.searches == 6
+    for i, source in enumerate(points):
+        for j, target in enumerate(points):
+            assert costs[i][j] == (0 if i == j else Pathfinder.find_path_indices(graph, source, target)[1])
+
+    calls = []
+    planner.plan(start, stops, monitor=calls.append)
+    assert calls == [7, 8, 9] # Legs only, the matrix is cached
+    graph.version += 1 # Edited map: every row is searched again
+    planner.cost_matrix([start] + stops)
+    assert planner.searches == 13 and len(planner._rows) == 4
+
+
+def test_unreachable_stop():
+    graph = MapLoader(MAP_PATH).load_graph()
+    plan = TripPlanner(graph).plan(graph.index(1, 1), [graph.index(8, 1)])
+    assert plan.order is None and plan.path is None